@@ -0,0 +1,366 @@
+"""
+Render-latency benchmark for the Streamlit builder (main.py).
+
+Builds synthetic catalogs of increasing size, then runs main.py headless with Streamlit's AppTest on the
+brands page, a brand's materials page and the material editor, and measures for each:
+
+    first      the first run after the catalog is opened (cold caches), in ms
+    rerun      median and 95th percentile of the following reruns, in ms
+    fs calls   file-system operations per rerun, counted with an audit hook: opens, directory listings
+               (listdir, scandir, glob) and writes. stat() and Path.exists() raise no audit event and
+               aren't counted.
+    images     st.image calls per rerun and the bytes they were given (file size for paths)
+
+All tabs of the material editor render on every run, so each tab is also measured on its own, by timing
+the code inside its `with tab:` block. The report can be saved as JSON with --output and compared with a
+report from another commit with --baseline.
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import streamlit
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+from storage import open_store
+
+APP_PATH = Path(__file__).parent / "main.py"
+
+DEFAULT_SIZES = ["4x10", "16x40", "40x100"]
+DEFAULT_RERUNS = 10
+DEFAULT_GALLERY = 6
+DEFAULT_IMAGE_SIZE = 1600
+
+# Audit events counted as file-system calls, by kind
+FS_EVENTS = {
+    "open": "open",
+    "os.listdir": "list",
+    "os.scandir": "list",
+    "glob.glob": "list",
+    "glob.glob/2": "list",
+    "os.remove": "write",
+    "os.rename": "write",
+    "os.mkdir": "write",
+    "os.rmdir": "write",
+    "os.chmod": "write",
+    "os.utime": "write",
+    "os.truncate": "write",
+    "shutil.copyfile": "write",
+    "shutil.rmtree": "write",
+    "sqlite3.connect": "open",
+}
+
+def parse_size(text):
+    """Parse a catalog size written as BRANDSxMATERIALS (materials per brand), e.g. 16x40."""
+    brands, _, materials = text.lower().partition("x")
+    try:
+        return int(brands), int(materials)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a size like 16x40, got {text!r}")
+
+def synthetic_images(count, size):
+    """Encode `count` JPEGs of size x size*3/4 pixels with different colors and some texture to compress."""
+    images = []
+    for i in range(count):
+        img = Image.effect_noise((size, size * 3 // 4), 40 + i * 5).convert("RGB")
+        tint = Image.new("RGB", img.size, ((70 + i * 37) % 256, (60 + i * 23) % 256, (50 + i * 53) % 256))
+        buffer = io.BytesIO()
+        Image.blend(img, tint, 0.6).save(buffer, "JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+def build_catalog(store, brands, materials_per_brand, gallery, image_size, seed=0):
+    """
+    Fill a store with `brands` brands of `materials_per_brand` materials each. Every brand has a logo and
+    every material a main image, a preview and `gallery` gallery images, all drawn from a small pool of JPEGs.
+    """
+    pool = synthetic_images(8, image_size)
+    logo = synthetic_images(1, 200)[0]
+    description = "<h1>Synthetic Shingle</h1>" + "<p>Architectural laminated shingle with algae resistance.</p>" * 8
+    for b in range(brands):
+        brand_id = f"brand-{b:03d}"
+        store.save_brand({"id": brand_id, "company": f"Brand {b:03d}",
+                          "description": f"<p>Synthetic brand {b} for benchmarking.</p>"})
+        store.upload_image(brand_id, None, "logo", logo, ".jpg")
+        for m in range(materials_per_brand):
+            material_id = f"material-{m:04d}"
+            n = seed + b * materials_per_brand + m
+            store.save_material(brand_id, {
+                "id": material_id, "name": f"Material {b}-{m}", "headline": "Synthetic benchmark material",
+                "price": 400 + m % 300, "waste": 10, "minPitch": 2, "maxPitch": 12, "pitchThreshold": 8,
+                "pricePerPitch": 5.0, "mainImageName": "Charcoal", "description": description,
+            })
+            store.upload_image(brand_id, material_id, "main", pool[n % len(pool)], ".jpg")
+            store.upload_image(brand_id, material_id, "preview", pool[(n + 1) % len(pool)], ".jpg")
+            for g in range(gallery):
+                store.add_gallery_image(brand_id, material_id, pool[(n + g) % len(pool)], ".jpg", name=f"Color {g}")
+
+class Probe:
+    """
+    Collects file-system calls, st.image calls and timings for the section of the script being run:
+    the page, or the editor tab whose `with` block is executing.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.section = None
+        self.counts = {}
+        self.times = {}
+        self._lock = threading.Lock()
+        sys.addaudithook(self.audit)
+
+    def start(self, section):
+        self.section = section
+        self.counts = {}
+        self.times = {}
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counts.setdefault(self.section, Counter())[key] += amount
+
+    def audit(self, event, args):
+        if self.active and event in FS_EVENTS:
+            self.count(FS_EVENTS[event])
+
+    def image_bytes(self, image):
+        """Bytes handed to st.image: the file's size for paths, the data's length for uploads and bytes."""
+        active, self.active = self.active, False
+        try:
+            if isinstance(image, (str, Path)) and not str(image).startswith(("http://", "https://")):
+                return os.path.getsize(image)
+            if isinstance(image, (bytes, bytearray)):
+                return len(image)
+            if hasattr(image, "getbuffer"):
+                return image.getbuffer().nbytes
+            return 0
+        except OSError:
+            return 0
+        finally:
+            self.active = active
+
+class TimedTab:
+    """An st.tabs container that records the time spent and calls made inside its `with` block."""
+
+    def __init__(self, container, section, probe):
+        self._container = container
+        self._section = section
+        self._probe = probe
+
+    def __getattr__(self, name):
+        return getattr(self._container, name)
+
+    def __enter__(self):
+        self._outer = self._probe.section
+        self._probe.section = self._section
+        self._started = time.perf_counter()
+        return self._container.__enter__()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._started
+        self._probe.times[self._section] = self._probe.times.get(self._section, 0.0) + elapsed
+        self._probe.section = self._outer
+        return self._container.__exit__(*exc_info)
+
+def instrument(probe):
+    """Patch st.image and st.tabs so the probe sees every image and which editor tab is running."""
+    original_image = streamlit.image
+    original_tabs = streamlit.tabs
+
+    def image(image, *args, **kwargs):
+        images = image if isinstance(image, list) else [image]
+        for item in images:
+            probe.count("images")
+            probe.count("image bytes", probe.image_bytes(item))
+        return original_image(image, *args, **kwargs)
+
+    def tabs(labels, *args, **kwargs):
+        containers = original_tabs(labels, *args, **kwargs)
+        # Tab labels start with an icon, which would only misalign the report
+        return [TimedTab(container, f"{probe.section} / {label.split(' ', 1)[-1]}", probe)
+                for container, label in zip(containers, labels)]
+
+    streamlit.image = image
+    streamlit.tabs = tabs
+
+def scenarios(store):
+    """The pages to measure: (name, session state to start from). Uses the first brand and its first material."""
+    brand = store.load_brands()[0]
+    material = store.load_materials(brand["id"])[0]
+    return [
+        ("brands", {"current_page": "brands"}),
+        ("materials", {"current_page": "materials", "current_brand": brand}),
+        ("editor", {"current_page": "edit_material", "current_brand": brand, "current_material": material}),
+    ]
+
+def new_session(state, timeout):
+    """An AppTest session of main.py starting from the given session state."""
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    for key, value in state.items():
+        at.session_state[key] = value
+    return at
+
+def run_session(at, name):
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{name} page raised: {at.exception[0].message}")
+
+def run_scenario(probe, name, state, reruns, timeout):
+    """
+    Run a page once after opening the catalog and then `reruns` more times. Returns its rows of the report.
+
+    AppTest can't rerun a session whose page has a file uploader (every builder page does), so each run
+    is a new session starting from the same state. A Streamlit rerun executes the whole script anyway.
+    """
+    streamlit.cache_resource.clear()
+    at = new_session(state, timeout)
+    started = time.perf_counter()
+    run_session(at, name)
+    first = time.perf_counter() - started
+
+    latencies = []
+    sections = {}
+    for _ in range(reruns):
+        at = new_session(state, timeout)
+        probe.start(name)
+        started = time.perf_counter()
+        try:
+            run_session(at, name)
+        finally:
+            probe.stop()
+        latencies.append(time.perf_counter() - started)
+        for section in set(probe.counts) | set(probe.times):
+            totals = sections.setdefault(section, {"times": [], "counts": Counter()})
+            totals["counts"].update(probe.counts.get(section, {}))
+            if section in probe.times:
+                totals["times"].append(probe.times[section])
+
+    # Whole-page counts include everything that happened inside its tabs
+    page_counts = Counter()
+    for totals in sections.values():
+        page_counts.update(totals["counts"])
+    rows = [summarize(name, latencies, page_counts, reruns, first)]
+    for section, totals in sorted(sections.items()):
+        if section != name:
+            rows.append(summarize(section, totals["times"], totals["counts"], reruns))
+    return rows
+
+def summarize(section, times, counts, reruns, first=None):
+    times = sorted(times) or [0.0]
+    return {
+        "section": section,
+        "first_ms": None if first is None else round(first * 1000, 2),
+        "rerun_ms": round(statistics.median(times) * 1000, 2),
+        "rerun_p95_ms": round(times[math.ceil(len(times) * 0.95) - 1] * 1000, 2),
+        "fs_calls": round(sum(counts[kind] for kind in set(FS_EVENTS.values())) / reruns, 1),
+        "opens": round(counts["open"] / reruns, 1),
+        "listings": round(counts["list"] / reruns, 1),
+        "writes": round(counts["write"] / reruns, 1),
+        "images": round(counts["images"] / reruns, 1),
+        "image_bytes": round(counts["image bytes"] / reruns),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=APP_PATH.parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(report, baseline=None):
+    """Print the results as a table, with the change in median rerun time against a baseline report."""
+    previous = {}
+    if baseline:
+        previous = {(r["catalog"], r["section"]): r for r in baseline["results"]}
+        print(f"Baseline: {baseline.get('commit') or 'unknown commit'} from {baseline.get('date', '?')}")
+    header = (f"{'catalog':<12}{'section':<34}{'first ms':>10}{'rerun ms':>10}{'p95 ms':>9}{'fs calls':>10}"
+              f"{'images':>8}{'image KB':>10}")
+    print(header + ("  vs baseline" if baseline else ""))
+    for row in report["results"]:
+        first = "" if row["first_ms"] is None else f"{row['first_ms']:.1f}"
+        line = (f"{row['catalog']:<12}{row['section']:<34}{first:>10}{row['rerun_ms']:>10.1f}"
+                f"{row['rerun_p95_ms']:>9.1f}{row['fs_calls']:>10.1f}{row['images']:>8.1f}"
+                f"{row['image_bytes'] / 1024:>10.0f}")
+        old = previous.get((row["catalog"], row["section"]))
+        if old and old["rerun_ms"]:
+            line += f"  {(row['rerun_ms'] - old['rerun_ms']) / old['rerun_ms'] * 100:+.0f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure render latency of the builder pages on synthetic catalogs.")
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[parse_size(s) for s in DEFAULT_SIZES],
+                        metavar="BRANDSxMATERIALS",
+                        help=f"catalog sizes, as brands x materials per brand (default: {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument("--backend", choices=["files", "sqlite"], default="files",
+                        help="store the synthetic catalogs are written to (default: files)")
+    parser.add_argument("--reruns", type=int, default=DEFAULT_RERUNS,
+                        help=f"reruns measured per page (default: {DEFAULT_RERUNS})")
+    parser.add_argument("--gallery", type=int, default=DEFAULT_GALLERY,
+                        help=f"gallery images per material (default: {DEFAULT_GALLERY})")
+    parser.add_argument("--image-size", type=int, default=DEFAULT_IMAGE_SIZE,
+                        help=f"width of the synthetic images in pixels (default: {DEFAULT_IMAGE_SIZE})")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds a single run may take (default: 60)")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="report JSON from an earlier run to compare with")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    probe = Probe()
+    instrument(probe)
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "settings": {"backend": args.backend, "reruns": args.reruns, "gallery": args.gallery,
+                     "image_size": args.image_size},
+        "results": [],
+    }
+    previous_store = os.environ.get("BUILDER_STORE")
+    try:
+        for brands, materials in args.sizes:
+            catalog = f"{brands}x{materials}"
+            with tempfile.TemporaryDirectory(prefix="builder-benchmark-") as tmp:
+                spec = f"{args.backend}:{tmp}"
+                store = open_store(spec)
+                started = time.perf_counter()
+                build_catalog(store, brands, materials, args.gallery, args.image_size)
+                print(f"Built {catalog} catalog ({brands * materials} materials) in {time.perf_counter() - started:.1f}s",
+                      file=sys.stderr)
+                # main.py opens its store from the environment on every run
+                os.environ["BUILDER_STORE"] = spec
+                for name, state in scenarios(store):
+                    for row in run_scenario(probe, name, state, args.reruns, args.timeout):
+                        report["results"].append({"catalog": catalog, **row})
+    finally:
+        if previous_store is None:
+            os.environ.pop("BUILDER_STORE", None)
+        else:
+            os.environ["BUILDER_STORE"] = previous_store
+
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import time
+import json
+import random
+import argparse
+import numpy as np
+from pricing import CATALOG_PATH, CatalogArrays, catalog_arrays, quote_material, quote_roofs
+
+def synthetic_roofs(count, seed=0):
+    """Random roofs of 1-12 facets, 100-2500 sq ft each, at whole or half pitches from 0 to 12."""
+    rng = random.Random(seed)
+    return [[(rng.uniform(100, 2500), rng.randrange(0, 25) / 2) for _ in range(rng.randint(1, 12))]
+            for _ in range(count)]
+
+def synthetic_catalog(catalog, copies, seed=0):
+    """Repeat a catalog's materials `copies` times with randomized pricing, as one brand per copy."""
+    rng = random.Random(seed)
+    materials = [m for brand in catalog.values() for m in brand["materials"]]
+    synthetic = {}
+    for copy in range(copies):
+        synthetic[f"brand-{copy}"] = {"materials": [
+            {**m, "price": rng.uniform(300, 900), "minPitch": rng.randint(0, 4), "maxPitch": rng.randint(8, 12),
+             "pitchThreshold": rng.randint(5, 9), "pricePerPitch": rng.uniform(0, 30)}
+            for m in materials
+        ]}
+    return synthetic
+
+def loop_quotes(catalog, roofs):
+    """Quote every roof with the per-material reference implementation."""
+    materials = [m for brand in catalog.values() for m in brand["materials"] if m.get("enabled", True)]
+    return [[quote_material(m, roof) for m in materials] for roof in roofs]
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare looped and vectorized roof quoting.")
+    parser.add_argument("--catalog", default=str(CATALOG_PATH), help="catalog JSON (default: output/all-companies.json)")
+    parser.add_argument("--roofs", type=int, default=2000, help="roofs to quote (default: 2000)")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 40],
+                        help="catalog sizes to try, as multiples of the real catalog (default: 1 10 40)")
+    args = parser.parse_args()
+
+    _, cold = timed(catalog_arrays, args.catalog)
+    _, warm = timed(catalog_arrays, args.catalog)
+    print(f"Catalog arrays: {cold * 1000:.2f}ms to build, {warm * 1000:.3f}ms memoized")
+
+    with open(args.catalog, 'r') as f:
+        catalog = json.load(f)
+    roofs = synthetic_roofs(args.roofs)
+    facets = sum(len(roof) for roof in roofs)
+    print(f"{args.roofs} roofs, {facets} facets")
+    print(f"{'materials':>10}{'loop s':>10}{'numpy s':>10}{'speedup':>10}  match")
+    for copies in args.copies:
+        synthetic = synthetic_catalog(catalog, copies)
+        arrays = CatalogArrays(synthetic)
+        expected, loop_time = timed(loop_quotes, synthetic, roofs)
+        quotes, numpy_time = timed(quote_roofs, roofs, arrays)
+        expected = np.array([[np.nan if q is None else q for q in row] for row in expected])
+        match = np.allclose(quotes, expected, equal_nan=True)
+        print(f"{len(arrays):>10}{loop_time:>10.3f}{numpy_time:>10.4f}{loop_time / numpy_time:>9.0f}x  {match}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import time
+import argparse
+import statistics
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+import requests
+from compile import OUTPUT_DIR
+from serve import CATALOG_PATH, IMAGES_PATH
+
+def scenarios(output_dir, image_count):
+    """The request mixes to measure: (name, [(path, headers), ...])."""
+    images = sorted(p.name for p in (output_dir / "images").glob("*.webp"))[:image_count]
+    image_requests = [(IMAGES_PATH + quote(name), {}) for name in images]
+    return [
+        ("catalog json", [(CATALOG_PATH, {"Accept-Encoding": "identity"})]),
+        ("catalog json, compressed", [(CATALOG_PATH, {"Accept-Encoding": "br, gzip"})]),
+        ("catalog json, revalidate", [(CATALOG_PATH, "revalidate")]),
+        ("images", image_requests),
+        ("image range", [(path, {"Range": "bytes=0-1023"}) for path, _ in image_requests[:1]]),
+    ]
+
+def run_scenario(base_url, requests_list, total, concurrency):
+    """Issue `total` requests cycling through requests_list on `concurrency` threads. Returns per-request stats."""
+    # Revalidation requests send back the ETag the server gave for the plain request
+    prepared = []
+    for path, headers in requests_list:
+        if headers == "revalidate":
+            etag = requests.get(base_url + path, headers={"Accept-Encoding": "identity"}).headers.get("ETag")
+            headers = {"Accept-Encoding": "identity", "If-None-Match": etag} if etag else {}
+        prepared.append((base_url + path, headers))
+
+    latencies = []
+    statuses = {}
+    received = [0]
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            url, headers = prepared[index % len(prepared)]
+            started = time.perf_counter()
+            # Count bytes as sent on the wire, before requests would decompress them
+            with session.get(url, headers=headers, stream=True) as response:
+                body = response.raw.read(decode_content=False)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                received[0] += len(body)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "bytes": received[0] / total,
+        "statuses": statuses,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare catalog servers (e.g. serve.py and server.js) on the same output.")
+    parser.add_argument("targets", nargs="+", metavar="NAME=URL",
+                        help="servers to compare, e.g. python=http://127.0.0.1:3001 node=http://127.0.0.1:3000")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario (default: 2000)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients (default: 16)")
+    parser.add_argument("--images", type=int, default=20, help="distinct images to request (default: 20)")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="compiled output directory, to pick image names")
+    args = parser.parse_args()
+
+    targets = [target.split("=", 1) for target in args.targets]
+    print(f"{'scenario':<28}{'server':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'bytes/req':>12}  statuses")
+    for name, requests_list in scenarios(Path(args.output_dir), args.images):
+        if not requests_list:
+            continue
+        for target_name, base_url in targets:
+            stats = run_scenario(base_url.rstrip("/"), requests_list, args.requests, args.concurrency)
+            statuses = ", ".join(f"{code}x{count}" for code, count in sorted(stats["statuses"].items()))
+            print(f"{name:<28}{target_name:<10}{stats['rps']:>10.0f}{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+                  f"{stats['bytes']:>12.0f}  {statuses}")
+
+if __name__ == "__main__":
+    main()
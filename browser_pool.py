@@ -0,0 +1,89 @@
+import queue
+import threading
+
+import requests
+from selenium.common.exceptions import WebDriverException
+
+class BrowserWorker:
+    """
+    One worker's resources: an HTTP session for static fetches and a browser that is only started when a page needs it.
+    A crashed browser is thrown away with reset() and replaced on the next call to driver().
+    """
+
+    def __init__(self, make_driver):
+        self._make_driver = make_driver
+        self._driver = None
+        self.session = requests.Session()
+
+    def driver(self):
+        if self._driver is None:
+            self._driver = self._make_driver()
+        return self._driver
+
+    def reset(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+            self._driver = None
+
+    def close(self):
+        self.reset()
+        self.session.close()
+
+class BrowserPool:
+    """
+    Runs page jobs on a pool of browser workers pulling from a shared work queue.
+
+    Each worker owns its own browser, so pages load in parallel. If a job fails with a WebDriverException
+    (the browser crashed or hung), the worker restarts its browser and retries the job, up to `max_attempts`
+    times in total. Results come back in the same order as the jobs.
+    """
+
+    def __init__(self, make_driver, workers=4, max_attempts=2):
+        self.make_driver = make_driver
+        self.workers = workers
+        self.max_attempts = max_attempts
+
+    def map(self, func, items):
+        """
+        Call func(worker, item) for every item and return a list of (result, error) pairs in item order.
+        error is None on success; otherwise it's the exception from the last attempt and result is None.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        jobs = queue.Queue()
+        for index, item in enumerate(items):
+            jobs.put((index, item))
+
+        def run():
+            worker = BrowserWorker(self.make_driver)
+            try:
+                while True:
+                    try:
+                        index, item = jobs.get_nowait()
+                    except queue.Empty:
+                        return
+                    results[index] = self._run_job(worker, func, item)
+            finally:
+                worker.close()
+
+        threads = [threading.Thread(target=run, name=f"browser-{i}") for i in range(min(self.workers, len(items)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _run_job(self, worker, func, item):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(worker, item), None
+            except WebDriverException as e:
+                print(f"Browser error on attempt {attempt}, restarting browser: {e.msg or e}")
+                worker.reset()
+                error = e
+            except Exception as e:
+                return None, e
+        return None, error
@@ -0,0 +1,251 @@
+import os
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+
+DB_PATH = Path("output") / "catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE brand (
+    id TEXT PRIMARY KEY,
+    company TEXT NOT NULL,
+    description TEXT NOT NULL,
+    logo_id INTEGER REFERENCES image_variant(id),
+    position INTEGER NOT NULL
+);
+CREATE TABLE material (
+    id INTEGER PRIMARY KEY,
+    brand_id TEXT NOT NULL REFERENCES brand(id),
+    material_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    headline TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price REAL NOT NULL,
+    waste REAL NOT NULL,
+    min_pitch REAL NOT NULL,
+    max_pitch REAL NOT NULL,
+    pitch_threshold REAL NOT NULL,
+    price_per_pitch REAL NOT NULL,
+    enabled INTEGER NOT NULL,
+    image_id INTEGER REFERENCES image_variant(id),
+    preview_image_id INTEGER REFERENCES image_variant(id),
+    custom_preview INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    extra TEXT NOT NULL,
+    UNIQUE (brand_id, material_id)
+);
+CREATE TABLE gallery_image (
+    material_id INTEGER NOT NULL REFERENCES material(id),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    image_id INTEGER REFERENCES image_variant(id),
+    preview_image_id INTEGER REFERENCES image_variant(id),
+    custom_preview INTEGER NOT NULL,
+    PRIMARY KEY (material_id, position)
+);
+CREATE TABLE image_variant (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    file_name TEXT,
+    format TEXT,
+    size INTEGER
+);
+CREATE INDEX material_brand ON material(brand_id);
+CREATE INDEX material_price ON material(price);
+CREATE INDEX material_pitch ON material(min_pitch, max_pitch);
+"""
+
+# Material fields stored in their own columns; anything else is kept in material.extra as JSON
+MATERIAL_COLUMNS = {
+    "id", "name", "headline", "description", "price", "waste", "minPitch", "maxPitch", "pitchThreshold",
+    "pricePerPitch", "enabled", "image", "primaryPreviewImage", "useCustomPrimaryPreview",
+    "galleryImages", "galleryImagesNames", "galleryPreviewImages", "useCustomGalleryPreviews",
+}
+
+def build_catalog_db(all_companies, db_path=DB_PATH, image_prefix="", images_dir=None):
+    """
+    Write the compiled catalog to a SQLite database in one transaction, replacing db_path atomically.
+    image_prefix and images_dir let image_variant rows record each image's output file name and size.
+    """
+    db_path = Path(db_path)
+    fd, temp_path = tempfile.mkstemp(dir=db_path.parent, prefix=".", suffix=".part")
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(temp_path)
+        try:
+            with connection:
+                connection.executescript(SCHEMA)
+                variants = {}
+
+                def image_id(url):
+                    if not url:
+                        return None
+                    if url not in variants:
+                        file_name = url[len(image_prefix):] if image_prefix and url.startswith(image_prefix) else None
+                        size = None
+                        if file_name and images_dir is not None:
+                            try:
+                                size = (Path(images_dir) / file_name).stat().st_size
+                            except FileNotFoundError:
+                                pass
+                        image_format = os.path.splitext(file_name or url)[1].lstrip(".").lower() or None
+                        cursor = connection.execute(
+                            "INSERT INTO image_variant (url, file_name, format, size) VALUES (?, ?, ?, ?)",
+                            (url, file_name, image_format, size))
+                        variants[url] = cursor.lastrowid
+                    return variants[url]
+
+                for brand_position, (brand_id, brand) in enumerate(all_companies.items()):
+                    connection.execute(
+                        "INSERT INTO brand (id, company, description, logo_id, position) VALUES (?, ?, ?, ?, ?)",
+                        (brand_id, brand.get("company", ""), brand.get("description", ""),
+                         image_id(brand.get("logo")), brand_position))
+
+                    for position, material in enumerate(brand.get("materials", [])):
+                        cursor = connection.execute(
+                            "INSERT INTO material (brand_id, material_id, name, headline, description, price, waste, "
+                            "min_pitch, max_pitch, pitch_threshold, price_per_pitch, enabled, image_id, "
+                            "preview_image_id, custom_preview, position, extra) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (brand_id, material["id"], material.get("name", ""), material.get("headline", ""),
+                             material.get("description", ""), float(material.get("price", 0)),
+                             float(material.get("waste", 0)), float(material.get("minPitch", 0)),
+                             float(material.get("maxPitch", 12)), float(material.get("pitchThreshold", 0)),
+                             float(material.get("pricePerPitch", 0)), bool(material.get("enabled", True)),
+                             image_id(material.get("image")), image_id(material.get("primaryPreviewImage")),
+                             bool(material.get("useCustomPrimaryPreview", False)), position,
+                             json.dumps({k: v for k, v in material.items() if k not in MATERIAL_COLUMNS})))
+                        material_rowid = cursor.lastrowid
+
+                        gallery = zip(material.get("galleryImages", []), material.get("galleryImagesNames", []),
+                                      material.get("galleryPreviewImages", []),
+                                      material.get("useCustomGalleryPreviews", []))
+                        connection.executemany(
+                            "INSERT INTO gallery_image (material_id, position, name, image_id, preview_image_id, "
+                            "custom_preview) VALUES (?, ?, ?, ?, ?, ?)",
+                            [(material_rowid, index, name, image_id(image), image_id(preview), bool(custom))
+                             for index, (image, name, preview, custom) in enumerate(gallery)])
+            connection.execute("ANALYZE")
+        finally:
+            connection.close()
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, db_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+class CatalogDB:
+    """
+    Read-only, memory-mapped view of the SQLite catalog compile writes next to all-companies.json.
+    Materials come back as dicts in the same shape as the catalog JSON, plus brand_id.
+    """
+
+    def __init__(self, db_path=DB_PATH, mmap_size=256 * 1024 * 1024):
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        self.connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def brands(self):
+        rows = self.connection.execute(
+            "SELECT brand.id, company, description, url AS logo FROM brand "
+            "LEFT JOIN image_variant ON image_variant.id = logo_id ORDER BY position")
+        return [dict(row) for row in rows]
+
+    def materials(self, brand_id=None, max_price=None, min_price=None, pitch=None, enabled_only=True, limit=None,
+                  with_gallery=False, material_id=None):
+        """
+        Query materials by brand, base price per square and a pitch they must support, cheapest first.
+        For example materials(brand_id="gaf", max_price=550, pitch=4).
+        """
+        conditions, parameters = [], []
+        if brand_id is not None:
+            conditions.append("brand_id = ?")
+            parameters.append(brand_id)
+        if material_id is not None:
+            conditions.append("material.material_id = ?")
+            parameters.append(material_id)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            parameters.append(max_price)
+        if min_price is not None:
+            conditions.append("price >= ?")
+            parameters.append(min_price)
+        if pitch is not None:
+            conditions.append("min_pitch <= ? AND max_pitch >= ?")
+            parameters.extend([pitch, pitch])
+        if enabled_only:
+            conditions.append("enabled")
+        query = (
+            "SELECT material.*, image.url AS image, preview.url AS preview_image FROM material "
+            "LEFT JOIN image_variant AS image ON image.id = material.image_id "
+            "LEFT JOIN image_variant AS preview ON preview.id = material.preview_image_id"
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY price, brand_id, position"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        return [self._material(row, with_gallery) for row in self.connection.execute(query, parameters)]
+
+    def material(self, brand_id, material_id):
+        """Return one material with its gallery, or None."""
+        results = self.materials(brand_id, enabled_only=False, with_gallery=True, material_id=material_id)
+        return results[0] if results else None
+
+    def _material(self, row, with_gallery):
+        material = {
+            "brand_id": row["brand_id"],
+            "id": row["material_id"],
+            "name": row["name"],
+            "headline": row["headline"],
+            "description": row["description"],
+            "price": row["price"],
+            "waste": row["waste"],
+            "minPitch": row["min_pitch"],
+            "maxPitch": row["max_pitch"],
+            "pitchThreshold": row["pitch_threshold"],
+            "pricePerPitch": row["price_per_pitch"],
+            "enabled": bool(row["enabled"]),
+            "image": row["image"] or "",
+            "primaryPreviewImage": row["preview_image"] or "",
+            "useCustomPrimaryPreview": bool(row["custom_preview"]),
+            **json.loads(row["extra"]),
+        }
+        if with_gallery:
+            gallery = self.connection.execute(
+                "SELECT name, image.url AS image, preview.url AS preview, custom_preview FROM gallery_image "
+                "LEFT JOIN image_variant AS image ON image.id = gallery_image.image_id "
+                "LEFT JOIN image_variant AS preview ON preview.id = gallery_image.preview_image_id "
+                "WHERE material_id = ? ORDER BY position", (row["id"],)).fetchall()
+            material["galleryImages"] = [g["image"] for g in gallery]
+            material["galleryImagesNames"] = [g["name"] for g in gallery]
+            material["galleryPreviewImages"] = [g["preview"] for g in gallery]
+            material["useCustomGalleryPreviews"] = [bool(g["custom_preview"]) for g in gallery]
+        return material
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Query the compiled SQLite catalog.")
+    parser.add_argument("--brand", help="only materials from this brand id")
+    parser.add_argument("--max-price", type=float, help="highest base price per square")
+    parser.add_argument("--pitch", type=float, help="pitch the material must support, as rise per 12")
+    parser.add_argument("--db", default=str(DB_PATH), help="database file (default: output/catalog.sqlite)")
+    args = parser.parse_args()
+
+    with CatalogDB(args.db) as db:
+        for material in db.materials(args.brand, args.max_price, pitch=args.pitch):
+            print(f"${material['price']:>8,.2f}/sq  {material['minPitch']:g}-{material['maxPitch']:g}/12  "
+                  f"{material['brand_id']}/{material['id']}")
@@ -1,31 +1,55 @@
 import os
 import json
+import gzip
 import shutil
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from PIL import Image
+from PIL import Image, features
 import io
+import numpy as np
+from storage import FileStore, PrefetchedStore, IMAGE_EXTENSIONS, DEFAULT_PREFETCH_WORKERS, open_store
+from eligibility import build_eligibility_index
+from palette import dominant_colors, build_color_index
+from similarity import image_features, build_similarity_index, FEATURE_DIMENSIONS
+from descriptions import description_artifacts, description_hash
+from image_scheduler import ImageJob, MemoryScheduler, estimate_footprint, DEFAULT_MEMORY_BUDGET, DEFAULT_WORKERS, MB
+from catalog_db import build_catalog_db
+from image_store import ImageStore
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Configuration
 DATA_DIR = Path("data")
-BRANDS_DIR = DATA_DIR / "brands"
 OUTPUT_DIR = Path("output")
-IMAGES_DIR = OUTPUT_DIR / "images"
-OUTPUT_JSON_PATH = OUTPUT_DIR / "all-companies.json"
 IMAGE_PREFIX = "https://catalog.sky-quote.com/RoofingMaterials/Images/"
 
 # Supported image file extensions
-SUPPORTED_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tiff"]
+SUPPORTED_IMAGE_EXTENSIONS = IMAGE_EXTENSIONS
+
+# Quality of the compiled WebP images
+WEBP_QUALITY = 90
+
+# Everything that decides the encoded bytes, which shared images are keyed by (see image_store.py)
+ENCODER_SETTINGS = f"webp quality={WEBP_QUALITY} libwebp={features.version('webp')}"
 
-# Track copied files to avoid duplicates
-copied_files = {}
+# Shared image store used by --catalogs when the catalogs file doesn't name one
+DEFAULT_IMAGE_STORE = Path("image-store")
 
-# Track which images are used in current compilation
-used_images = set()
+# Precompressed variants written next to the catalog JSON, by Content-Encoding
+COMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
 
-# Track size statistics
-total_original_size = 0
-total_webp_size = 0
-total_images_processed = 0
+def image_version(file_hash):
+    """
+    Short hash of a compiled image's source and encoder settings. Output images are named <name>.<version>.webp,
+    so a name's content never changes and servers can let clients cache it forever (see serve.cache_control_for).
+    """
+    return hashlib.sha256(f"{file_hash}|{ENCODER_SETTINGS}".encode()).hexdigest()[:16]
 
 def clean_string(text):
     """Clean up a string by removing leading/trailing whitespace."""
@@ -33,352 +57,1084 @@ def clean_string(text):
         return ""
     return text.strip()
 
-def ensure_directories():
-    """Create output directories if they don't exist."""
-    OUTPUT_DIR.mkdir(exist_ok=True)
-    IMAGES_DIR.mkdir(exist_ok=True)
+def empty_build_cache():
+    return {"brands": {}, "materials": {}, "images": {}, "palettes": {}, "features": {}, "descriptions": {}}
 
-def scan_existing_images():
-    """Scan existing images in the output directory and return a set of their filenames."""
-    existing_images = set()
-    if IMAGES_DIR.exists():
-        for img_path in IMAGES_DIR.glob("*.webp"):
-            existing_images.add(img_path.name)
-    return existing_images
-
-def copy_image(source_path, file_name):
+class Compiler:
     """
-    Copy an image to the output images directory with a unique filename.
-    Returns the new path with the image prefix.
-    Handles duplicates by reusing existing files.
-    Converts images to WebP format at 90% quality.
-    Tracks size reduction statistics.
+    Compiles the brands in a store into a single catalog JSON file plus WebP images.
+    The store defaults to the brands data tree under data_dir (see storage.py for the SQLite store).
+
+    All paths, the store and the image URL prefix are injected, and everything a build tracks
+    (copied files, used images, size statistics) lives on the instance, so several
+    compilers can run side by side and one instance can be reused for many builds.
+    State that stays valid between builds, like source file hashes and which images
+    were already encoded from which source, is kept so that rebuilding a single
+    material in a long-lived process only re-encodes images whose source changed.
     """
-    global total_original_size, total_webp_size, total_images_processed
-    
-    # Check if file exists
-    if not source_path.exists():
-        print(f"Warning: Image not found: {source_path}")
-        return None
-    
-    # Get original file size
-    original_size = os.path.getsize(source_path)
-    
-    # Create a hash of the file content to detect duplicates
-    with open(source_path, "rb") as f:
-        file_content = f.read()
-        import hashlib
-        file_hash = hashlib.md5(file_content).hexdigest()
-    
-    # If we've already copied this exact file, return the existing URL
-    if file_hash in copied_files:
-        return copied_files[file_hash]
-    
-    # Create a unique filename with webp extension
-    unique_name = f"{file_name}.webp"
-    dest_path = IMAGES_DIR / unique_name
-    
-    # Add to used images tracking
-    used_images.add(unique_name)
-    
-    # Convert to WebP and save
-    try:
+
+    def __init__(self, data_dir=DATA_DIR, output_dir=OUTPUT_DIR, image_prefix=IMAGE_PREFIX, incremental=False, log=print,
+                 store=None, split_descriptions=False, image_workers=DEFAULT_WORKERS, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 discovery_workers=DEFAULT_PREFETCH_WORKERS, image_store=None):
+        self.data_dir = Path(data_dir)
+        self.store = store if store is not None else FileStore(self.data_dir / "brands")
+        # Watch mode and scraped-image ingest work on the files store's directory tree
+        self.brands_dir = self.store.brands_dir if isinstance(self.store, FileStore) else self.data_dir / "brands"
+        self.output_dir = Path(output_dir)
+        self.images_dir = self.output_dir / "images"
+        self.descriptions_dir = self.output_dir / "descriptions"
+        self.output_json_path = self.output_dir / "all-companies.json"
+        self.build_cache_path = self.output_dir / ".build-cache.json"
+        self.manifest_path = self.output_dir / "manifest.json"
+        self.eligibility_index_path = self.output_dir / "eligibility-index.json"
+        self.color_index_path = self.output_dir / "color-index.json"
+        self.similarity_index_path = self.output_dir / "similarity-index.json"
+        self.similarity_vectors_path = self.output_dir / "similarity-vectors.npy"
+        self.catalog_db_path = self.output_dir / "catalog.sqlite"
+        self.build_report_path = self.output_dir / "build-report.json"
+        self.image_prefix = image_prefix
+        self.incremental = incremental
+        self.log = log
+        # Publish descriptions as separate files named by content hash instead of inline in the catalog JSON
+        self.split_descriptions = split_descriptions
+        # Image conversions run on this scheduler while materials compile; the catalog is written once they're done
+        self.image_scheduler = MemoryScheduler(memory_budget, image_workers)
+        # Full builds read brand and material metadata ahead on this many threads (0 reads it in the compile loop)
+        self.discovery_workers = discovery_workers
+        # Content-addressed store of encoded images shared with other catalogs, or None to encode into images/ only
+        self.image_store = image_store
+
+        # Source file hashes, keyed by (path, size, mtime) so unchanged files aren't re-read
+        self._hash_cache = {}
+
+        # Signatures and compiled entries from previous builds; loaded lazily from disk
+        self.build_cache = None
+
+        self.reset()
+
+    def reset(self):
+        """Clear the state tracked during a single build."""
+        # Track copied files to avoid duplicates
+        self.copied_files = {}
+
+        # Track which images are used in current compilation
+        self.used_images = set()
+
+        # Track size statistics
+        self.total_original_size = 0
+        self.total_webp_size = 0
+        self.total_images_processed = 0
+        self.encode_seconds = 0.0
+        self.images_unchanged = 0
+        self.shared_images_linked = 0
+        self.shared_bytes_linked = 0
+
+        # Image conversions of this build (started with the first one), and the scheduler's report of the last run
+        self.image_queue = None
+        self.image_report = None
+
+        # URLs handed out for images whose conversion failed; dropped from the catalog before it's written
+        self.failed_image_urls = set()
+
+    def ensure_directories(self):
+        """Create output directories if they don't exist."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.images_dir.mkdir(exist_ok=True)
+
+    def scan_existing_images(self):
+        """Scan existing images in the output directory and return a set of their filenames."""
+        existing_images = set()
+        if self.images_dir.exists():
+            for img_path in self.images_dir.glob("*.webp"):
+                existing_images.add(img_path.name)
+        return existing_images
+
+    def file_hash(self, source_path):
+        """Return the MD5 of a file's content, reusing the previous hash if the file is unchanged."""
+        stat = source_path.stat()
+        key = (str(source_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hash_cache:
+            with open(source_path, "rb") as f:
+                self._hash_cache[key] = hashlib.file_digest(f, "md5").hexdigest()
+        return self._hash_cache[key]
+
+    def copy_image(self, source_path, file_name):
+        """
+        Copy an image to the output images directory with a unique filename.
+        Returns the new path with the image prefix.
+        Handles duplicates by reusing existing files.
+        Converts images to WebP format at WEBP_QUALITY, as a job on the image scheduler.
+        Tracks size reduction statistics.
+        """
+        # Check if file exists
+        if not source_path.exists():
+            self.log(f"Warning: Image not found: {source_path}")
+            return None
+
+        # Get original file size
+        original_size = os.path.getsize(source_path)
+
+        # Create a hash of the file content to detect duplicates
+        file_hash = self.file_hash(source_path)
+
+        # If we've already copied this exact file, return the existing URL
+        if file_hash in self.copied_files:
+            return self.copied_files[file_hash]
+
+        # Create a unique filename with webp extension, named by content so it can be cached as immutable
+        unique_name = f"{file_name}.{image_version(file_hash)}.webp"
+        dest_path = self.images_dir / unique_name
+        url = f"{self.image_prefix}{unique_name}"
+
+        # Add to used images tracking
+        self.used_images.add(unique_name)
+
+        # Skip encoding if this output was already encoded from the same source
+        if self.build_cache["images"].get(unique_name) == file_hash and dest_path.exists():
+            self.images_unchanged += 1
+            self.copied_files[file_hash] = url
+            return url
+
+        # Link the image from the shared store if another catalog or an earlier build encoded it already
+        blob_key = self.image_store.key(file_hash, ENCODER_SETTINGS) if self.image_store else None
+        if blob_key and self.image_store.has(blob_key):
+            try:
+                self.image_store.link(blob_key, dest_path)
+                self.shared_images_linked += 1
+                self.shared_bytes_linked += os.path.getsize(dest_path)
+                self.build_cache["images"][unique_name] = file_hash
+                self.copied_files[file_hash] = url
+                return url
+            except OSError as e:
+                self.log(f"Warning: Couldn't link {unique_name} from the shared image store, encoding it: {e}")
+
+        # Read the header only, to estimate the conversion's memory
+        try:
+            with Image.open(source_path) as img:
+                estimate = estimate_footprint(img)
+                width, height = img.size
+                mode = img.mode
+        except Exception as e:
+            self.log(f"Error converting {source_path} to WebP: {e}")
+            return None
+
+        if self.image_queue is None:
+            self.log(f"Converting images on up to {self.image_scheduler.workers} workers "
+                     f"within {self.image_scheduler.budget / MB:.0f}MB")
+            self.image_queue = self.image_scheduler.start(on_done=self.image_job_done)
+        self.image_queue.add(ImageJob(
+            unique_name, lambda: self.convert_image(source_path, dest_path, blob_key), estimate,
+            source=str(source_path), width=width, height=height, mode=mode, originalSize=original_size,
+            fileHash=file_hash))
+
+        # The URL is known now; the image is written by the job, and the URL dropped again if that fails
+        self.copied_files[file_hash] = url
+
+        # Return the path with prefix
+        return url
+
+    def convert_image(self, source_path, dest_path, blob_key=None):
+        """
+        Decode a source image and write it as WebP, into the shared image store first if there is one.
+        Runs on the image scheduler's worker threads. Returns the encoded size.
+        """
         with Image.open(source_path) as img:
-            img.save(dest_path, format="WEBP", quality=90)
-            
-        # Get the new file size
-        webp_size = os.path.getsize(dest_path)
-        
+            if blob_key is None:
+                self.encode_webp(img, dest_path)
+            else:
+                blob_path = self.image_store.path(blob_key)
+                blob_path.parent.mkdir(exist_ok=True)
+                self.encode_webp(img, blob_path)
+        if blob_key is not None:
+            self.image_store.link(blob_key, dest_path)
+        return os.path.getsize(dest_path)
+
+    def image_job_done(self, job):
+        """Record a finished conversion job: statistics, log line and build cache entry. Runs on the scheduler's thread."""
+        if job.error is not None:
+            self.log(f"Error converting {job.info['source']} to WebP: {job.error}")
+            url = f"{self.image_prefix}{job.name}"
+            self.failed_image_urls.add(url)
+            self.used_images.discard(job.name)
+            # Later duplicates of this source get a conversion of their own instead of the dead URL
+            if self.copied_files.get(job.info["fileHash"]) == url:
+                del self.copied_files[job.info["fileHash"]]
+            return
+        original_size = job.info["originalSize"]
+        webp_size = job.result
+        self.encode_seconds += job.seconds
+
         # Update statistics
-        total_original_size += original_size
-        total_webp_size += webp_size
-        total_images_processed += 1
-        
+        self.total_original_size += original_size
+        self.total_webp_size += webp_size
+        self.total_images_processed += 1
+
         # Log individual file stats
         size_reduction = original_size - webp_size
         reduction_percentage = (size_reduction / original_size) * 100 if original_size > 0 else 0
-        print(f"Converted: {source_path.name} → {unique_name} | Size: {original_size/1024:.1f}KB → {webp_size/1024:.1f}KB | Saved: {size_reduction/1024:.1f}KB ({reduction_percentage:.1f}%)")
-    except Exception as e:
-        print(f"Error converting {source_path} to WebP: {e}")
+        self.log(f"Converted: {Path(job.info['source']).name} → {job.name} | Size: {original_size/1024:.1f}KB → {webp_size/1024:.1f}KB | Saved: {size_reduction/1024:.1f}KB ({reduction_percentage:.1f}%)")
+
+        self.build_cache["images"][job.name] = job.info["fileHash"]
+
+    def finish_image_jobs(self):
+        """
+        Wait for this build's image conversions on the memory-budgeted scheduler (see image_scheduler.py) and
+        write the build report, with each job's size, memory estimate, measured peak RSS and duration.
+        """
+        queue, self.image_queue = self.image_queue, None
+        if queue is None:
+            return
+        summary = queue.finish()
+        self.image_report = {**summary, "jobs": [job.record() for job in queue.jobs]}
+
+    def drop_failed_images(self, all_companies):
+        """
+        Remove the URLs of images whose conversion failed from the compiled catalog (and the build cache entries
+        that share its dicts), as if copy_image had returned None for them: image fields become None and gallery
+        entries without their image are dropped.
+        """
+        failed = self.failed_image_urls
+        if not failed:
+            return
+        gallery_fields = ("galleryImages", "galleryImagesNames", "galleryPreviewImages", "useCustomGalleryPreviews",
+                          "galleryColors")
+        for brand_id, brand in all_companies.items():
+            if brand.get('logo') in failed:
+                brand['logo'] = None
+                cached = self.build_cache["brands"].get(brand_id)
+                if cached:
+                    cached["logo"] = None
+            for material in brand['materials']:
+                for key in ('image', 'primaryPreviewImage'):
+                    if material.get(key) in failed:
+                        material[key] = None
+                keep = [i for i, url in enumerate(material.get('galleryImages', [])) if url not in failed]
+                if len(keep) < len(material.get('galleryImages', [])):
+                    for key in gallery_fields:
+                        if key in material:
+                            material[key] = [material[key][i] for i in keep]
+                if 'galleryPreviewImages' in material:
+                    material['galleryPreviewImages'] = [None if url in failed else url
+                                                        for url in material['galleryPreviewImages']]
+
+    def storage_report(self):
+        """How this build got its images: encoded, linked from the shared image store, or unchanged from the last build."""
+        return {
+            "imagesEncoded": self.total_images_processed,
+            "encodedMB": round(self.total_webp_size / MB, 2),
+            "encodeSeconds": round(self.encode_seconds, 2),
+            "imagesLinked": self.shared_images_linked,
+            "linkedMB": round(self.shared_bytes_linked / MB, 2),
+            "imagesUnchanged": self.images_unchanged,
+            "imageStore": str(self.image_store) if self.image_store else None,
+        }
+
+    def write_build_report(self):
+        with open(self.build_report_path, 'w') as f:
+            json.dump({"storage": self.storage_report(), "images": self.image_report}, f, indent=2)
+
+    def encode_webp(self, img, dest_path):
+        """
+        Encode to a temporary file and rename it into place, so no path is ever half-written and output images
+        hard-linked from the shared image store are replaced instead of written through.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=Path(dest_path).parent, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                img.save(f, format="WEBP", quality=WEBP_QUALITY)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def output_image_name(self, source_path):
+        """
+        Return the output image name (without the version and .webp) that compiling would give a source image in the brands tree,
+        or None if the path isn't a material or gallery image.
+        """
+        try:
+            parts = Path(source_path).resolve().relative_to(self.brands_dir.resolve()).parts
+        except ValueError:
+            return None
+        if len(parts) < 4 or parts[1] != "materials":
+            return None
+        brand_id, material_id, stem = parts[0], parts[2], Path(parts[-1]).stem
+
+        if len(parts) == 4:
+            for kind in ("main", "preview"):
+                if stem == f"{material_id}_{kind}":
+                    return f"{brand_id}_{material_id}_{kind}"
+        elif len(parts) == 5 and parts[3] == "gallery":
+            prefix, _, index = stem.removesuffix("_preview").rpartition("_")
+            if prefix and index.isdigit():
+                kind = "gallery_preview" if stem.endswith("_preview") else "gallery"
+                return f"{brand_id}_{material_id}_{kind}_{int(index)}"
         return None
-    
-    # Store the URL with the file hash
-    url = f"{IMAGE_PREFIX}{unique_name}"
-    copied_files[file_hash] = url
-    
-    # Return the path with prefix
-    return url
-
-def load_description(material_dir):
-    """Load HTML description from a file."""
-    description_path = material_dir / "description.html"
-    if description_path.exists():
-        with open(description_path, 'r') as f:
-            return f.read()
-    return ""
-
-def find_image_file(directory, base_name):
-    """Find an image file with any supported extension."""
-    for ext in SUPPORTED_IMAGE_EXTENSIONS:
-        path = directory / f"{base_name}{ext}"
+
+    def emit_image(self, source_path, img, file_hash):
+        """
+        Encode the compiled WebP for a source image that is already decoded in memory, such as one being
+        ingested by the scraper, and record it in the build cache so the next incremental build reuses it
+        instead of decoding the source again. file_hash is the MD5 of the source file's bytes.
+        Returns the output file name, or None if the image isn't one the compiler would output.
+        """
+        name = self.output_image_name(source_path)
+        if name is None:
+            return None
+        unique_name = f"{name}.{image_version(file_hash)}.webp"
+        dest_path = self.images_dir / unique_name
+        if self.build_cache["images"].get(unique_name) != file_hash or not dest_path.exists():
+            self.encode_webp(img, dest_path)
+            self.build_cache["images"][unique_name] = file_hash
+        return unique_name
+
+    def image_palette(self, source_path):
+        """
+        Return the dominant colors of a source image (see palette.py), cached in the build cache by the
+        source's content hash so unchanged images are only analysed once.
+        """
+        file_hash = self.file_hash(source_path)
+        palette = self.build_cache["palettes"].get(file_hash)
+        if palette is None:
+            try:
+                with Image.open(source_path) as img:
+                    palette = dominant_colors(img)
+            except Exception as e:
+                self.log(f"Error extracting colors from {source_path}: {e}")
+                return []
+            self.build_cache["palettes"][file_hash] = palette
+        return palette
+
+    def compile_description(self, html):
+        """
+        Return the sanitized, minified HTML, plain-text excerpt and word count of a description (see descriptions.py),
+        cached in the build cache by the raw description's content hash.
+        """
+        key = description_hash(html)
+        artifacts = self.build_cache["descriptions"].get(key)
+        if artifacts is None:
+            artifacts = description_artifacts(html)
+            self.build_cache["descriptions"][key] = artifacts
+        return artifacts
+
+    def split_description(self, material):
+        """
+        Write a compiled material's description to descriptions/<hash>.html and return a copy of the material
+        that refers to the file with descriptionFile (a path relative to the catalog JSON) in its place.
+        """
+        html = material.get('description', "")
+        relative_path = f"descriptions/{description_hash(html)[:16]}.html"
+        path = self.output_dir / relative_path
+        if not path.exists():
+            self.descriptions_dir.mkdir(exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(html)
+        return {('descriptionFile' if k == 'description' else k): (relative_path if k == 'description' else v)
+                for k, v in material.items()}
+
+    def inline_description(self, material):
+        """Undo split_description: return a copy of the material with the description read back from its file."""
+        path = self.output_dir / material['descriptionFile']
+        html = ""
         if path.exists():
-            return path
-    return None
-
-def process_gallery_images(gallery_dir, material_id, main_image_name=""):
-    """Process gallery images and return gallery data."""
-    gallery_images = []
-    gallery_preview_images = []
-    gallery_names = []
-    use_custom_previews = []
-    
-    # Find all gallery images (that don't end with _preview)
-    main_images = []
-    for ext in SUPPORTED_IMAGE_EXTENSIONS:
-        main_images.extend([img for img in gallery_dir.glob(f"*{ext}") 
-                       if not img.stem.endswith('_preview')])
-    
-    # Sort by index
-    def get_index(path):
-        parts = path.stem.split('_')
-        return int(parts[-1]) if parts and parts[-1].isdigit() else 0
-    
-    main_images.sort(key=get_index)
-    
-    # Create a dictionary to track duplicate named images
-    image_names_dict = {}  # Maps image name to its index in the arrays
-    
-    for img_path in main_images:
-        # Get the index from the filename
-        parts = img_path.stem.split('_')
-        if parts and parts[-1].isdigit():
-            index = int(parts[-1])
-            image_prefix = img_path.stem.rsplit('_', 1)[0]
-            
-            # Get image name/caption
-            name_path = gallery_dir / f"{image_prefix}_{index}_name.txt"
-            image_name = ""
-            if name_path.exists():
-                with open(name_path, 'r') as f:
-                    image_name = clean_string(f.read())
-            
+            with open(path, 'r') as f:
+                html = f.read()
+        return {('description' if k == 'descriptionFile' else k): (html if k == 'descriptionFile' else v)
+                for k, v in material.items()}
+
+    def catalog_json(self, all_companies):
+        """Return the catalog as written to the JSON file, with descriptions split out if enabled."""
+        if not self.split_descriptions:
+            return all_companies
+        return {
+            brand_id: {**brand, 'materials': [self.split_description(m) for m in brand['materials']]}
+            for brand_id, brand in all_companies.items()
+        }
+
+    def material_features(self, material):
+        """
+        Return the similarity feature vector of a compiled material, from its preview or else its main output image,
+        or None if it has neither. Vectors are cached by the content hash of the image's source.
+        """
+        names = self.image_names([material.get('primaryPreviewImage') or material.get('image')])
+        if not names or not (self.images_dir / names[0]).exists():
+            return None
+        file_hash = self.build_cache["images"].get(names[0])
+        if file_hash in self.build_cache["features"]:
+            return np.array(self.build_cache["features"][file_hash], dtype=np.float32)
+        try:
+            with Image.open(self.images_dir / names[0]) as img:
+                vector = image_features(img)
+        except Exception as e:
+            self.log(f"Error computing features of {names[0]}: {e}")
+            return None
+        if file_hash:
+            self.build_cache["features"][file_hash] = [round(float(v), 6) for v in vector]
+        return vector
+
+    def write_similarity_index(self, all_companies):
+        """Write every enabled material's feature vector as one float32 array, and the nearest-neighbor index."""
+        materials = []
+        vectors = []
+        for brand_id, brand in all_companies.items():
+            for material in brand['materials']:
+                if not material.get('enabled', True):
+                    continue
+                vector = self.material_features(material)
+                if vector is not None:
+                    materials.append([brand_id, material['id'], material.get('name', material['id'])])
+                    vectors.append(vector)
+        vectors = np.array(vectors, dtype=np.float32).reshape(-1, FEATURE_DIMENSIONS)
+        np.save(self.similarity_vectors_path, vectors)
+        with open(self.similarity_index_path, 'w') as f:
+            json.dump(build_similarity_index(materials, vectors), f, separators=(",", ":"))
+
+    def load_build_cache(self):
+        """Load signatures and compiled entries recorded by the previous build."""
+        cache = empty_build_cache()
+        if self.build_cache_path.exists():
+            try:
+                with open(self.build_cache_path, 'r') as f:
+                    cache.update(json.load(f))
+            except (OSError, ValueError) as e:
+                self.log(f"Warning: Ignoring unreadable build cache: {e}")
+        return cache
+
+    def save_build_cache(self):
+        """Write the build cache for the next incremental build."""
+        with open(self.build_cache_path, 'w') as f:
+            json.dump(self.build_cache, f)
+
+    def image_names(self, urls):
+        """Return the output image filenames referenced by a list of image URLs."""
+        return [url[len(self.image_prefix):] for url in urls if url and url.startswith(self.image_prefix)]
+
+    def material_image_names(self, material):
+        """Return the output image filenames a compiled material refers to."""
+        urls = [material.get('image'), material.get('primaryPreviewImage')]
+        urls += material.get('galleryImages', []) + material.get('galleryPreviewImages', [])
+        return self.image_names(urls)
+
+    def reuse_cached(self, entry, signature, names):
+        """
+        Check whether a cached build entry can be reused instead of recompiling.
+        The source signature must match and every output image it refers to must still exist.
+        Reused images are marked as used so they aren't reported as stale.
+        """
+        if not self.incremental or not entry or entry.get("signature") != signature:
+            return False
+        if not all((self.images_dir / name).exists() for name in names):
+            return False
+        self.used_images.update(names)
+        return True
+
+    @contextmanager
+    def prefetching(self):
+        """
+        Within the block, self.store is a PrefetchedStore that reads brand and material metadata ahead on
+        discovery_workers threads, so the compile loop (and the image conversions it starts) rarely waits on
+        the store. Source images of materials that will be recompiled are hashed ahead as well.
+        """
+        if not self.discovery_workers:
+            yield
+            return
+        store = self.store
+        with PrefetchedStore(store, self.discovery_workers, on_material=self.prefetch_images) as prefetched:
+            self.store = prefetched
+            try:
+                yield
+            finally:
+                self.store = store
+
+    def prefetch_images(self, brand_id, material_id, prefetched):
+        """Hash a prefetched material's source images, unless the build cache will be used for it."""
+        cached = self.build_cache["materials"].get(f"{brand_id}/{material_id}")
+        if self.incremental and cached and cached.get("signature") == prefetched["signature"]:
+            return
+        paths = [prefetched["main"], prefetched["preview"]]
+        paths += [path for entry in prefetched["gallery"] for path in (entry["image"], entry["preview"])]
+        for path in paths:
+            if path and path.exists():
+                self.file_hash(path)
+
+    def process_gallery_images(self, brand_id, material_id, main_image_name=""):
+        """Process gallery images and return gallery data."""
+        gallery_images = []
+        gallery_preview_images = []
+        gallery_names = []
+        use_custom_previews = []
+        gallery_colors = []
+
+        # Create a dictionary to track duplicate named images
+        image_names_dict = {}  # Maps image name to its index in the arrays
+
+        # Gallery entries come ordered by index
+        for entry in self.store.gallery(brand_id, material_id):
+            index = entry["index"]
+            image_name = clean_string(entry["name"])
+
             # Skip this gallery image if it has the same name as the main image
             if main_image_name and image_name == main_image_name:
-                print(f"Skipping gallery image that duplicates main image: '{image_name}'")
+                self.log(f"Skipping gallery image that duplicates main image: '{image_name}'")
                 continue
-                
+
             # Copy the main image
-            unique_id = f"{material_id}_gallery_{index}"
-            new_path = copy_image(img_path, unique_id)
+            unique_id = f"{brand_id}_{material_id}_gallery_{index}"
+            new_path = self.copy_image(entry["image"], unique_id)
             if not new_path:
                 continue
-            
+
             # Check for custom preview
-            preview_found = False
-            for ext in SUPPORTED_IMAGE_EXTENSIONS:
-                preview_path = gallery_dir / f"{image_prefix}_{index}_preview{ext}"
-                if preview_path.exists():
-                    preview_found = True
-                    preview_unique_id = f"{material_id}_gallery_preview_{index}"
-                    preview_path = copy_image(preview_path, preview_unique_id)
-                    preview_image = preview_path
-                    custom_preview = True
-                    break
-                    
-            if not preview_found:
+            if entry["preview"]:
+                preview_unique_id = f"{brand_id}_{material_id}_gallery_preview_{index}"
+                preview_image = self.copy_image(entry["preview"], preview_unique_id)
+                custom_preview = True
+            else:
                 # Use main image as preview
                 preview_image = new_path
                 custom_preview = False
-            
+
             # Check if we already have an image with this name
             if image_name in image_names_dict:
-                # Update existing entry with this image as an alternative
-                existing_idx = image_names_dict[image_name]
-                print(f"Found duplicate image name: '{image_name}' - skipping")
+                self.log(f"Found duplicate image name: '{image_name}' - skipping")
                 continue
+
+            # Add the new image
+            image_names_dict[image_name] = len(gallery_images)
+            gallery_images.append(new_path)
+            gallery_preview_images.append(preview_image)
+            gallery_names.append(image_name)
+            use_custom_previews.append(custom_preview)
+            # A custom preview is the color swatch; otherwise the colors come from the image itself
+            gallery_colors.append(self.image_palette(entry["preview"] or entry["image"]))
+
+        return {
+            "galleryImages": gallery_images,
+            "galleryImagesNames": gallery_names,
+            "galleryPreviewImages": gallery_preview_images,
+            "useCustomGalleryPreviews": use_custom_previews,
+            "galleryColors": gallery_colors
+        }
+
+    def process_material(self, brand_id, material_id):
+        """
+        Process a material in the store and return the material data.
+        In incremental mode an unchanged material is returned from the build cache without touching its images.
+        """
+        cache_key = f"{brand_id}/{material_id}"
+        signature = self.store.material_signature(brand_id, material_id)
+        cached = self.build_cache["materials"].get(cache_key)
+        if cached and self.reuse_cached(cached, signature, self.material_image_names(cached["material"])):
+            self.log(f"Unchanged: {cache_key}")
+            return cached["material"]
+
+        self.log(f"Compiling material: {cache_key}")
+        material = self.compile_material_entry(brand_id, material_id)
+        if material:
+            self.build_cache["materials"][cache_key] = {"signature": signature, "material": material}
+        return material
+
+    def compile_material_entry(self, brand_id, material_id):
+        """Compile a material's config, description and images into its catalog entry."""
+        stored = self.store.load_material(brand_id, material_id)
+        if not stored:
+            self.log(f"Warning: No config found for material: {brand_id}/{material_id}")
+            return None
+
+        # The stored config, without the ID and description the store adds
+        description = stored.pop('description', "")
+        material = {k: v for k, v in stored.items() if k != 'id'}
+
+        # Clean up all string fields
+        for key, value in material.items():
+            if isinstance(value, str):
+                material[key] = clean_string(value)
+
+        # Add ID and the compiled description
+        artifacts = self.compile_description(description)
+        material['id'] = material_id
+        material['description'] = artifacts['html']
+        material['descriptionExcerpt'] = artifacts['excerpt']
+        material['descriptionWordCount'] = artifacts['wordCount']
+
+        # Process main image - look for any supported extension
+        main_image_path = self.store.find_image(brand_id, material_id, "main")
+        if main_image_path:
+            material['image'] = self.copy_image(main_image_path, f"{brand_id}_{material_id}_main")
+        else:
+            # Skip placeholder creation
+            material['image'] = ""
+            self.log(f"Warning: No main image for material: {material_id}")
+
+        # Get main image name/label if available
+        main_image_name = clean_string(self.store.caption(brand_id, material_id, "main"))
+
+        # Process preview image - look for any supported extension
+        preview_image_path = self.store.find_image(brand_id, material_id, "preview")
+        if preview_image_path:
+            material['primaryPreviewImage'] = self.copy_image(preview_image_path, f"{brand_id}_{material_id}_preview")
+            material['useCustomPrimaryPreview'] = True
+        else:
+            material['primaryPreviewImage'] = material['image']
+            material['useCustomPrimaryPreview'] = False
+
+        # Dominant colors, from the preview (usually a swatch) or else the main image
+        color_source = preview_image_path or main_image_path
+        material['colors'] = self.image_palette(color_source) if color_source else []
+
+        # Process gallery
+        material.update(self.process_gallery_images(brand_id, material_id, main_image_name))
+
+        # Set default values for compatibility
+        material.setdefault('simpleMode', False)  # Advanced mode by default
+        material.setdefault('enabled', True)
+
+        return material
+
+    def process_brand(self, brand_id):
+        """Process a brand in the store and return the brand data."""
+        brand = self.process_brand_config(brand_id)
+        if not brand:
+            return None
+
+        # Process materials
+        materials = []
+        for material_id in self.store.material_ids(brand_id):
+            material = self.process_material(brand_id, material_id)
+            if material:
+                materials.append(material)
+
+        brand['materials'] = materials
+        return brand
+
+    def process_brand_config(self, brand_id):
+        """Load a brand's config and logo, without its materials."""
+        stored = self.store.load_brand(brand_id)
+        if not stored:
+            self.log(f"Warning: No config found for brand: {brand_id}")
+            return None
+        brand = {k: v for k, v in stored.items() if k != 'id'}
+
+        # Clean up all string fields
+        for key, value in brand.items():
+            if isinstance(value, str):
+                brand[key] = clean_string(value)
+
+        # Add ID
+        brand['id'] = brand_id
+
+        # Process logo - look for any supported extension, reusing the previous build's logo if nothing changed
+        signature = self.store.brand_signature(brand_id)
+        cached = self.build_cache["brands"].get(brand_id)
+        if cached and self.reuse_cached(cached, signature, self.image_names([cached["logo"]])):
+            brand['logo'] = cached["logo"]
+        else:
+            logo_path = self.store.find_image(brand_id, None, "logo")
+            if logo_path:
+                brand['logo'] = self.copy_image(logo_path, f"{brand_id}_logo")
             else:
-                # Add the new image
-                image_names_dict[image_name] = len(gallery_images)
-                gallery_images.append(new_path)
-                gallery_preview_images.append(preview_image)
-                gallery_names.append(image_name)
-                use_custom_previews.append(custom_preview)
-    
-    return {
-        "galleryImages": gallery_images,
-        "galleryImagesNames": gallery_names,
-        "galleryPreviewImages": gallery_preview_images,
-        "useCustomGalleryPreviews": use_custom_previews
-    }
-
-def process_material(material_dir, brand_id):
-    """Process a material directory and return the material data."""
-    config_path = material_dir / "config.json"
-    if not config_path.exists():
-        print(f"Warning: No config found for material: {material_dir}")
-        return None
-    
-    # Load config
-    with open(config_path, 'r') as f:
-        material = json.load(f)
-    
-    # Clean up all string fields
-    for key, value in material.items():
-        if isinstance(value, str):
-            material[key] = clean_string(value)
-    
-    # Add ID
-    material_id = material_dir.name
-    material['id'] = material_id
-    
-    # Load description
-    material['description'] = load_description(material_dir)
-    
-    # Process main image - look for any supported extension
-    main_image_path = find_image_file(material_dir, f"{material_id}_main")
-    if main_image_path:
-        material['image'] = copy_image(main_image_path, f"{brand_id}_{material_id}_main")
-    else:
-        # Skip placeholder creation
-        material['image'] = ""
-        print(f"Warning: No main image for material: {material_id}")
-    
-    # Get main image name/label if available
-    main_image_name_path = material_dir / f"{material_id}_main_name.txt"
-    main_image_name = ""
-    if main_image_name_path.exists():
-        with open(main_image_name_path, 'r') as f:
-            main_image_name = clean_string(f.read())
-    
-    # Process preview image - look for any supported extension
-    preview_image_path = find_image_file(material_dir, f"{material_id}_preview")
-    if preview_image_path:
-        material['primaryPreviewImage'] = copy_image(preview_image_path, f"{brand_id}_{material_id}_preview")
-        material['useCustomPrimaryPreview'] = True
-    else:
-        material['primaryPreviewImage'] = material['image']
-        material['useCustomPrimaryPreview'] = False
-    
-    # Process gallery
-    gallery_dir = material_dir / "gallery"
-    if gallery_dir.exists():
-        gallery_data = process_gallery_images(gallery_dir, f"{brand_id}_{material_id}", main_image_name)
-        material.update(gallery_data)
-    else:
-        material['galleryImages'] = []
-        material['galleryImagesNames'] = []
-        material['galleryPreviewImages'] = []
-        material['useCustomGalleryPreviews'] = []
-    
-    # Set default values for compatibility
-    material.setdefault('simpleMode', False)  # Advanced mode by default
-    material.setdefault('enabled', True)
-    
-    return material
-
-def process_brand(brand_dir):
-    """Process a brand directory and return the brand data."""
-    config_path = brand_dir / "config.json"
-    if not config_path.exists():
-        print(f"Warning: No config found for brand: {brand_dir}")
-        return None
-    
-    # Load config
-    with open(config_path, 'r') as f:
-        brand = json.load(f)
-    
-    # Clean up all string fields
-    for key, value in brand.items():
-        if isinstance(value, str):
-            brand[key] = clean_string(value)
-    
-    # Add ID
-    brand_id = brand_dir.name
-    brand['id'] = brand_id
-    
-    # Process logo - look for any supported extension
-    logo_path = find_image_file(brand_dir, f"{brand_id}_logo")
-    if logo_path:
-        brand['logo'] = copy_image(logo_path, f"{brand_id}_logo")
-    else:
-        # Skip placeholder creation
-        brand['logo'] = ""
-        print(f"Warning: No logo for brand: {brand_id}")
-    
-    # Process materials
-    materials_dir = brand_dir / "materials"
-    materials = []
-    
-    if materials_dir.exists():
-        for material_dir in materials_dir.iterdir():
-            if material_dir.is_dir():
-                material = process_material(material_dir, brand_id)
-                if material:
-                    materials.append(material)
-    
-    brand['materials'] = materials
-    return brand
-
-def preserve_unused_images(existing_images, used_images):
+                # Skip placeholder creation
+                brand['logo'] = ""
+                self.log(f"Warning: No logo for brand: {brand_id}")
+            self.build_cache["brands"][brand_id] = {"signature": signature, "logo": brand['logo']}
+
+        return brand
+
+    def preserve_unused_images(self, existing_images):
+        """
+        Identify and log images that exist in the output but weren't used in the current compilation.
+        These images are preserved for backward compatibility.
+        """
+        unused_images = existing_images - self.used_images
+        if unused_images:
+            self.log("\n===== Preserving Unused Images =====")
+            for img_name in sorted(unused_images):
+                self.log(f"Image not in new data but preserving: {img_name}")
+            self.log(f"Total preserved images: {len(unused_images)}")
+            self.log("======================================")
+
+    def write_catalog(self, all_companies):
+        """
+        Write the catalog JSON with its precompressed variants, the pitch eligibility, color and similarity indexes,
+        the SQLite catalog and the manifest, and prune build cache entries for brands and materials that no longer exist.
+        """
+        # Indexes below read the compiled images
+        self.finish_image_jobs()
+        self.drop_failed_images(all_companies)
+        self.write_build_report()
+
+        data = json.dumps(self.catalog_json(all_companies), indent=2).encode()
+        with open(self.output_json_path, 'wb') as f:
+            f.write(data)
+        self.write_compressed_variants(self.output_json_path, data)
+        with open(self.eligibility_index_path, 'w') as f:
+            json.dump(build_eligibility_index(all_companies), f, separators=(",", ":"))
+        with open(self.color_index_path, 'w') as f:
+            json.dump(build_color_index(all_companies), f, separators=(",", ":"))
+        build_catalog_db(all_companies, self.catalog_db_path, self.image_prefix, self.images_dir)
+
+        live_materials = {f"{brand_id}/{m['id']}" for brand_id, brand in all_companies.items() for m in brand['materials']}
+        live_images = set()
+        for brand in all_companies.values():
+            live_images.update(self.image_names([brand.get('logo')]))
+            for material in brand['materials']:
+                live_images.update(self.material_image_names(material))
+        self.build_cache["brands"] = {k: v for k, v in self.build_cache["brands"].items() if k in all_companies}
+        self.build_cache["materials"] = {k: v for k, v in self.build_cache["materials"].items() if k in live_materials}
+        self.build_cache["images"] = {k: v for k, v in self.build_cache["images"].items() if k in live_images}
+        # Every palette comes from a source image that is also compiled, so live palettes are keyed by live image hashes
+        live_hashes = set(self.build_cache["images"].values())
+        self.build_cache["palettes"] = {k: v for k, v in self.build_cache["palettes"].items() if k in live_hashes}
+        self.build_cache["features"] = {k: v for k, v in self.build_cache["features"].items() if k in live_hashes}
+        live_descriptions = {m.get('description') for brand in all_companies.values() for m in brand['materials']}
+        self.build_cache["descriptions"] = {k: v for k, v in self.build_cache["descriptions"].items()
+                                            if v["html"] in live_descriptions}
+        self.write_similarity_index(all_companies)
+        self.save_build_cache()
+        self.write_manifest()
+
+    def write_compressed_variants(self, path, data):
+        """Write gzip and (if the brotli module is installed) Brotli copies of a file, for servers to send as-is."""
+        compressors = {"gzip": lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressors["br"] = lambda: brotli.compress(data, quality=11)
+        for encoding, suffix in COMPRESSED_SUFFIXES.items():
+            variant_path = path.with_name(path.name + suffix)
+            if encoding in compressors:
+                with open(variant_path, 'wb') as f:
+                    f.write(compressors[encoding]())
+            elif variant_path.exists():
+                # Never leave a variant from an older build next to a newer file
+                variant_path.unlink()
+
+    def write_manifest(self):
+        """
+        Write manifest.json, listing every served output file with its size, mtime and SHA-256, and the
+        precompressed variants available for it. Servers and publishers use it for ETags and change detection.
+        Hashes from the previous manifest are reused for files whose size and mtime haven't changed.
+        """
+        previous = {}
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    previous = json.load(f).get("files", {})
+            except (OSError, ValueError):
+                previous = {}
+
+        files = {}
+        served = [self.output_json_path, self.eligibility_index_path, self.color_index_path, self.similarity_index_path,
+                  self.similarity_vectors_path, self.catalog_db_path]
+        for path in [*served, *sorted(self.descriptions_dir.glob("*.html")), *sorted(self.images_dir.glob("*.webp"))]:
+            entry = self.manifest_entry(path, previous)
+            encodings = {}
+            for encoding, suffix in COMPRESSED_SUFFIXES.items():
+                variant_path = path.with_name(path.name + suffix)
+                if variant_path.exists():
+                    variant_entry = self.manifest_entry(variant_path, previous)
+                    files[variant_entry.pop("path")] = variant_entry
+                    encodings[encoding] = variant_path.relative_to(self.output_dir).as_posix()
+            if encodings:
+                entry["encodings"] = encodings
+            files[entry.pop("path")] = entry
+
+        fd, temp_path = tempfile.mkstemp(dir=self.output_dir, prefix=".", suffix=".part")
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"files": files}, f, indent=2)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, self.manifest_path)
+
+    def manifest_entry(self, path, previous):
+        relative_path = path.relative_to(self.output_dir).as_posix()
+        stat = path.stat()
+        entry = previous.get(relative_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            sha256 = entry["sha256"]
+        else:
+            with open(path, 'rb') as f:
+                sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+        return {"path": relative_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+    def load_catalog(self):
+        """
+        Load the previously written catalog JSON, or an empty catalog if there is none.
+        Split-out descriptions are read back in, so the loaded catalog matches what compiling gives.
+        """
+        if not self.output_json_path.exists():
+            return {}
+        with open(self.output_json_path, 'r') as f:
+            all_companies = json.load(f)
+        for brand in all_companies.values():
+            brand['materials'] = [self.inline_description(m) if 'descriptionFile' in m else m for m in brand['materials']]
+        return all_companies
+
+    def print_statistics(self):
+        """Log size statistics for the images converted in this build."""
+        total_size_saved = self.total_original_size - self.total_webp_size
+        avg_reduction_percentage = (total_size_saved / self.total_original_size) * 100 if self.total_original_size > 0 else 0
+
+        self.log("\n===== Image Conversion Statistics =====")
+        self.log(f"Total images processed: {self.total_images_processed}")
+        self.log(f"Total original size: {self.total_original_size/1024/1024:.2f}MB")
+        self.log(f"Total WebP size: {self.total_webp_size/1024/1024:.2f}MB")
+        self.log(f"Total size saved: {total_size_saved/1024/1024:.2f}MB ({avg_reduction_percentage:.1f}%)")
+        if self.total_images_processed > 0:
+            self.log(f"Average file size reduction: {(total_size_saved/self.total_images_processed)/1024:.2f}KB per image")
+        if self.image_store:
+            self.log(f"Shared image store: {self.shared_images_linked} images linked "
+                     f"({self.shared_bytes_linked/1024/1024:.2f}MB), {self.total_images_processed} encoded into {self.image_store}")
+        if self.image_report:
+            report = self.image_report
+            peak_rss = f"{report['peakRssMB']:.0f}MB" if report["peakRssMB"] is not None else "unknown"
+            self.log(f"Conversion time: {report['seconds']:.1f}s on {report['workers']} workers, "
+                     f"peak estimated memory {report['peakEstimatedMB']:.0f}MB of {report['budgetMB']:.0f}MB, "
+                     f"peak RSS {peak_rss} (details in {self.build_report_path.name})")
+        self.log("======================================")
+
+    def begin(self):
+        """Start a build: clear per-run state, create output directories and load the build cache."""
+        self.reset()
+        self.ensure_directories()
+        if self.build_cache is None:
+            self.build_cache = self.load_build_cache()
+
+    def compile_all(self):
+        """Compile every brand into the catalog JSON. Returns the compiled catalog."""
+        self.log("Starting compilation process..." + (" (incremental)" if self.incremental else ""))
+        self.begin()
+
+        # A full build recompiles and re-encodes everything, then records fresh cache entries
+        if not self.incremental:
+            self.build_cache = empty_build_cache()
+
+        # Scan existing images
+        existing_images = self.scan_existing_images()
+        self.log(f"Found {len(existing_images)} existing images in output directory")
+
+        # Process all brands, with their metadata read ahead and images converted as they are reached
+        all_companies = {}
+
+        with self.prefetching():
+            for brand_id in self.store.brand_ids():
+                brand = self.process_brand(brand_id)
+                if brand:
+                    all_companies[brand_id] = brand
+
+        # Write the output JSON
+        self.write_catalog(all_companies)
+
+        # Identify and preserve unused images
+        self.preserve_unused_images(existing_images)
+
+        # Calculate and print size statistics
+        self.print_statistics()
+
+        self.log(f"Compilation complete! Output saved to {self.output_json_path}")
+        self.log(f"All images copied to {self.images_dir}")
+        self.log(f"Image URLs use prefix: {self.image_prefix}")
+        self.log(f"Total unique images: {len(self.copied_files)}")
+        self.log(f"Total preserved images: {len(existing_images - self.used_images)}")
+        self.log(f"All images converted to WebP format at {WEBP_QUALITY}% quality")
+        return all_companies
+
+    def compile_material(self, brand_id, material_id):
+        """
+        Recompile a single material and update it in place in the catalog JSON.
+        Other entries are kept as they are, and the material's images are only re-encoded if their source changed.
+        If the material was removed from the store, its entry is dropped. Returns the compiled material, or None.
+        """
+        return self.update_catalog(materials=[(brand_id, material_id)])[0]
+
+    def update_catalog(self, brand_ids=(), materials=()):
+        """
+        Recompile the given brands and (brand_id, material_id) pairs and patch them into the existing catalog JSON,
+        which is written once at the end. A listed brand is rebuilt as a whole (its materials still come from the
+        build cache when unchanged and the compiler is incremental). Returns the compiled materials, in order.
+        """
+        self.begin()
+        all_companies = self.load_catalog()
+
+        for brand_id in brand_ids:
+            self.update_brand_entry(all_companies, brand_id)
+
+        results = []
+        for brand_id, material_id in materials:
+            if brand_id in brand_ids:
+                brand = all_companies.get(brand_id)
+                results.append(next((m for m in brand['materials'] if m['id'] == material_id), None) if brand else None)
+            else:
+                results.append(self.update_material_entry(all_companies, brand_id, material_id))
+
+        self.write_catalog(all_companies)
+        return results
+
+    def update_brand_entry(self, all_companies, brand_id):
+        """Rebuild one brand in a loaded catalog, or drop it if it's gone from the store."""
+        self.log(f"Compiling brand: {brand_id}")
+        brand = self.process_brand(brand_id) if brand_id in self.store.brand_ids() else None
+        if brand:
+            all_companies[brand_id] = brand
+        else:
+            all_companies.pop(brand_id, None)
+        return brand
+
+    def update_material_entry(self, all_companies, brand_id, material_id):
+        """Recompile one material in a loaded catalog, or drop it if it's gone from the store."""
+        # A brand the catalog doesn't know yet is compiled in full
+        if brand_id not in all_companies:
+            brand = self.update_brand_entry(all_companies, brand_id)
+            return next((m for m in brand['materials'] if m['id'] == material_id), None) if brand else None
+
+        materials = all_companies[brand_id]['materials']
+        position = next((i for i, m in enumerate(materials) if m['id'] == material_id), None)
+
+        self.log(f"Compiling material: {brand_id}/{material_id}")
+        exists = material_id in self.store.material_ids(brand_id)
+        material = self.compile_material_entry(brand_id, material_id) if exists else None
+
+        if material:
+            self.build_cache["materials"][f"{brand_id}/{material_id}"] = {
+                "signature": self.store.material_signature(brand_id, material_id),
+                "material": material,
+            }
+            if position is None:
+                materials.append(material)
+            else:
+                materials[position] = material
+        elif position is not None:
+            del materials[position]
+
+        return material
+
+def load_catalogs(path):
+    """
+    Read a catalogs file, for compiling several catalogs in one run:
+
+        {"imageStore": "image-store",
+         "catalogs": [{"name": "us", "dataDir": "data", "outputDir": "output", "imagePrefix": "https://..."},
+                      {"name": "acme", "store": "sqlite:stores/acme", "outputDir": "output-acme", "imagePrefix": "..."}]}
+
+    Every catalog needs an outputDir of its own, and takes its brands from dataDir (default: data) or a store
+    spec, with imagePrefix defaulting to IMAGE_PREFIX. Paths are relative to the working directory.
+    """
+    with open(path, 'r') as f:
+        config = json.load(f)
+    catalogs = config.get("catalogs")
+    if not catalogs:
+        raise ValueError(f"{path} lists no catalogs")
+    output_dirs = set()
+    for catalog in catalogs:
+        if "outputDir" not in catalog:
+            raise ValueError(f"Catalog {catalog.get('name', '?')} has no outputDir")
+        output_dir = Path(catalog["outputDir"]).resolve()
+        if output_dir in output_dirs:
+            raise ValueError(f"Two catalogs write to {catalog['outputDir']}")
+        output_dirs.add(output_dir)
+        catalog.setdefault("name", Path(catalog["outputDir"]).name)
+    return config
+
+def compile_catalogs(config, image_store_dir=None, incremental=False, log=print, **options):
     """
-    Identify and log images that exist in the output but weren't used in the current compilation.
-    These images are preserved for backward compatibility.
+    Compile every catalog of a catalogs file (see load_catalogs) into its own output directory, each with its own
+    catalog JSON and image prefix, sharing encoded images through one content-addressed image store. Images are
+    encoded once per source and encoder settings and hard-linked into each output. Returns each catalog's
+    storage report (see Compiler.storage_report) with its name and material count.
     """
-    unused_images = existing_images - used_images
-    if unused_images:
-        print("\n===== Preserving Unused Images =====")
-        for img_name in sorted(unused_images):
-            print(f"Image not in new data but preserving: {img_name}")
-        print(f"Total preserved images: {len(unused_images)}")
-        print("======================================")
+    image_store = ImageStore(image_store_dir or config.get("imageStore") or DEFAULT_IMAGE_STORE)
+    reports = []
+    for catalog in config["catalogs"]:
+        log(f"\n===== Catalog: {catalog['name']} =====")
+        store = open_store(catalog["store"]) if catalog.get("store") else None
+        compiler = Compiler(catalog.get("dataDir", DATA_DIR), catalog["outputDir"], catalog.get("imagePrefix", IMAGE_PREFIX),
+                            incremental=incremental, log=log, store=store, image_store=image_store, **options)
+        all_companies = compiler.compile_all()
+        materials = sum(len(brand['materials']) for brand in all_companies.values())
+        reports.append({"name": catalog["name"], "materials": materials, **compiler.storage_report()})
+
+    log("\n===== Catalogs =====")
+    log(f"{'catalog':<20}{'materials':>10}{'encoded':>9}{'linked':>8}{'unchanged':>11}{'encoded MB':>12}"
+        f"{'linked MB':>11}{'encode s':>10}")
+    for report in reports:
+        log(f"{report['name']:<20}{report['materials']:>10}{report['imagesEncoded']:>9}{report['imagesLinked']:>8}"
+            f"{report['imagesUnchanged']:>11}{report['encodedMB']:>12.2f}{report['linkedMB']:>11.2f}"
+            f"{report['encodeSeconds']:>10.1f}")
+    blobs, size = image_store.usage()
+    log(f"Shared image store {image_store}: {blobs} images, {size/1024/1024:.2f}MB")
+    log("======================================")
+    return reports
 
 def main():
     """Main function to compile all data into a single JSON file."""
-    print("Starting compilation process...")
-    
-    # Ensure output directories exist
-    ensure_directories()
-    
-    # Scan existing images
-    existing_images = scan_existing_images()
-    print(f"Found {len(existing_images)} existing images in output directory")
-    
-    # Process all brands
-    all_companies = {}
-    
-    for brand_dir in BRANDS_DIR.iterdir():
-        if brand_dir.is_dir():
-            brand = process_brand(brand_dir)
-            if brand:
-                brand_id = brand['id']
-                all_companies[brand_id] = brand
-    
-    # Write the output JSON
-    with open(OUTPUT_JSON_PATH, 'w') as f:
-        json.dump(all_companies, f, indent=2)
-    
-    # Identify and preserve unused images
-    preserve_unused_images(existing_images, used_images)
-    
-    # Calculate and print size statistics
-    total_size_saved = total_original_size - total_webp_size
-    avg_reduction_percentage = (total_size_saved / total_original_size) * 100 if total_original_size > 0 else 0
-    
-    print("\n===== Image Conversion Statistics =====")
-    print(f"Total images processed: {total_images_processed}")
-    print(f"Total original size: {total_original_size/1024/1024:.2f}MB")
-    print(f"Total WebP size: {total_webp_size/1024/1024:.2f}MB")
-    print(f"Total size saved: {total_size_saved/1024/1024:.2f}MB ({avg_reduction_percentage:.1f}%)")
-    if total_images_processed > 0:
-        print(f"Average file size reduction: {(total_size_saved/total_images_processed)/1024:.2f}KB per image")
-    print("======================================")
-    
-    print(f"Compilation complete! Output saved to {OUTPUT_JSON_PATH}")
-    print(f"All images copied to {IMAGES_DIR}")
-    print(f"Image URLs use prefix: {IMAGE_PREFIX}")
-    print(f"Total unique images: {len(copied_files)}")
-    print(f"Total preserved images: {len(existing_images - used_images)}")
-    print(f"All images converted to WebP format at 90% quality")
+    parser = argparse.ArgumentParser(description="Compile the brands store into all-companies.json and WebP images.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only recompile brands and materials whose source files changed since the last build")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="data directory containing brands/")
+    parser.add_argument("--store", metavar="SPEC",
+                        help='store to compile from, "files:<brands dir>" or "sqlite:<store dir>" (default: <data dir>/brands)')
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="directory for all-companies.json and images/")
+    parser.add_argument("--image-prefix", default=IMAGE_PREFIX, help="URL prefix for compiled image URLs")
+    parser.add_argument("--material", metavar="BRAND/MATERIAL",
+                        help="recompile a single material and update it in the existing catalog")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and recompile materials as their source files change")
+    parser.add_argument("--poll", action="store_true",
+                        help="with --watch, poll the data directory instead of using filesystem events")
+    parser.add_argument("--debounce", type=float, default=1.0,
+                        help="with --watch, seconds of quiet to wait for before rebuilding (default: 1.0)")
+    parser.add_argument("--image-workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"images converted at the same time (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // MB, metavar="MB",
+                        help=f"estimated memory concurrent image conversions may use (default: {DEFAULT_MEMORY_BUDGET // MB})")
+    parser.add_argument("--discovery-workers", type=int, default=DEFAULT_PREFETCH_WORKERS,
+                        help=f"brand and material metadata reads kept in flight, 0 to read in order "
+                             f"(default: {DEFAULT_PREFETCH_WORKERS})")
+    parser.add_argument("--catalogs", metavar="FILE",
+                        help="compile every catalog listed in a JSON file, sharing encoded images (see load_catalogs)")
+    parser.add_argument("--image-store", metavar="DIR",
+                        help="shared content-addressed store of encoded images; with --catalogs, overrides the file's imageStore")
+    parser.add_argument("--split-descriptions", action="store_true",
+                        help="write descriptions to descriptions/<hash>.html and refer to them from the catalog JSON")
+    parser.add_argument("--publish", metavar="BUCKET",
+                        help="after compiling, upload changed output to this S3 bucket (endpoint from AWS_ENDPOINT_URL)")
+    args = parser.parse_args()
+
+    store = open_store(args.store) if args.store else None
+    if args.watch and store is not None and not isinstance(store, FileStore):
+        parser.error("--watch only works with the files store")
+    if args.watch and args.publish:
+        parser.error("--publish can't be combined with --watch")
+    if args.catalogs and (args.watch or args.material or args.store or args.publish):
+        parser.error("--catalogs can't be combined with --watch, --material, --store or --publish")
+
+    options = {"split_descriptions": args.split_descriptions, "image_workers": args.image_workers,
+               "memory_budget": args.memory_budget * MB, "discovery_workers": args.discovery_workers}
+    if args.catalogs:
+        try:
+            config = load_catalogs(args.catalogs)
+        except (OSError, ValueError) as e:
+            parser.exit(1, f"Error: {e}\n")
+        compile_catalogs(config, args.image_store, incremental=args.incremental, **options)
+        return
+
+    image_store = ImageStore(args.image_store) if args.image_store else None
+    compiler = Compiler(args.data_dir, args.output_dir, args.image_prefix, incremental=args.incremental or args.watch,
+                        store=store, image_store=image_store, **options)
+    if args.watch:
+        from watch import watch
+        watch(compiler, debounce=args.debounce, use_polling=args.poll)
+    elif args.material:
+        brand_id, _, material_id = args.material.partition("/")
+        compiler.compile_material(brand_id, material_id)
+        compiler.print_statistics()
+    else:
+        compiler.compile_all()
+
+    if args.publish:
+        from publish import Publisher, PublishError
+        try:
+            Publisher(args.output_dir, args.publish).publish()
+        except PublishError as e:
+            parser.exit(1, f"Error: {e}\n")
 
 if __name__ == "__main__":
     main()
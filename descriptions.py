@@ -0,0 +1,190 @@
+"""
+Compiled forms of material descriptions.
+
+Descriptions are HTML written in the builder or scraped from manufacturer sites. Compile publishes a
+sanitized, minified copy instead of the raw file, plus a plain-text excerpt and word count for listings:
+
+    sanitized  only the tags and attributes in ALLOWED_TAGS / ALLOWED_ATTRIBUTES are kept. script, style
+               and similar elements are dropped with their content, other unknown tags are unwrapped,
+               links only keep http(s), mailto and relative URLs, and every tag is closed.
+    minified   comments are dropped, whitespace runs become one space and whitespace next to block
+               tags is removed (except inside <pre>).
+"""
+import re
+import hashlib
+from html import escape
+from html.parser import HTMLParser
+from search_index import strip_html
+
+# Tags kept in compiled descriptions, and the attributes kept on them
+ALLOWED_TAGS = {
+    "a", "b", "blockquote", "br", "caption", "code", "div", "em", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i",
+    "img", "li", "ol", "p", "pre", "s", "small", "span", "strong", "sub", "sup", "table", "tbody", "td", "tfoot",
+    "th", "thead", "tr", "u", "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_URL_SCHEMES = {"http", "https", "mailto"}
+
+# Elements dropped together with everything inside them
+DROPPED_TAGS = {"script", "style", "iframe", "object", "embed", "noscript", "template", "svg", "math", "head", "title"}
+
+VOID_TAGS = {"br", "hr", "img"}
+# Tags that start a new block, so whitespace around them doesn't render
+BLOCK_TAGS = {
+    "blockquote", "br", "caption", "div", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "ol", "p", "pre",
+    "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+
+# Open tags a new tag implicitly closes, as browsers parse them: <li>One<li>Two is two items
+IMPLIED_END_TAGS = {"li": {"li"}, "tr": {"tr", "td", "th"}, "td": {"td", "th"}, "th": {"td", "th"}}
+# Tags that can't be inside a paragraph, so they close an open <p>
+PARAGRAPH_CLOSERS = BLOCK_TAGS - {"br", "caption", "li", "tbody", "td", "tfoot", "th", "thead", "tr"}
+
+# Length of the plain-text excerpt, in characters
+EXCERPT_LENGTH = 200
+
+WHITESPACE = re.compile(r"\s+")
+URL_SCHEME = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*):")
+
+def safe_url(url):
+    """Return whether a URL is relative or uses an allowed scheme (so no javascript: or data: URLs)."""
+    match = URL_SCHEME.match("".join(url.split()))
+    return match is None or match.group(1).lower() in ALLOWED_URL_SCHEMES
+
+class _Sanitizer(HTMLParser):
+    """Rebuild an HTML fragment from allowed tags and attributes, minifying whitespace as it goes."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        # The dropped element being skipped, and how many elements of that name are open inside it
+        self._dropping = None
+        self._drop_depth = 0
+        self._pre_depth = 0
+        # True at the start and right after a block tag, where leading whitespace doesn't render
+        self._at_block = True
+
+    def _trim_trailing_space(self):
+        if self.parts and self.parts[-1].endswith(" ") and not self._pre_depth:
+            self.parts[-1] = self.parts[-1].rstrip(" ")
+
+    def handle_starttag(self, tag, attrs):
+        # Inside a dropped element only its own name is counted, so stray or unclosed tags in it can't end it
+        if self._dropping:
+            if tag == self._dropping:
+                self._drop_depth += 1
+            return
+        if tag in DROPPED_TAGS:
+            self._dropping = tag
+            self._drop_depth = 1
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+
+        if tag in PARAGRAPH_CLOSERS and "p" in self.open_tags:
+            self.handle_endtag("p")
+        while self.open_tags and self.open_tags[-1] in IMPLIED_END_TAGS.get(tag, ()):
+            self.handle_endtag(self.open_tags[-1])
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        attributes = "".join(
+            f' {name}="{escape(value, quote=True)}"' for name, value in attrs
+            if name in allowed and value is not None and (name not in URL_ATTRIBUTES or safe_url(value))
+        )
+        if tag in BLOCK_TAGS:
+            self._trim_trailing_space()
+        self.parts.append(f"<{tag}{attributes}>")
+        self._at_block = tag in BLOCK_TAGS
+        if tag == "pre":
+            self._pre_depth += 1
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # A self-closed tag has no content or end tag, so inside dropped content (or as a dropped tag) it's skipped
+        if self._dropping or tag in DROPPED_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and tag in ALLOWED_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._dropping:
+            if tag == self._dropping:
+                self._drop_depth -= 1
+                if not self._drop_depth:
+                    self._dropping = None
+            return
+        if tag not in self.open_tags:
+            return
+        # Close anything left open inside this tag first
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            if open_tag in BLOCK_TAGS:
+                self._trim_trailing_space()
+            self.parts.append(f"</{open_tag}>")
+            if open_tag == "pre":
+                self._pre_depth -= 1
+            if open_tag == tag:
+                break
+        self._at_block = tag in BLOCK_TAGS
+
+    def handle_data(self, data):
+        if self._dropping:
+            return
+        if not self._pre_depth:
+            data = WHITESPACE.sub(" ", data)
+            if self._at_block or (self.parts and self.parts[-1].endswith(" ")):
+                data = data.lstrip(" ")
+        if data:
+            self.parts.append(escape(data, quote=False))
+            self._at_block = False
+
+    def result(self):
+        self.close()
+        while self.open_tags:
+            self.handle_endtag(self.open_tags[-1])
+        self._trim_trailing_space()
+        return "".join(self.parts)
+
+def sanitize_html(html):
+    """
+    Return a sanitized, minified copy of an HTML fragment. A dropped element ends only at its own end tag:
+
+    >>> sanitize_html('<p>a</p><noscript><p>Enable JS</noscript><p>keep me</p>')
+    '<p>a</p><p>keep me</p>'
+    >>> sanitize_html('<p>a</p><svg><g></svg><p>keep me</p>')
+    '<p>a</p><p>keep me</p>'
+    >>> sanitize_html('<noscript></p>Enable JS</noscript><p>b</p>')
+    '<p>b</p>'
+    >>> sanitize_html('<p>a</p><svg><path d="x"/></svg><p>keep me</p>')
+    '<p>a</p><p>keep me</p>'
+    """
+    if not html:
+        return ""
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html)
+    return sanitizer.result()
+
+def excerpt(text, length=EXCERPT_LENGTH):
+    """Shorten plain text to at most `length` characters, cutting at a word boundary and adding an ellipsis."""
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(" ", 1)[0] if " " in text[:length] else text[:length - 1]
+    return cut.rstrip(" ,;:.-") + "…"
+
+def description_hash(html):
+    return hashlib.sha256(html.encode()).hexdigest()
+
+def description_artifacts(html):
+    """Return the compiled forms of a description: sanitized, minified HTML, a plain-text excerpt and a word count."""
+    sanitized = sanitize_html(html)
+    text = strip_html(sanitized)
+    return {"html": sanitized, "excerpt": excerpt(text), "wordCount": len(text.split())}
@@ -1,110 +1,108 @@
-import requests
-from bs4 import BeautifulSoup
-import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from downloader import Downloader
+from http_cache import HttpCache
+from scrape_journal import ScrapeJournal
+from ingest import ImageIngest, MAX_IMAGE_DIMENSION
+from compile import Compiler, OUTPUT_DIR
+from browser_pool import BrowserPool
+from scrapers import EXTRACTORS, CatalogWriter, get_extractors, pending_manufacturers, make_driver
 
-def scrape_stormfighter_flex_colors():
-    # Set up the Selenium webdriver (you'll need to have chromedriver installed)
-    driver = webdriver.Chrome()
-    
-    # Navigate to the main StormFighter FLEX page
-    driver.get("https://www.tamko.com/flex")
-    time.sleep(3)  # Let the page load fully
-    
-    # Find all slider cards containing color samples
-    color_slides = driver.find_elements(By.CSS_SELECTOR, ".slider.stormfighter-slider-container .slider-card")
-    
-    color_data = []
-    
-    # First, collect all links
-    color_links = []
-    for slide in color_slides:
-        link = slide.find_element(By.TAG_NAME, "a").get_attribute("href")
-        color_name = slide.find_element(By.CSS_SELECTOR, ".color-label").text
-        color_links.append((link, color_name))
-    
-    # Now navigate to each page and collect the images
-    for link, color_name in color_links:
-        print(f"Processing {color_name}...")
-        driver.get(link)
-        time.sleep(3)  # Give page time to load
-        
-        try:
-            # Get the hero house image
-            house_image_element = driver.find_element(By.CSS_SELECTOR, ".section---house-photo")
-            house_image_url = house_image_element.value_of_css_property('background-image')
-            house_image_url = house_image_url.replace('url("', '').replace('")', '')
-            
-            # Get the shingle swatch image
-            swatch_element = driver.find_element(By.CSS_SELECTOR, ".styleboard-image")
-            swatch_image_url = swatch_element.get_attribute("src")
-            
-            # Get the angled swatch image if available
-            try:
-                angled_swatch_element = driver.find_element(By.CSS_SELECTOR, ".section---angled-swatch")
-                angled_swatch_url = angled_swatch_element.value_of_css_property('background-image')
-                angled_swatch_url = angled_swatch_url.replace('url("', '').replace('")', '')
-            except:
-                angled_swatch_url = None
-            
-            # Get the color description
-            try:
-                description_element = driver.find_element(By.CSS_SELECTOR, ".shingle-colors---copy")
-                description = description_element.text
-            except:
-                description = ""
-            
-            color_data.append({
-                "color_name": color_name,
-                "description": description,
-                "house_image_url": house_image_url,
-                "swatch_image_url": swatch_image_url,
-                "angled_swatch_url": angled_swatch_url
-            })
-            
-            # Optional: Download the images
-            download_directory = "tamko_images"
-            os.makedirs(download_directory, exist_ok=True)
-            
-            if house_image_url:
-                download_image(house_image_url, os.path.join(download_directory, f"{color_name.replace(' ', '_')}_house.jpg"))
-            
-            if swatch_image_url:
-                download_image(swatch_image_url, os.path.join(download_directory, f"{color_name.replace(' ', '_')}_swatch.jpg"))
-            
-            if angled_swatch_url:
-                download_image(angled_swatch_url, os.path.join(download_directory, f"{color_name.replace(' ', '_')}_angled.jpg"))
-                
-        except Exception as e:
-            print(f"Error processing {color_name}: {e}")
-    
-    driver.quit()
-    return color_data
+DATA_DIR = Path("data")
 
-def download_image(url, filepath):
-    try:
-        response = requests.get(url, stream=True)
-        if response.status_code == 200:
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
-            print(f"Downloaded {filepath}")
-        else:
-            print(f"Failed to download {url}")
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
+def run_extractor(extractor, writer, headless, workers, journal=None):
+    """Scrape one manufacturer on its own browser pool and write its products into the data tree."""
+    pool = BrowserPool(lambda: make_driver(headless), workers=workers)
+    products = extractor.products(pool, journal)
+    for product in products:
+        writer.write_product(product)
+    return products
+
+def scrape_catalog(brand_ids=None, data_dir=DATA_DIR, headless=True, workers=4, restart=False,
+                   normalize=False, max_dimension=MAX_IMAGE_DIMENSION, compiler=None):
+    """
+    Run the registered manufacturer plugins in parallel and write their products into data_dir/brands.
+    Image downloads are shared across plugins and conditional, so re-runs only fetch what changed upstream.
+
+    Progress is journaled to data_dir/.scrape-journal.jsonl. If a run is interrupted, the next one picks up
+    where it stopped: collected links and extracted pages are reused, finished downloads are skipped and
+    partial ones continue. The journal is removed once a run completes without errors; pass restart=True
+    to discard it and start over.
+
+    With normalize=True images are ingested as they stream in: decoded in memory, scaled to fit max_dimension,
+    stripped of EXIF and written once into the brands tree. Passing a Compiler as well also encodes their
+    compiled WebP images during the download. Returns the scraped products.
+    """
+    extractors = get_extractors(brand_ids)
+    pending = pending_manufacturers(brand_ids)
+    if pending:
+        print(f"No scraper plugin yet for {', '.join(pending)}; their materials are maintained in the builder")
+    if not extractors:
+        print(f"No scrapers registered for: {', '.join(brand_ids)}")
+        return []
+
+    data_dir = Path(data_dir)
+    cache = HttpCache(os.path.join(data_dir, ".http-cache.json"))
+    journal_path = os.path.join(data_dir, ".scrape-journal.jsonl")
+    if restart and os.path.exists(journal_path):
+        os.unlink(journal_path)
+    journal = ScrapeJournal(journal_path)
+    if journal.resumed:
+        print(f"Resuming interrupted scrape from {journal_path}")
+
+    ingest = ImageIngest(max_dimension, compiler) if normalize or compiler else None
+
+    products = []
+    errors = 0
+    with Downloader(cache=cache, journal=journal, ingest=ingest) as downloader:
+        writer = CatalogWriter(data_dir / "brands", downloader)
+        with ThreadPoolExecutor(max_workers=len(extractors)) as executor:
+            futures = [executor.submit(run_extractor, extractor, writer, headless, workers, journal) for extractor in extractors]
+            for extractor, future in zip(extractors, futures):
+                try:
+                    products.extend(future.result())
+                    errors += extractor.failures
+                except Exception as e:
+                    print(f"Error scraping {extractor.company}: {e}")
+                    errors += 1
+
+    downloader.report()
+    if ingest:
+        ingest.close()
+    if errors or downloader.failures:
+        journal.close()
+        print(f"Scrape incomplete; run again to resume from {journal_path}")
+    else:
+        journal.clear()
+    return products
 
 if __name__ == "__main__":
-    color_data = scrape_stormfighter_flex_colors()
-    
+    parser = argparse.ArgumentParser(description="Scrape manufacturer sites into the builder's data/brands tree.")
+    brand_ids = ", ".join(sorted({cls.brand_id for cls in EXTRACTORS}))
+    parser.add_argument("brands", nargs="*", help=f"brand ids to scrape (default: all of {brand_ids}; other "
+                                                  f"manufacturers have no plugin yet)")
+    parser.add_argument("--workers", type=int, default=4, help="parallel browser workers per manufacturer (default: 4)")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="data directory containing brands/ (default: data)")
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window")
+    parser.add_argument("--restart", action="store_true", help="discard an interrupted run's journal and start over")
+    parser.add_argument("--normalize", action="store_true",
+                        help="decode images as they download, cap their size and strip EXIF before writing them")
+    parser.add_argument("--max-dimension", type=int, default=MAX_IMAGE_DIMENSION,
+                        help=f"with --normalize, longest side of a written image (default: {MAX_IMAGE_DIMENSION})")
+    parser.add_argument("--emit-webp", metavar="OUTPUT_DIR", nargs="?", const=str(OUTPUT_DIR),
+                        help="also encode compiled WebP images into OUTPUT_DIR while downloading (implies --normalize)")
+    args = parser.parse_args()
+
+    compiler = Compiler(args.data_dir, args.emit_webp) if args.emit_webp else None
+    products = scrape_catalog(args.brands, args.data_dir, headless=not args.show_browser, workers=args.workers,
+                              restart=args.restart, normalize=args.normalize, max_dimension=args.max_dimension,
+                              compiler=compiler)
+
     # Print summary of collected data
     print("\nCollected Data Summary:")
-    for color in color_data:
-        print(f"- {color['color_name']}")
-        print(f"  Description: {color['description'][:60]}..." if len(color['description']) > 60 else f"  Description: {color['description']}")
-        print(f"  Images: House ({bool(color['house_image_url'])}), Swatch ({bool(color['swatch_image_url'])}), Angled ({bool(color['angled_swatch_url'])})")
-        print()
+    for product in products:
+        print(f"- {product['company']} {product['name']}: {len(product['colors'])} colors")
+        for color in product["colors"]:
+            print(f"  {color['name']}: Image ({bool(color.get('image_url'))}), Preview ({bool(color.get('preview_url'))})")
@@ -0,0 +1,261 @@
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+class DownloadError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class Downloader:
+    """
+    Downloads files concurrently over one pooled HTTP session.
+
+    Connections are reused across downloads, at most `per_host` requests run against the same host at once,
+    failed requests are retried with exponential backoff, and every file is written to a temporary file in
+    the destination directory and renamed into place only once complete, so a crash never leaves a
+    truncated image behind.
+
+    With an HttpCache, requests are made conditional on the previous download's ETag/Last-Modified, and a
+    file whose content hash is unchanged is left untouched (keeping its mtime) instead of being rewritten.
+
+    With a ScrapeJournal, files the journal records as complete (and still matching their hash) are skipped,
+    and the partial file of an interrupted download is kept and continued with a Range request. If-Range
+    carries the validator recorded when the download started, so a file that changed upstream in the
+    meantime is fetched again from the beginning. A partial file that already has the full length recorded
+    when the download started is moved into place without a request, and one the server answers with
+    416 Range Not Satisfiable is discarded and fetched again.
+
+    With an ImageIngest, responses are streamed into its decoder instead of a partial file, and what gets
+    written (once, atomically) is the normalized image. Interrupted ingests start over rather than resume.
+
+    Use as a context manager, or call close() when done:
+
+        with Downloader() as downloader:
+            downloader.submit(url, "images/a.jpg")
+        downloader.report()
+    """
+
+    def __init__(self, max_workers=8, per_host=4, chunk_size=256 * 1024, retries=3, backoff=0.5, timeout=30, session=None, cache=None, journal=None, ingest=None):
+        self.cache = cache
+        self.journal = journal
+        self.ingest = ingest
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.per_host = per_host
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+        self._futures = []
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+        # Throughput statistics
+        self.started = time.perf_counter()
+        self.bytes_downloaded = 0
+        self.files_downloaded = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.resumed = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.per_host)
+            return self._host_slots[host]
+
+    def submit(self, url, filepath):
+        """Queue a download and return a future that resolves to True on success, False on failure."""
+        future = self._executor.submit(self.download, url, filepath)
+        self._futures.append(future)
+        return future
+
+    def download(self, url, filepath):
+        """Download url to filepath in the calling thread, with retries. Returns True on success."""
+        if self.journal and self.journal.download_complete(url, filepath):
+            with self._lock:
+                self.skipped += 1
+            return True
+        for attempt in range(self.retries + 1):
+            try:
+                with self._host_slot(url):
+                    size, status = self._fetch(url, filepath)
+                with self._lock:
+                    self.bytes_downloaded += size
+                    if status == "not_modified":
+                        self.not_modified += 1
+                    elif status == "unchanged":
+                        self.unchanged += 1
+                    else:
+                        self.files_downloaded += 1
+                        if status == "resumed":
+                            self.resumed += 1
+                if status in ("downloaded", "resumed"):
+                    print(f"{status.capitalize()} {filepath}")
+                return True
+            except (requests.RequestException, DownloadError) as e:
+                if attempt == self.retries or not getattr(e, "retryable", True):
+                    with self._lock:
+                        self.failures += 1
+                    print(f"Failed to download {url}: {e}")
+                    return False
+                time.sleep(self.backoff * (2 ** attempt))
+
+    def _fetch(self, url, filepath):
+        """
+        Stream one response into a partial file next to filepath and move it into place.
+        Returns the number of bytes received and "downloaded" (or "resumed" if an interrupted download
+        was continued), "not_modified" for a 304, or "unchanged" if the body matched the file already on disk.
+        """
+        directory, name = os.path.split(filepath)
+        directory = directory or "."
+        temp_path = os.path.join(directory, f".{name}.part")
+
+        # Continue an interrupted download only if we know which version of the file it was
+        started = self.journal.download_started(url, filepath) if self.journal and not self.ingest else None
+        offset = os.path.getsize(temp_path) if started and os.path.exists(temp_path) else 0
+        validator = started and (started["etag"] or started["last_modified"])
+        if offset and validator and offset == started.get("length"):
+            # The crash came after the last chunk was written, so the partial file is the whole body
+            return self._finish_partial(url, filepath, temp_path, started)
+        if offset and validator:
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+        else:
+            offset = 0
+            headers = self.cache.conditional_headers(url, filepath) if self.cache else {}
+
+        with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 304 and headers:
+                if self.journal:
+                    self.journal.record_download(url, filepath, file_sha256(filepath), os.path.getsize(filepath))
+                return 0, "not_modified"
+            if response.status_code == 416 and offset:
+                # The partial file is already complete (or longer than the file upstream); start over without a Range
+                response.close()
+                os.unlink(temp_path)
+                return self._fetch(url, filepath)
+            if response.status_code == 206 and offset:
+                status = "resumed"
+            elif response.status_code == 200:
+                status, offset = "downloaded", 0
+                if self.journal:
+                    # The body's length, when the server sends it unencoded, shows whether a partial file is complete
+                    length = response.headers.get("Content-Length")
+                    if not (length and length.isdigit()) or response.headers.get("Content-Encoding"):
+                        length = None
+                    self.journal.record_download_started(url, filepath, response.headers.get("ETag"),
+                                                         response.headers.get("Last-Modified"), length and int(length))
+            else:
+                raise DownloadError(f"HTTP {response.status_code}", retryable=response.status_code in RETRY_STATUS_CODES)
+
+            os.makedirs(directory, exist_ok=True)
+            digest = hashlib.sha256()
+            if offset:
+                with open(temp_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                        digest.update(chunk)
+            size = 0
+            sink = self.ingest.stream(filepath) if self.ingest else open(temp_path, "ab" if offset else "wb")
+            try:
+                for chunk in response.iter_content(self.chunk_size):
+                    sink.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            except BaseException:
+                # Keep what we have if the journal can resume it, otherwise don't leave it lying around
+                sink.close()
+                if not self.journal and os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+            sink.close()
+
+            # The cache records the hash of the body as served, so unchanged images aren't decoded again
+            sha256 = digest.hexdigest()
+            if self.cache and self.cache.content_hash(url, filepath) == sha256:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                status = "unchanged"
+            elif self.ingest:
+                try:
+                    data = sink.finish()
+                except (OSError, ValueError) as e:
+                    raise DownloadError(f"not a readable image: {e}", retryable=False)
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, filepath)
+            else:
+                os.replace(temp_path, filepath)
+
+            if self.cache:
+                self.cache.record(url, filepath, response.headers, sha256)
+            if self.journal:
+                # The journal checks files against what was written, which differs from the body when ingesting
+                written = sha256
+                if self.ingest:
+                    written = file_sha256(filepath) if status == "unchanged" else hashlib.sha256(data).hexdigest()
+                self.journal.record_download(url, filepath, written, os.path.getsize(filepath))
+            return size, status
+
+    def _finish_partial(self, url, filepath, temp_path, started):
+        """Move a partial file that already holds the whole body into place, as _fetch would have."""
+        sha256 = file_sha256(temp_path)
+        if self.cache and self.cache.content_hash(url, filepath) == sha256:
+            os.unlink(temp_path)
+            status = "unchanged"
+        else:
+            os.replace(temp_path, filepath)
+            status = "resumed"
+        if self.cache:
+            self.cache.record(url, filepath, {"ETag": started["etag"], "Last-Modified": started["last_modified"]}, sha256)
+        self.journal.record_download(url, filepath, sha256, os.path.getsize(filepath))
+        return 0, status
+
+    def wait(self):
+        """Block until every queued download has finished."""
+        wait(self._futures)
+        self._futures = []
+
+    def close(self):
+        """Wait for queued downloads, then release the worker threads and pooled connections."""
+        self.wait()
+        self._executor.shutdown()
+        self.session.close()
+        if self.cache:
+            self.cache.save()
+
+    def report(self):
+        """Print a summary of files, bytes and throughput since the downloader was created."""
+        elapsed = time.perf_counter() - self.started
+        megabytes = self.bytes_downloaded / 1024 / 1024
+        rate = megabytes / elapsed if elapsed > 0 else 0
+        print(f"Downloaded {self.files_downloaded} files ({megabytes:.2f}MB) in {elapsed:.1f}s "
+              f"- {rate:.2f}MB/s, {self.resumed} resumed, {self.not_modified} not modified, {self.unchanged} unchanged, "
+              f"{self.skipped} already done, {self.failures} failed")
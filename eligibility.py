@@ -0,0 +1,94 @@
+import json
+import bisect
+import threading
+from pathlib import Path
+from signatures import file_signature
+from pricing import quote_material
+
+INDEX_PATH = Path("output") / "eligibility-index.json"
+
+# Pitches the builder allows for minPitch/maxPitch, as rise per 12
+PITCHES = range(0, 13)
+
+def build_eligibility_index(all_companies):
+    """
+    Build the eligibility index for a compiled catalog: for every whole pitch from 0 to 12, the enabled
+    materials whose [minPitch, maxPitch] range includes it, ordered by effective price per square.
+
+        {"materials": [[brand_id, material_id, name], ...],
+         "pitches": {"9": {"materials": [material indices, cheapest first], "prices": [...]}, ...}}
+    """
+    materials = []
+    entries = []
+    for brand_id, brand in all_companies.items():
+        for material in brand.get("materials", []):
+            if material.get("enabled", True):
+                entries.append(material)
+                materials.append([brand_id, material["id"], material.get("name", material["id"])])
+
+    pitches = {}
+    for pitch in PITCHES:
+        # The effective price is the quote for one square (100 sq ft) at this pitch; None if it doesn't fit
+        quotes = [(quote_material(material, [(100, pitch)]), index) for index, material in enumerate(entries)]
+        eligible = sorted((round(quote, 2), index) for quote, index in quotes if quote is not None)
+        pitches[str(pitch)] = {
+            "materials": [index for _, index in eligible],
+            "prices": [price for price, _ in eligible],
+        }
+    return {"materials": materials, "pitches": pitches}
+
+class EligibilityIndex:
+    """
+    Query API over the eligibility index compile writes next to the catalog.
+    Answers "cheapest materials that fit this pitch" with a dictionary lookup and, for a price cap, a bisection.
+    """
+
+    def __init__(self, data):
+        self.materials = data["materials"]
+        self.pitches = {int(pitch): entry for pitch, entry in data["pitches"].items()}
+
+    def cheapest(self, pitch, limit=None, max_price=None):
+        """
+        Return the materials eligible at a whole pitch (0-12), cheapest first, as dicts with
+        brand_id, material_id, name and price (per square, including waste).
+        """
+        if pitch not in self.pitches:
+            raise ValueError(f"pitch must be a whole number from {PITCHES.start} to {PITCHES.stop - 1}, got {pitch}")
+        entry = self.pitches[pitch]
+        end = len(entry["prices"]) if max_price is None else bisect.bisect_right(entry["prices"], max_price)
+        if limit is not None:
+            end = min(end, limit)
+        return [
+            {"brand_id": brand_id, "material_id": material_id, "name": name, "price": price}
+            for (brand_id, material_id, name), price in zip(
+                (self.materials[index] for index in entry["materials"][:end]), entry["prices"][:end])
+        ]
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def load_eligibility_index(path=INDEX_PATH):
+    """Load an eligibility index, memoized until the file is rewritten by a build."""
+    path = str(Path(path).resolve())
+    version = file_signature(path)
+    with _index_lock:
+        cached = _index_cache.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    with open(path, 'r') as f:
+        index = EligibilityIndex(json.load(f))
+    with _index_lock:
+        _index_cache[path] = (version, index)
+    return index
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="List the cheapest materials that fit a pitch.")
+    parser.add_argument("pitch", type=int, help="pitch as rise per 12, e.g. 9 for 9/12")
+    parser.add_argument("--limit", type=int, default=10, help="materials to show (default: 10)")
+    parser.add_argument("--max-price", type=float, help="only materials up to this price per square")
+    parser.add_argument("--index", default=str(INDEX_PATH), help="index file (default: output/eligibility-index.json)")
+    args = parser.parse_args()
+
+    for result in load_eligibility_index(args.index).cheapest(args.pitch, args.limit, args.max_price):
+        print(f"${result['price']:>9,.2f}/sq  {result['brand_id']}/{result['material_id']}")
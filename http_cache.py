@@ -0,0 +1,79 @@
+import os
+import json
+import tempfile
+import threading
+
+class HttpCache:
+    """
+    Persistent record of what was last downloaded into each file: the URL, its ETag, Last-Modified date,
+    content hash, and the size and mtime the file had once written.
+
+    Re-downloads use it to send conditional requests (If-None-Match / If-Modified-Since) and to recognize
+    responses whose content hasn't changed, so unchanged files are never rewritten and keep their mtimes.
+    Conditional headers are only sent while the local file is exactly as it was written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable HTTP cache {path}: {e}")
+
+    def _entry(self, url, filepath):
+        """Return the entry for filepath if it was downloaded from url and hasn't been modified since."""
+        with self._lock:
+            entry = self.entries.get(os.path.abspath(filepath))
+        if not entry or entry.get("url") != url:
+            return None
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            return None
+        if entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+            return None
+        return entry
+
+    def conditional_headers(self, url, filepath):
+        """Return the validator headers to send for url, or {} if the local copy can't be trusted."""
+        entry = self._entry(url, filepath)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def content_hash(self, url, filepath):
+        """Return the recorded SHA-256 of filepath if it was saved from url and is still unmodified."""
+        entry = self._entry(url, filepath)
+        return entry.get("sha256") if entry else None
+
+    def record(self, url, filepath, response_headers, sha256):
+        """Remember the validators and content hash of a completed download."""
+        stat = os.stat(filepath)
+        with self._lock:
+            self.entries[os.path.abspath(filepath)] = {
+                "url": url,
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "sha256": sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+
+    def save(self):
+        """Write the cache atomically."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.path)
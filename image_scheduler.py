@@ -0,0 +1,258 @@
+"""
+Memory-budgeted scheduling of image conversion jobs.
+
+Peak memory while compiling is driven by the images being converted. Pillow holds a decoded image at 1 byte
+per pixel for L and P images and 4 for everything else (RGB is stored padded to 32 bits), and libwebp needs
+about another ENCODE_BYTES_PER_PIXEL for its YUV planes and analysis buffers at our quality setting (measured
+as peak RSS over the decoded size, for photos and noise alike). A 6000 x 4000 source peaks around 700 MB.
+
+Each job's footprint is estimated from the dimensions and mode in the image header, read without decoding.
+Jobs run largest-first on a pool of worker threads (Pillow releases the GIL while decoding and encoding).
+A job only starts while its estimate plus those of the running jobs fit in the memory budget; smaller jobs
+fill the room left next to a large one, and a job larger than the whole budget runs on its own. Jobs can be
+added while earlier ones run (see JobQueue), so conversion overlaps with reading the catalog.
+
+While jobs run, the process RSS is sampled and every job records the peak seen while it ran. When several
+jobs run at once that peak covers all of them, so per-job figures are exact only with a single worker.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Memory libwebp needs on top of the decoded image, per pixel
+ENCODE_BYTES_PER_PIXEL = 26
+
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Seconds between RSS samples while jobs run
+RSS_SAMPLE_INTERVAL = 0.005
+
+MB = 1024 * 1024
+
+def decoded_bytes_per_pixel(mode):
+    """Bytes per pixel of a decoded Pillow image in the given mode."""
+    if mode in ("1", "L", "P"):
+        return 1
+    if mode.startswith("I;16"):
+        return 2
+    return 4
+
+def estimate_footprint(img):
+    """Estimate the peak memory of converting an opened (not yet loaded) PIL image, in bytes."""
+    width, height = img.size
+    return width * height * (decoded_bytes_per_pixel(img.mode) + ENCODE_BYTES_PER_PIXEL)
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it can't be read."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+class ImageJob:
+    """
+    One unit of work for the scheduler: a callable and its estimated peak memory in bytes. info is copied
+    into the job's record in the build report. After the job ran, result or error is set.
+    """
+
+    def __init__(self, name, run, estimate, **info):
+        self.name = name
+        self.run = run
+        self.estimate = estimate
+        self.info = info
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self.start_rss = None
+        self.peak_rss = None
+        self.concurrent = 0
+
+    def record(self):
+        """The job's entry in the build report."""
+        record = {"name": self.name, **self.info, "estimatedMB": round(self.estimate / MB, 1),
+                  "seconds": None if self.seconds is None else round(self.seconds, 3), "concurrent": self.concurrent}
+        if self.peak_rss is not None:
+            record["peakRssMB"] = round(self.peak_rss / MB, 1)
+            record["rssGrowthMB"] = round((self.peak_rss - self.start_rss) / MB, 1)
+        if self.error is not None:
+            record["error"] = str(self.error)
+        return record
+
+class RSSSampler:
+    """Background thread that samples the process RSS into the peaks of the jobs being tracked."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = current_rss()
+        self.enabled = self.peak is not None
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def track(self, job):
+        if not self.enabled:
+            return
+        rss = current_rss()
+        with self._lock:
+            job.start_rss = job.peak_rss = rss
+            self._jobs.add(job)
+
+    def untrack(self, job):
+        with self._lock:
+            self._jobs.discard(job)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            with self._lock:
+                self.peak = max(self.peak, rss)
+                for job in self._jobs:
+                    job.peak_rss = max(job.peak_rss, rss)
+
+class MemoryScheduler:
+    """Runs ImageJobs on up to `workers` threads, largest first, keeping their estimated memory within `budget` bytes."""
+
+    def __init__(self, budget=DEFAULT_MEMORY_BUDGET, workers=DEFAULT_WORKERS):
+        self.budget = budget
+        self.workers = max(1, workers)
+
+    def start(self, on_done=None):
+        """
+        Start a JobQueue that runs jobs as they are added, so conversion can overlap with whatever produces
+        the jobs. on_done(job) is called on the queue's dispatcher thread as each job finishes.
+        """
+        return JobQueue(self, on_done)
+
+    def run(self, jobs, on_done=None):
+        """
+        Run every job and call on_done(job) as each one finishes. A job that raises has its error set
+        instead of a result. Returns a summary for the build report.
+        """
+        queue = self.start(on_done)
+        queue.add(*jobs)
+        return queue.finish()
+
+class JobQueue:
+    """
+    Jobs being run by a MemoryScheduler. Jobs are started by a dispatcher thread, largest pending job first,
+    whenever they fit in the budget next to the running ones; smaller jobs fill the room left next to a
+    large one. While jobs are still being added, largest-first only applies to the jobs added so far.
+    """
+
+    def __init__(self, scheduler, on_done=None):
+        self.scheduler = scheduler
+        self.on_done = on_done
+        self.jobs = []
+        self._pending = []
+        self._running = {}
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._started = time.perf_counter()
+        self._pool = ThreadPoolExecutor(max_workers=scheduler.workers)
+        self._sampler = RSSSampler().__enter__()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def add(self, *jobs):
+        with self._condition:
+            self.jobs.extend(jobs)
+            self._pending.extend(jobs)
+            self._pending.sort(key=lambda job: job.estimate, reverse=True)
+            self._condition.notify()
+
+    def finish(self):
+        """Wait for every added job to finish. Returns a summary for the build report."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._pool.shutdown()
+        self._sampler.__exit__(None, None, None)
+        if self._error is not None:
+            raise self._error
+        return {
+            "jobs": len(self.jobs),
+            "workers": self.scheduler.workers,
+            "budgetMB": round(self.scheduler.budget / MB, 1),
+            "peakEstimatedMB": round(self._peak_in_use / MB, 1),
+            "peakRssMB": round(self._sampler.peak / MB, 1) if self._sampler.enabled else None,
+            "seconds": round(time.perf_counter() - self._started, 3),
+        }
+
+    def _start_fitting(self):
+        """First fit, largest first: start every pending job that still fits next to the running ones."""
+        i = 0
+        while i < len(self._pending) and len(self._running) < self.scheduler.workers:
+            job = self._pending[i]
+            if self._running and self._in_use + job.estimate > self.scheduler.budget:
+                i += 1
+                continue
+            self._pending.pop(i)
+            self._in_use += job.estimate
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._sampler.track(job)
+            future = self._pool.submit(self._run_job, job)
+            future.add_done_callback(self._notify)
+            self._running[future] = job
+            for other in self._running.values():
+                other.concurrent = max(other.concurrent, len(self._running))
+
+    def _notify(self, future):
+        with self._condition:
+            self._condition.notify()
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                self._start_fitting()
+                if self._closed and not self._pending and not self._running:
+                    return
+                done = [future for future in self._running if future.done()]
+                if not done:
+                    self._condition.wait()
+                    continue
+                finished = [self._running.pop(future) for future in done]
+                for job in finished:
+                    self._in_use -= job.estimate
+                    self._sampler.untrack(job)
+            # Outside the lock, so jobs can be added while the callback runs
+            for job in finished:
+                if self.on_done and self._error is None:
+                    try:
+                        self.on_done(job)
+                    except Exception as e:
+                        self._error = e
+
+    def _run_job(self, job):
+        started = time.perf_counter()
+        try:
+            job.result = job.run()
+        except Exception as e:
+            job.error = e
+        job.seconds = time.perf_counter() - started
@@ -0,0 +1,70 @@
+"""
+Content-addressed store of compiled images, shared by several catalogs.
+
+Catalogs built from different data roots (regional price books, white-label variants) mostly use the same
+manufacturer images. With a shared store, each distinct source image is encoded once per encoder setting:
+
+    <root>/<first 2 hex digits>/<key>.webp
+
+where the key is the SHA-256 of the source image's content hash and the encoder settings (format, quality
+and libwebp version), so changing any of them encodes anew instead of reusing a stale blob. A catalog's
+output image is a hard link to its blob (a copy when the output is on another filesystem), so every
+output directory stays self-contained for serving and publishing while the bytes are stored once.
+Blobs are written to a temporary file and renamed into place, so concurrent compiles can share a store.
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+class ImageStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def __str__(self):
+        return str(self.root)
+
+    def key(self, source_hash, settings):
+        """Key of the blob encoded from a source (by its content hash) with the given encoder settings."""
+        return hashlib.sha256(f"{source_hash}|{settings}".encode()).hexdigest()
+
+    def path(self, key):
+        return self.root / key[:2] / f"{key}.webp"
+
+    def has(self, key):
+        return self.path(key).exists()
+
+    def link(self, key, dest_path):
+        """
+        Put the blob at dest_path, replacing whatever is there. Returns True if it was hard-linked, False if
+        it had to be copied. Existing files are replaced, never written through, so other links stay intact.
+        """
+        blob_path = self.path(key)
+        if os.path.exists(dest_path) and os.path.samefile(dest_path, blob_path):
+            return True
+        fd, temp_path = tempfile.mkstemp(dir=Path(dest_path).parent, prefix=".", suffix=".part")
+        os.close(fd)
+        os.unlink(temp_path)
+        try:
+            try:
+                os.link(blob_path, temp_path)
+                linked = True
+            except OSError:
+                shutil.copyfile(blob_path, temp_path)
+                os.chmod(temp_path, 0o644)
+                linked = False
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        return linked
+
+    def usage(self):
+        """Number of blobs and their total size in bytes."""
+        count = size = 0
+        for path in self.root.glob("*/*.webp"):
+            count += 1
+            size += path.stat().st_size
+        return count, size
@@ -0,0 +1,132 @@
+import io
+import os
+import hashlib
+import threading
+from PIL import Image, ImageFile, ImageOps
+
+# Longest side of an ingested source image; larger images are scaled down
+MAX_IMAGE_DIMENSION = 4096
+
+# Encoder settings for re-encoding a normalized source image, by format
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 95},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 95},
+}
+
+# Format an ingested image is stored in, by the extension of the file it's written to
+FORMATS_BY_EXTENSION = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+def format_for_path(filepath):
+    """The format to store an image in at filepath, or None if its extension doesn't name one."""
+    return FORMATS_BY_EXTENSION.get(os.path.splitext(str(filepath))[1].lower())
+
+def normalize_image(img, data, max_dimension=MAX_IMAGE_DIMENSION, image_format=None):
+    """
+    Normalize a decoded source image: apply and strip its EXIF orientation, drop other metadata
+    and scale it down to fit max_dimension. data is the encoded image the decoder was fed.
+    image_format is the format to store it in (the one its file extension names), so an image served in
+    another format is re-encoded to match; by default the source format is kept where it can be (else PNG).
+    Returns (bytes, image); the original bytes and image are returned untouched if nothing needs changing.
+    """
+    wrong_format = image_format is not None and img.format != image_format
+    if image_format is None:
+        image_format = img.format if img.format in SAVE_OPTIONS else "PNG"
+    too_large = max(img.size) > max_dimension
+    has_exif = bool(img.info.get("exif")) or bool(img.getexif())
+    if not too_large and not has_exif and not wrong_format:
+        return data, img
+
+    normalized = ImageOps.exif_transpose(img)
+    if too_large:
+        normalized.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    if image_format == "JPEG" and normalized.mode not in ("RGB", "L"):
+        normalized = normalized.convert("RGB")
+    elif image_format == "WEBP" and normalized.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in normalized.mode or "transparency" in normalized.info
+        normalized = normalized.convert("RGBA" if has_alpha else "RGB")
+    elif image_format == "PNG" and normalized.mode == "CMYK":
+        normalized = normalized.convert("RGB")
+
+    options = dict(SAVE_OPTIONS[image_format])
+    if img.info.get("icc_profile"):
+        options["icc_profile"] = img.info["icc_profile"]
+    output = io.BytesIO()
+    normalized.save(output, format=image_format, **options)
+    return output.getvalue(), normalized
+
+class IngestStream:
+    """Receives one download's chunks, decoding the image incrementally as they arrive."""
+
+    def __init__(self, ingest, filepath):
+        self.ingest = ingest
+        self.filepath = filepath
+        self.buffer = io.BytesIO()
+        self.parser = ImageFile.Parser()
+        self.error = None
+
+    def write(self, chunk):
+        self.buffer.write(chunk)
+        # A decoding error is raised from finish(), once the whole body has been received
+        if self.error is None:
+            try:
+                self.parser.feed(chunk)
+            except (OSError, ValueError) as e:
+                self.error = e
+
+    def close(self):
+        pass
+
+    def finish(self):
+        """Finish decoding and return the normalized bytes to write to the source tree."""
+        if self.error is not None:
+            raise self.error
+        data = self.buffer.getvalue()
+        img = self.parser.close()
+        output, normalized = normalize_image(img, data, self.ingest.max_dimension, format_for_path(self.filepath))
+        if output is not data:
+            # Encode the WebP from the bytes as written, exactly as compiling the source file would
+            normalized = Image.open(io.BytesIO(output))
+        self.ingest.emit(self.filepath, normalized, output)
+        return output
+
+class ImageIngest:
+    """
+    Streaming ingest for scraped images: the downloader feeds each response into an IngestStream instead of a
+    file, so the image is decoded in memory while it arrives, normalized (see normalize_image) and written once
+    into the brands tree, with no raw copy on disk to read back.
+
+    With a Compiler, the compiled WebP is encoded from the same decoded image and recorded in the compiler's
+    build cache, so the next incremental compile doesn't decode the source file again. Call close() once
+    downloads are finished to save those build cache entries.
+    """
+
+    def __init__(self, max_dimension=MAX_IMAGE_DIMENSION, compiler=None):
+        self.max_dimension = max_dimension
+        self.compiler = compiler
+        self.emitted = {}
+        self._lock = threading.Lock()
+        if compiler:
+            compiler.ensure_directories()
+            compiler.build_cache = compiler.load_build_cache()
+
+    def stream(self, filepath):
+        return IngestStream(self, filepath)
+
+    def emit(self, filepath, img, data):
+        if not self.compiler:
+            return
+        file_hash = hashlib.md5(data).hexdigest()
+        name = self.compiler.emit_image(filepath, img, file_hash)
+        if name:
+            with self._lock:
+                self.emitted[name] = file_hash
+
+    def close(self):
+        """Merge the emitted images into the build cache on disk, keeping anything a compile wrote meanwhile."""
+        if not self.compiler or not self.emitted:
+            return
+        self.compiler.build_cache = self.compiler.load_build_cache()
+        self.compiler.build_cache["images"].update(self.emitted)
+        self.compiler.save_build_cache()
+        print(f"Pre-encoded {len(self.emitted)} compiled WebP images into {self.compiler.images_dir}")
@@ -1,10 +1,15 @@
 import streamlit as st
 import os
-import json
-import shutil
 from PIL import Image
 import uuid
+import time
+import sys
+import subprocess
+import threading
 from pathlib import Path
+from search_index import SearchIndex, strip_html
+from descriptions import excerpt
+from storage import open_store, gallery_slot
 
 # Set page config
 st.set_page_config(page_title="Roofing Materials Builder", layout="wide")
@@ -22,7 +27,29 @@ if 'current_page' not in st.session_state:
 # File paths
 DATA_DIR = Path("data")
 BRANDS_DIR = DATA_DIR / "brands"
-BRANDS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Where brands, materials and images are kept: "files:<brands dir>" (the default) or "sqlite:<store dir>"
+STORE = open_store(os.environ.get("BUILDER_STORE", f"files:{BRANDS_DIR}"))
+
+# Compile output and the log of the last publish run
+OUTPUT_DIR = Path("output")
+PUBLISH_LOG_PATH = OUTPUT_DIR / "publish.log"
+COMPILE_SCRIPT = Path(__file__).parent / "compile.py"
+
+# S3 bucket a publish uploads the compiled output to; without one, publishing only compiles
+PUBLISH_BUCKET = os.environ.get("PUBLISH_BUCKET")
+
+# Grid pagination (cards per page, overridable with BUILDER_PAGE_SIZE)
+PAGE_SIZE_OPTIONS = [6, 12, 24, 48]
+
+def page_size_setting(value, default=12):
+    """Parse BUILDER_PAGE_SIZE, falling back to the default when it isn't a number and keeping at least 1 card per page."""
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+DEFAULT_PAGE_SIZE = page_size_setting(os.environ.get("BUILDER_PAGE_SIZE"))
 
 # Custom CSS for bordered containers
 st.markdown("""
@@ -95,112 +122,174 @@ def get_file_extension(file):
         return ".jpg"  # Default fallback
     return Path(file.name).suffix.lower()
 
-def find_image(directory, base_filename):
-    """Find an image with any supported extension."""
-    extensions = [".jpg", ".jpeg", ".png", ".webp"]
-    for ext in extensions:
-        file_path = directory / f"{base_filename}{ext}"
-        if file_path.exists():
-            return file_path
-    return None
-
-def find_all_images(directory, pattern):
-    """Find all images matching a pattern with any supported extension."""
-    result = []
-    extensions = [".jpg", ".jpeg", ".png", ".webp"]
+def paginate(items, key):
+    """
+    Render page controls for a card grid and return only the items on the current page.
+    Only the returned cards are rendered, so images for other pages are never loaded.
+    """
+    options = sorted(set(PAGE_SIZE_OPTIONS + [DEFAULT_PAGE_SIZE]))
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("Per page", options, index=options.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
     
-    # Fix for invalid glob pattern
-    if pattern == "*":
-        # If pattern is already a wildcard, use it directly
-        for ext in extensions:
-            result.extend(list(directory.glob(f"*{ext}")))
-    else:
-        # Otherwise append wildcard to the pattern
-        for ext in extensions:
-            result.extend(list(directory.glob(f"{pattern}*{ext}")))
+    total_pages = max(1, (len(items) + page_size - 1) // page_size)
+    
+    # Clamp the stored page when filters or page size shrink the result set
+    page_key = f"{key}_page"
+    if page_key not in st.session_state:
+        st.session_state[page_key] = 1
+    elif st.session_state[page_key] > total_pages:
+        st.session_state[page_key] = total_pages
     
-    return result
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=page_key)
+    with col3:
+        start = (page - 1) * page_size
+        end = min(start + page_size, len(items))
+        st.caption(f"Showing {start + 1 if items else 0}-{end} of {len(items)} (page {page} of {total_pages})")
+    
+    return items[start:end]
+
+@st.cache_resource
+def get_search_index():
+    """Return the catalog search index shared by all builder sessions."""
+    return SearchIndex(STORE)
+
+def show_search_results(query):
+    """Search the catalog and list matching materials with a button to open each one."""
+    index = get_search_index()
+    start = time.perf_counter()
+    index.refresh()
+    results = index.search(query)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    if not results:
+        st.info(f"No materials found for '{query}'.")
+        return
+    
+    st.caption(f"{len(results)} results in {elapsed_ms:.1f}ms")
+    for result in results:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"**{result['name']}** · {result['brand']}")
+            if result['headline']:
+                st.caption(result['headline'])
+        with col2:
+            if st.button("Open", key=f"search_{result['brand_id']}_{result['material_id']}"):
+                brand = next((b for b in st.session_state.brands if b['id'] == result['brand_id']), None)
+                material = next((m for m in load_materials(result['brand_id']) if m['id'] == result['material_id']), None)
+                if brand and material:
+                    navigate_to("edit_material", brand, material)
+    st.divider()
+
+@st.cache_resource
+def get_publish_job():
+    """Return the publish job state shared by all builder sessions, so only one compile runs at a time."""
+    return {"process": None, "started": None, "finished": None, "lock": threading.Lock()}
+
+def start_publish():
+    """Start an incremental compile (and upload, with PUBLISH_BUCKET) in a background process. Returns False if one is already running."""
+    job = get_publish_job()
+    with job["lock"]:
+        if job["process"] is not None and job["process"].poll() is None:
+            return False
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        command = [sys.executable, "-u", str(COMPILE_SCRIPT), "--incremental", "--store", str(STORE)]
+        if PUBLISH_BUCKET:
+            command += ["--publish", PUBLISH_BUCKET]
+        with open(PUBLISH_LOG_PATH, 'w') as log:
+            job["process"] = subprocess.Popen(
+                command,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        job["started"] = time.time()
+        job["finished"] = None
+    return True
+
+def read_publish_log():
+    if not PUBLISH_LOG_PATH.exists():
+        return []
+    with open(PUBLISH_LOG_PATH, 'r') as f:
+        return f.read().splitlines()
+
+def show_publish_panel():
+    """Sidebar panel that starts a publish and streams its progress until the compile finishes."""
+    with st.sidebar:
+        st.header("🚀 Publish")
+        st.caption("Recompiles brands and materials changed since the last build.")
+        
+        job = get_publish_job()
+        running = job["process"] is not None and job["process"].poll() is None
+        if st.button("Publish", disabled=running, type="primary"):
+            start_publish()
+            running = True
+        
+        if job["process"] is None:
+            return
+        
+        status = st.empty()
+        progress = st.empty()
+        log_box = st.empty()
+        while True:
+            lines = read_publish_log()
+            converted = sum(1 for line in lines if line.startswith("Converted:"))
+            compiled = sum(1 for line in lines if line.startswith("Compiling material:"))
+            if not running and job["finished"] is None:
+                job["finished"] = time.time()
+            elapsed = (job["finished"] or time.time()) - job["started"]
+            
+            if running:
+                status.info(f"Publishing... {elapsed:.0f}s")
+            elif job["process"].returncode == 0:
+                status.success(f"Published in {elapsed:.0f}s")
+            else:
+                status.error(f"Publish failed (exit code {job['process'].returncode})")
+            progress.caption(f"{compiled} materials recompiled, {converted} images converted")
+            log_box.code("\n".join(lines[-12:]) or "Starting...")
+            
+            if not running:
+                break
+            time.sleep(1)
+            running = job["process"].poll() is None
+        
+        problems = [line for line in lines if line.startswith(("Error", "Warning"))]
+        if problems:
+            with st.expander(f"⚠️ {len(problems)} errors and warnings"):
+                for line in problems:
+                    st.text(line)
 
 # Functions to load and save data
 def load_brands():
-    brands = []
-    for brand_dir in BRANDS_DIR.iterdir():
-        if brand_dir.is_dir():
-            config_file = brand_dir / "config.json"
-            if config_file.exists():
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                    brands.append({
-                        'id': brand_dir.name,
-                        **config
-                    })
+    brands = STORE.load_brands()
     st.session_state.brands = brands
     return brands
 
+def catalog_changed():
+    """Have the search index rescan the store on its next search, after an edit in the builder."""
+    get_search_index().invalidate()
+
 def save_brand(brand):
-    brand_dir = BRANDS_DIR / brand['id']
-    brand_dir.mkdir(exist_ok=True)
-    materials_dir = brand_dir / "materials"
-    materials_dir.mkdir(exist_ok=True)
-    
-    # Save config
-    with open(brand_dir / "config.json", 'w') as f:
-        # Remove ID from config as it's part of the directory structure
-        config = {k: v for k, v in brand.items() if k != 'id'}
-        json.dump(config, f, indent=2)
+    STORE.save_brand(brand)
+    catalog_changed()
 
 def load_materials(brand_id):
-    materials = []
-    materials_dir = BRANDS_DIR / brand_id / "materials"
-    if materials_dir.exists():
-        for material_dir in materials_dir.iterdir():
-            if material_dir.is_dir():
-                config_file = material_dir / "config.json"
-                desc_file = material_dir / "description.html"
-                
-                if config_file.exists():
-                    with open(config_file, 'r') as f:
-                        config = json.load(f)
-                        material = {
-                            'id': material_dir.name,
-                            **config
-                        }
-                        
-                        # Load description if it exists
-                        if desc_file.exists():
-                            with open(desc_file, 'r') as df:
-                                material['description'] = df.read()
-                        else:
-                            material['description'] = '<h1>PRODUCT DESCRIPTION</h1><p>Enter product description here.</p>'
-                        
-                        materials.append(material)
+    materials = STORE.load_materials(brand_id)
+    for material in materials:
+        # Materials saved without a description start from the template
+        material.setdefault('description', '<h1>PRODUCT DESCRIPTION</h1><p>Enter product description here.</p>')
     return materials
 
 def save_material(brand_id, material):
-    material_dir = BRANDS_DIR / brand_id / "materials" / material['id']
-    material_dir.mkdir(exist_ok=True)
-    gallery_dir = material_dir / "gallery"
-    gallery_dir.mkdir(exist_ok=True)
-    
-    # Save description separately
-    description = material.get('description', '')
-    with open(material_dir / "description.html", 'w') as f:
-        f.write(description)
-    
-    # Save config without description
-    config = {k: v for k, v in material.items() if k != 'description' and k != 'id'}
-    with open(material_dir / "config.json", 'w') as f:
-        json.dump(config, f, indent=2)
-
-def upload_image(file, path, filename):
-    """Upload image preserving original extension"""
-    # Get the extension from the uploaded file
+    STORE.save_material(brand_id, material)
+    catalog_changed()
+
+def upload_image(file, brand_id, material_id, slot):
+    """Upload image preserving original extension, replacing the image in the slot"""
     ext = get_file_extension(file)
-    full_path = path / f"{filename}{ext}"
-    
-    with open(full_path, "wb") as f:
-        f.write(file.getbuffer())
-    return str(full_path), ext
+    path = STORE.upload_image(brand_id, material_id, slot, file.getbuffer(), ext)
+    catalog_changed()
+    return path, ext
 
 def navigate_to(page, brand=None, material=None):
     st.session_state.current_page = page
@@ -283,6 +372,9 @@ def main():
     else:
         st.session_state.current_page = "brands"
         show_brands_page()
+    
+    # Rendered last: while a publish runs this keeps streaming its log
+    show_publish_panel()
 
 def show_brand_editor():
     """New function to edit brand details"""
@@ -295,7 +387,7 @@ def show_brand_editor():
         brand_logo = st.file_uploader("Change Brand Logo", type=["jpg", "jpeg", "png", "webp"])
         
         # Display current logo if it exists
-        logo_path = find_image(BRANDS_DIR / brand['id'], f"{brand['id']}_logo")
+        logo_path = STORE.find_image(brand['id'], None, "logo")
         if logo_path:
             st.image(str(logo_path), width=200, caption="Current Logo")
         
@@ -310,14 +402,8 @@ def show_brand_editor():
             
             # Update logo if provided
             if brand_logo:
-                brand_dir = BRANDS_DIR / brand['id']
-                # Remove old logo file if it exists
-                old_logo = find_image(brand_dir, f"{brand['id']}_logo")
-                if old_logo:
-                    old_logo.unlink()
-                
-                # Upload new logo
-                logo_path, ext = upload_image(brand_logo, brand_dir, f"{brand['id']}_logo")
+                # Upload new logo, replacing the old one
+                logo_path, ext = upload_image(brand_logo, brand['id'], None, "logo")
             
             # Save updated brand
             save_brand(brand)
@@ -333,6 +419,11 @@ def show_brand_editor():
 def show_brands_page():
     st.header("Manage Brands")
     
+    # Search across all materials
+    query = st.text_input("🔎 Search materials", placeholder="Search by name, headline, color or description", key="material_search")
+    if query:
+        show_search_results(query)
+    
     # Add new brand button
     with st.expander("➕ Add New Brand", expanded=False):
         with st.form("new_brand_form"):
@@ -354,8 +445,7 @@ def show_brands_page():
                 
                 # Upload logo if provided
                 if brand_logo:
-                    brand_dir = BRANDS_DIR / brand_id
-                    logo_path, ext = upload_image(brand_logo, brand_dir, f"{brand_id}_logo")
+                    logo_path, ext = upload_image(brand_logo, brand_id, None, "logo")
                 
                 # Add to session state
                 st.session_state.brands.append(brand)
@@ -367,23 +457,32 @@ def show_brands_page():
     if not st.session_state.brands:
         st.warning("No brands created yet. Add your first brand above.")
     else:
-        # Display brands in a grid
+        # Filter brands by name
+        brand_filter = st.text_input("Filter brands", placeholder="Type to filter by brand name", key="brand_filter")
+        brands = st.session_state.brands
+        if brand_filter:
+            brands = [b for b in brands if brand_filter.lower() in b.get('company', b['id']).lower()]
+        
+        if not brands:
+            st.info("No brands match the current filter.")
+        
+        # Display the current page of brands in a grid
         cols = st.columns(3)
-        for i, brand in enumerate(st.session_state.brands):
+        for i, brand in enumerate(paginate(brands, "brands")):
             with cols[i % 3]:
                 # Use a container with custom styling instead of the border parameter
                 st.markdown('<div class="custom-container">', unsafe_allow_html=True)
                 
                 col1, col2 = st.columns([1, 2])
                 with col1:
-                    logo_path = find_image(BRANDS_DIR / brand['id'], f"{brand['id']}_logo")
+                    logo_path = STORE.find_image(brand['id'], None, "logo")
                     if logo_path:
                         st.image(str(logo_path), width=100)
                     else:
                         st.image("https://via.placeholder.com/100x100?text=No+Logo", width=100)
                 with col2:
                     st.markdown(f"### {brand['company']}")
-                    st.write(f"{brand.get('description', 'No description')[:100]}...")
+                    st.write(excerpt(strip_html(brand.get('description', '')), 100) or "No description")
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -401,7 +500,8 @@ def show_brands_page():
                         with confirm:
                             st.warning(f"This will delete all materials for {brand['company']}!")
                             if st.button("Confirm Delete"):
-                                shutil.rmtree(BRANDS_DIR / brand['id'])
+                                STORE.delete_brand(brand['id'])
+                                catalog_changed()
                                 st.session_state.brands.remove(brand)
                                 st.success(f"Brand {brand['company']} deleted.")
                                 st.experimental_rerun()
@@ -413,6 +513,19 @@ def show_materials_page():
     brand = st.session_state.current_brand
     st.header(f"{brand['company']} Materials")
     
+    # Switch brand without going back to the brands page
+    brand_ids = [b['id'] for b in st.session_state.brands]
+    if brand['id'] in brand_ids:
+        selected_id = st.selectbox(
+            "Brand",
+            brand_ids,
+            index=brand_ids.index(brand['id']),
+            format_func=lambda brand_id: next(b['company'] for b in st.session_state.brands if b['id'] == brand_id),
+            key="materials_brand_filter"
+        )
+        if selected_id != brand['id']:
+            navigate_to("materials", next(b for b in st.session_state.brands if b['id'] == selected_id))
+    
     # Add new material button
     with st.expander("➕ Add New Material", expanded=False):
         with st.form("new_material_form"):
@@ -460,15 +573,37 @@ def show_materials_page():
     if not materials:
         st.warning("No materials created yet. Add your first material above.")
     else:
-        # Display materials in a grid with modern cards
+        # Filter by price and supported pitch range
+        prices = [float(m.get('price', 0)) for m in materials]
+        col1, col2 = st.columns(2)
+        with col1:
+            min_price, max_price = min(prices), max(prices)
+            if min_price < max_price:
+                price_range = st.slider("Price ($/sq)", min_value=min_price, max_value=max_price, value=(min_price, max_price), key=f"price_filter_{brand['id']}")
+            else:
+                price_range = (min_price, max_price)
+        with col2:
+            pitch_range = st.slider("Must support pitch (x/12)", min_value=0, max_value=12, value=(0, 12), key=f"pitch_filter_{brand['id']}")
+        
+        pitch_filtered = pitch_range != (0, 12)
+        materials = [
+            m for m in materials
+            if price_range[0] <= float(m.get('price', 0)) <= price_range[1]
+            and (not pitch_filtered or (int(m.get('minPitch', 0)) <= pitch_range[0] and int(m.get('maxPitch', 12)) >= pitch_range[1]))
+        ]
+        
+        if not materials:
+            st.info("No materials match the current filters.")
+        
+        # Display the current page of materials in a grid with modern cards
         cols = st.columns(3)
-        for i, material in enumerate(materials):
+        for i, material in enumerate(paginate(materials, f"materials_{brand['id']}")):
             with cols[i % 3]:
                 # Use a container with custom styling
                 st.markdown('<div class="custom-container">', unsafe_allow_html=True)
                 
                 # Material image
-                main_image_path = find_image(BRANDS_DIR / brand['id'] / "materials" / material['id'], f"{material['id']}_main")
+                main_image_path = STORE.find_image(brand['id'], material['id'], "main")
                 if main_image_path:
                     st.image(str(main_image_path), use_column_width=True)
                 else:
@@ -497,8 +632,8 @@ def show_materials_page():
                         with confirm:
                             st.warning(f"This action cannot be undone!")
                             if st.button("Confirm Delete"):
-                                material_dir = BRANDS_DIR / brand['id'] / "materials" / material['id']
-                                shutil.rmtree(material_dir)
+                                STORE.delete_material(brand['id'], material['id'])
+                                catalog_changed()
                                 st.success(f"Material {material['name']} deleted.")
                                 st.experimental_rerun()
                 
@@ -557,7 +692,7 @@ def show_material_editor():
         col1, col2 = st.columns([1, 2])
         with col1:
             # Display current main image
-            main_image_path = find_image(BRANDS_DIR / brand['id'] / "materials" / material['id'], f"{material['id']}_main")
+            main_image_path = STORE.find_image(brand['id'], material['id'], "main")
             if main_image_path:
                 st.image(str(main_image_path), use_column_width=True)
             else:
@@ -576,13 +711,8 @@ def show_material_editor():
                 # Preview
                 st.image(main_image, width=300)
                 if st.button("Save Main Image"):
-                    # Remove old main image if it exists
-                    old_main_image = find_image(BRANDS_DIR / brand['id'] / "materials" / material['id'], f"{material['id']}_main")
-                    if old_main_image:
-                        old_main_image.unlink()
-                    
-                    material_dir = BRANDS_DIR / brand['id'] / "materials" / material['id']
-                    main_image_path, _ = upload_image(main_image, material_dir, f"{material['id']}_main")
+                    # Replaces the old main image if there is one
+                    main_image_path, _ = upload_image(main_image, brand['id'], material['id'], "main")
                     # Update the main image name
                     material['mainImageName'] = main_image_name
                     save_material(brand['id'], material)
@@ -596,7 +726,7 @@ def show_material_editor():
         col1, col2 = st.columns([1, 2])
         with col1:
             # Display current preview image
-            preview_image_path = find_image(BRANDS_DIR / brand['id'] / "materials" / material['id'], f"{material['id']}_preview")
+            preview_image_path = STORE.find_image(brand['id'], material['id'], "preview")
             if preview_image_path:
                 st.image(str(preview_image_path), use_column_width=True)
             else:
@@ -618,20 +748,16 @@ def show_material_editor():
                     # Preview
                     st.image(preview_image, width=300)
                     if st.button("Save Preview Image"):
-                        # Remove old preview image if it exists
-                        old_preview_image = find_image(BRANDS_DIR / brand['id'] / "materials" / material['id'], f"{material['id']}_preview")
-                        if old_preview_image:
-                            old_preview_image.unlink()
-                        
-                        material_dir = BRANDS_DIR / brand['id'] / "materials" / material['id']
-                        preview_image_path, _ = upload_image(preview_image, material_dir, f"{material['id']}_preview")
+                        # Replaces the old preview image if there is one
+                        preview_image_path, _ = upload_image(preview_image, brand['id'], material['id'], "preview")
                         st.success("Preview image uploaded successfully!")
                         st.experimental_rerun()
             else:
                 if preview_image_path:
                     if st.button("Use Main Image Instead"):
                         # Delete the custom preview image
-                        preview_image_path.unlink()
+                        STORE.delete_image(brand['id'], material['id'], "preview")
+                        catalog_changed()
                         st.success("Now using main image for previews")
                         st.experimental_rerun()
     
@@ -734,35 +860,13 @@ def show_material_editor():
                         st.image(gallery_preview, width=150)
             
             if gallery_image and st.button("Add to Gallery"):
-                # Generate index
-                gallery_dir = BRANDS_DIR / brand['id'] / "materials" / material['id'] / "gallery"
-                
-                # Get all existing indices by looking for all image files
-                # Find images that match pattern + number and don't end with _preview
-                existing_images = []
-                for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-                    existing_images.extend(list(gallery_dir.glob(f"{material['id']}_*{ext}")))
-                
-                existing_indices = []
-                for img_path in existing_images:
-                    # Extract the last part of the filename which should be a number
-                    parts = img_path.stem.split('_')
-                    if parts and parts[-1].isdigit() and not img_path.stem.endswith('_preview'):
-                        existing_indices.append(int(parts[-1]))
-                
-                next_index = max(existing_indices) + 1 if existing_indices else 1
-                
-                # Upload image with original extension
-                upload_image(gallery_image, gallery_dir, f"{material['id']}_{next_index}")
-                
-                # Upload preview if provided
+                # Add after the highest existing index, with the thumbnail and name if provided
+                preview = None
                 if use_custom_gallery_preview and gallery_preview:
-                    upload_image(gallery_preview, gallery_dir, f"{material['id']}_{next_index}_preview")
-                
-                # Save name if provided
-                if image_name:
-                    with open(gallery_dir / f"{material['id']}_{next_index}_name.txt", 'w') as f:
-                        f.write(image_name)
+                    preview = (gallery_preview.getbuffer(), get_file_extension(gallery_preview))
+                STORE.add_gallery_image(brand['id'], material['id'], gallery_image.getbuffer(),
+                                        get_file_extension(gallery_image), image_name, preview)
+                catalog_changed()
                 
                 st.success("Gallery image added!")
                 
@@ -770,62 +874,29 @@ def show_material_editor():
                 st.session_state.clear_gallery_upload = True
                 st.experimental_rerun()
         
-        # Display gallery images
-        gallery_dir = BRANDS_DIR / brand['id'] / "materials" / material['id'] / "gallery"
-        
-        # Look for any image files in the gallery directory - fixed glob pattern
-        gallery_images = []
-        for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-            gallery_images.extend(list(gallery_dir.glob(f"*{ext}")))
+        # Display gallery images, ordered by index
+        gallery = STORE.gallery(brand['id'], material['id'])
         
-        # Filter out preview images
-        gallery_images = [img for img in gallery_images if not img.stem.endswith('_preview')]
-        
-        if not gallery_images:
+        if not gallery:
             st.warning("No gallery images yet. Add images using the section above.")
         else:
-            # Get the numeric index from the filename, regardless of prefix
-            gallery_indices = []
-            for img in gallery_images:
-                parts = img.stem.split('_')
-                if parts and parts[-1].isdigit():
-                    gallery_indices.append(int(parts[-1]))
-            
-            # Sort indices
-            gallery_indices = list(set(gallery_indices))  # Remove duplicates
-            gallery_indices.sort()
-            
             # Display gallery images in a grid
             num_columns = 3  # Changed from 2 to 3 for smaller images
-            rows = [gallery_indices[i:i + num_columns] for i in range(0, len(gallery_indices), num_columns)]
+            rows = [gallery[i:i + num_columns] for i in range(0, len(gallery), num_columns)]
             
             for row in rows:
                 cols = st.columns(num_columns)
-                for i, index in enumerate(row):
+                for i, entry in enumerate(row):
                     if i < len(row):
                         with cols[i]:
                             # Use custom container styling
                             st.markdown('<div class="custom-container">', unsafe_allow_html=True)
                             
-                            # Find the file with this index number at the end
-                            image_files = []
-                            for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-                                image_files.extend(list(gallery_dir.glob(f"*_{index}{ext}")))
-                            
-                            if not image_files:
-                                continue
-                                
-                            image_path = image_files[0]  # Use the first matching file
-                            image_base = image_path.stem  # Get filename without extension
-                            image_prefix = image_base.rsplit('_', 1)[0]  # Get everything before the _index
-                            
-                            preview_path = find_image(gallery_dir, f"{image_prefix}_{index}_preview")
-                            name_path = gallery_dir / f"{image_prefix}_{index}_name.txt"
-                            
-                            image_name = ""
-                            if name_path.exists():
-                                with open(name_path, 'r') as f:
-                                    image_name = f.read()
+                            index = entry["index"]
+                            image_path = entry["image"]
+                            preview_path = entry["preview"]
+                            image_name = entry["name"]
+                            slot = gallery_slot(index)
                             
                             # Display image and caption - smaller size
                             st.image(str(image_path), width=200, caption=image_name if image_name else f"Image {index}")
@@ -837,8 +908,8 @@ def show_material_editor():
                                     # Edit caption
                                     new_name = st.text_input(f"Caption", value=image_name, key=f"name_{index}")
                                     if new_name != image_name:
-                                        with open(name_path, 'w') as f:
-                                            f.write(new_name)
+                                        STORE.set_caption(brand['id'], material['id'], slot, new_name)
+                                        catalog_changed()
                                         st.success("Caption saved")
                                     
                                     # Thumbnail settings
@@ -848,33 +919,30 @@ def show_material_editor():
                                     if use_custom and not has_custom:
                                         preview_upload = st.file_uploader(f"Upload thumbnail", type=["jpg", "jpeg", "png", "webp"], key=f"preview_{index}")
                                         if preview_upload and st.button(f"Save thumbnail", key=f"save_preview_{index}"):
-                                            upload_image(preview_upload, gallery_dir, f"{image_prefix}_{index}_preview")
+                                            upload_image(preview_upload, brand['id'], material['id'], gallery_slot(index, preview=True))
                                             st.success("Thumbnail saved!")
                                             st.experimental_rerun()
                                     elif use_custom and has_custom:
                                         st.image(str(preview_path), width=100, caption="Current thumbnail")
                                         new_preview = st.file_uploader(f"Change thumbnail", type=["jpg", "jpeg", "png", "webp"], key=f"change_preview_{index}")
                                         if new_preview and st.button(f"Update thumbnail", key=f"update_preview_{index}"):
-                                            # Remove old preview
-                                            preview_path.unlink()
-                                            # Upload new preview
-                                            upload_image(new_preview, gallery_dir, f"{image_prefix}_{index}_preview")
+                                            # Upload new preview, replacing the old one
+                                            upload_image(new_preview, brand['id'], material['id'], gallery_slot(index, preview=True))
                                             st.success("Thumbnail updated!")
                                             st.experimental_rerun()
                                     elif not use_custom and has_custom:
                                         if st.button(f"Remove custom thumbnail", key=f"remove_preview_{index}"):
-                                            preview_path.unlink()
+                                            STORE.delete_image(brand['id'], material['id'], gallery_slot(index, preview=True))
+                                            catalog_changed()
                                             st.success("Using main image as thumbnail")
                                             st.experimental_rerun()
                             
                             with col2:
                                 # Delete image button
                                 if st.button(f"🗑️ Delete", key=f"delete_gallery_{index}"):
-                                    # Delete all related files
-                                    image_path.unlink(missing_ok=True)
-                                    name_path.unlink(missing_ok=True)
-                                    if preview_path:
-                                        preview_path.unlink(missing_ok=True)
+                                    # Delete the image with its thumbnail and caption
+                                    STORE.delete_gallery_image(brand['id'], material['id'], index)
+                                    catalog_changed()
                                     st.success(f"Gallery image {index} deleted.")
                                     st.experimental_rerun()
                             
@@ -0,0 +1,209 @@
+"""
+Dominant colors of material images, and an index for finding materials close to a color.
+
+Colors are extracted by k-means in CIELAB space on a downsampled copy of the image, so clusters follow
+perceived color rather than raw RGB. Each palette is a list of the image's dominant colors, largest first:
+
+    [{"hex": "#6b5d50", "lab": [39.9, 3.6, 8.5], "weight": 0.42}, ...]
+
+where weight is the share of the image's pixels in that cluster. Closeness between colors is the CIE76
+color difference, the Euclidean distance in Lab: about 2.3 is a just-noticeable difference and anything
+under 10 reads as "the same color family".
+"""
+import json
+import threading
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from signatures import file_signature
+
+INDEX_PATH = Path("output") / "color-index.json"
+
+# Colors per palette, and the size images are reduced to before clustering
+PALETTE_SIZE = 4
+SAMPLE_SIZE = 64
+KMEANS_ITERATIONS = 20
+
+# Palette colors covering less of the image than this aren't indexed
+MIN_INDEX_WEIGHT = 0.15
+
+# sRGB (D65) to XYZ, and the D65 white point
+RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+XYZ_TO_RGB = np.linalg.inv(RGB_TO_XYZ)
+WHITE_POINT = np.array([0.95047, 1.0, 1.08883])
+
+def rgb_to_lab(rgb):
+    """Convert an (..., 3) array of sRGB values in 0-255 to CIELAB."""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = linear @ RGB_TO_XYZ.T / WHITE_POINT
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+def lab_to_rgb(lab):
+    """Convert an (..., 3) array of CIELAB values to sRGB in 0-255, clipped to the gamut."""
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f > 6 / 29, f ** 3, 3 * (6 / 29) ** 2 * (f - 4 / 29)) * WHITE_POINT
+    linear = np.clip(xyz @ XYZ_TO_RGB.T, 0, 1)
+    rgb = np.where(linear > 0.0031308, 1.055 * linear ** (1 / 2.4) - 0.055, 12.92 * linear)
+    return np.clip(np.round(rgb * 255), 0, 255)
+
+def parse_color(text):
+    """Parse "#rrggbb", "rrggbb" or "r,g,b" into an RGB tuple."""
+    text = text.strip()
+    if "," in text:
+        rgb = tuple(int(part) for part in text.split(","))
+    else:
+        text = text.lstrip("#")
+        if len(text) != 6:
+            raise ValueError(f"expected a color like #6b5d50 or 107,93,80, got {text!r}")
+        rgb = tuple(int(text[i:i + 2], 16) for i in (0, 2, 4))
+    if len(rgb) != 3 or not all(0 <= c <= 255 for c in rgb):
+        raise ValueError(f"expected three color components from 0 to 255, got {text!r}")
+    return rgb
+
+def kmeans(points, k, iterations=KMEANS_ITERATIONS):
+    """
+    Cluster (n, 3) points into at most k clusters. Seeded with k-means++ from a fixed random state, so the
+    same image always gives the same palette. Returns the cluster centers and each cluster's point count.
+    """
+    rng = np.random.default_rng(0)
+    centers = points[[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        if distances.sum() == 0:
+            break
+        centers = np.vstack([centers, points[rng.choice(len(points), p=distances / distances.sum())]])
+
+    for _ in range(iterations):
+        labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        # Empty clusters keep their center
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.allclose(updated, centers):
+            break
+        centers = updated
+
+    labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    counts = np.bincount(labels, minlength=len(centers))
+    return centers[counts > 0], counts[counts > 0]
+
+def dominant_colors(img, k=PALETTE_SIZE, sample_size=SAMPLE_SIZE):
+    """Return the palette of a PIL image: up to k colors, largest share first."""
+    # JPEGs can be decoded straight at a reduced scale
+    img.draft("RGB", (sample_size * 4, sample_size * 4))
+    img = img.convert("RGBA")
+    img.thumbnail((sample_size, sample_size))
+    pixels = np.asarray(img, dtype=np.float64).reshape(-1, 4)
+    # Ignore (mostly) transparent pixels
+    pixels = pixels[pixels[:, 3] >= 128, :3]
+    if not len(pixels):
+        return []
+
+    centers, counts = kmeans(rgb_to_lab(pixels), k)
+    order = np.argsort(-counts, kind="stable")
+    rgb = lab_to_rgb(centers[order]).astype(int)
+    weights = counts[order] / counts.sum()
+    return [
+        {"hex": "#{:02x}{:02x}{:02x}".format(*color), "lab": [round(float(v), 1) for v in lab],
+         "weight": round(float(weight), 3)}
+        for color, lab, weight in zip(rgb, centers[order], weights)
+    ]
+
+def build_color_index(all_companies):
+    """
+    Build the color index for a compiled catalog: every sufficiently large palette color of every enabled
+    material's own image and of each of its named gallery swatches.
+
+        {"materials": [[brand_id, material_id, name], ...],
+         "colors": [[material index, swatch name or "", hex, L, a, b], ...]}
+    """
+    materials = []
+    colors = []
+    for brand_id, brand in all_companies.items():
+        for material in brand.get("materials", []):
+            if not material.get("enabled", True):
+                continue
+            index = len(materials)
+            materials.append([brand_id, material["id"], material.get("name", material["id"])])
+            palettes = [("", material.get("colors", []))]
+            palettes += zip(material.get("galleryImagesNames", []), material.get("galleryColors", []))
+            for swatch, palette in palettes:
+                for color in palette:
+                    if color["weight"] >= MIN_INDEX_WEIGHT:
+                        colors.append([index, swatch, color["hex"], *color["lab"]])
+    return {"materials": materials, "colors": colors}
+
+class ColorIndex:
+    """
+    Query API over the color index compile writes next to the catalog.
+    Answers "materials closest to this color" with one vectorized distance computation over all indexed colors.
+    """
+
+    def __init__(self, data):
+        self.materials = data["materials"]
+        rows = data["colors"]
+        self.material_index = np.array([row[0] for row in rows], dtype=np.int64)
+        self.swatches = [row[1] for row in rows]
+        self.hexes = [row[2] for row in rows]
+        self.lab = np.array([row[3:6] for row in rows], dtype=np.float64).reshape(-1, 3)
+
+    def closest(self, rgb, limit=10, max_distance=None):
+        """
+        Return the materials with a color closest to an RGB tuple, best first, one result per material, as
+        dicts with brand_id, material_id, name, swatch (the gallery color name, or "" for the material's own
+        image), hex and distance (CIE76 delta E).
+        """
+        if not len(self.lab):
+            return []
+        distances = np.sqrt(((self.lab - rgb_to_lab(rgb)) ** 2).sum(axis=1))
+        order = np.argsort(distances, kind="stable")
+        # The first row of each material in distance order is its closest color
+        _, first = np.unique(self.material_index[order], return_index=True)
+        best = order[np.sort(first)]
+        if max_distance is not None:
+            best = best[distances[best] <= max_distance]
+        results = []
+        for row in best[:limit]:
+            brand_id, material_id, name = self.materials[self.material_index[row]]
+            results.append({"brand_id": brand_id, "material_id": material_id, "name": name,
+                            "swatch": self.swatches[row], "hex": self.hexes[row], "distance": float(distances[row])})
+        return results
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def load_color_index(path=INDEX_PATH):
+    """Load a color index, memoized until the file is rewritten by a build."""
+    path = str(Path(path).resolve())
+    version = file_signature(path)
+    with _index_lock:
+        cached = _index_cache.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    with open(path, 'r') as f:
+        index = ColorIndex(json.load(f))
+    with _index_lock:
+        _index_cache[path] = (version, index)
+    return index
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="List the materials closest to a color.")
+    parser.add_argument("color", help="color as #rrggbb or r,g,b")
+    parser.add_argument("--limit", type=int, default=10, help="materials to show (default: 10)")
+    parser.add_argument("--max-distance", type=float, help="only colors within this CIE76 delta E")
+    parser.add_argument("--index", default=str(INDEX_PATH), help="index file (default: output/color-index.json)")
+    args = parser.parse_args()
+
+    for result in load_color_index(args.index).closest(parse_color(args.color), args.limit, args.max_distance):
+        swatch = f" ({result['swatch']})" if result["swatch"] else ""
+        print(f"ΔE {result['distance']:>5.1f}  {result['hex']}  {result['brand_id']}/{result['material_id']}{swatch}")
@@ -0,0 +1,162 @@
+"""
+Roof quotes computed from the pricing fields of the compiled catalog.
+
+A roof is a list of facets, each an (area, pitch) pair: the facet's surface area in square feet and its
+pitch as rise per 12 of run. For a material with the builder's pricing fields, a roof is quoted as
+
+    squares(facet)  = area / 100 * (1 + waste / 100)
+    rate(facet)     = price + pricePerPitch * max(0, pitch - pitchThreshold)
+    quote(roof)     = sum over facets of squares(facet) * rate(facet)
+
+so price is per square (100 sq ft) of installed material including waste, and every pitch step above the
+threshold adds pricePerPitch per square. A material only fits a roof if every facet's pitch lies within
+[minPitch, maxPitch]; quotes for materials that don't fit are NaN. Disabled materials aren't quoted.
+
+quote_material() is the straightforward per-material, per-facet version of the formula. quote_roofs()
+computes the same numbers for every enabled material across many roofs at once with NumPy, from arrays
+that are built once per catalog version and memoized. It relies on two rearrangements of the formula:
+
+    quote(roof) = (1 + waste / 100) / 100 * (price * total area + pricePerPitch * S(pitchThreshold))
+    S(t)        = sum over facets of area * max(0, pitch - t)
+
+and a material fits a roof exactly when minPitch <= the roof's lowest pitch and its highest pitch <= maxPitch.
+S only needs computing once per distinct threshold, so the work grows with facets x thresholds plus
+roofs x materials, never facets x materials.
+"""
+import json
+import threading
+import numpy as np
+from pathlib import Path
+from signatures import file_signature
+
+CATALOG_PATH = Path("output") / "all-companies.json"
+
+# Defaults for materials missing a pricing field, the same as the builder's "Add New Material" form
+PRICING_DEFAULTS = {
+    "price": 500.0,
+    "waste": 10,
+    "minPitch": 3,
+    "maxPitch": 12,
+    "pitchThreshold": 7,
+    "pricePerPitch": 15.0,
+}
+
+def quote_material(material, facets):
+    """Quote one roof for one material dict, or return None if the material doesn't fit the roof's pitches."""
+    pricing = {field: float(material.get(field, default)) for field, default in PRICING_DEFAULTS.items()}
+    total = 0.0
+    for area, pitch in facets:
+        if not pricing["minPitch"] <= pitch <= pricing["maxPitch"]:
+            return None
+        squares = area / 100 * (1 + pricing["waste"] / 100)
+        rate = pricing["price"] + pricing["pricePerPitch"] * max(0.0, pitch - pricing["pitchThreshold"])
+        total += squares * rate
+    return total
+
+class CatalogArrays:
+    """The enabled materials of a catalog, with one NumPy array per pricing field in material order."""
+
+    def __init__(self, catalog):
+        self.brand_ids = []
+        self.material_ids = []
+        self.names = []
+        fields = {field: [] for field in PRICING_DEFAULTS}
+        for brand_id, brand in catalog.items():
+            for material in brand.get("materials", []):
+                if not material.get("enabled", True):
+                    continue
+                self.brand_ids.append(brand_id)
+                self.material_ids.append(material["id"])
+                self.names.append(material.get("name", material["id"]))
+                for field, default in PRICING_DEFAULTS.items():
+                    fields[field].append(float(material.get(field, default)))
+
+        self.price = np.array(fields["price"], dtype=np.float64)
+        self.waste_factor = 1 + np.array(fields["waste"], dtype=np.float64) / 100
+        self.min_pitch = np.array(fields["minPitch"], dtype=np.float64)
+        self.max_pitch = np.array(fields["maxPitch"], dtype=np.float64)
+        self.pitch_threshold = np.array(fields["pitchThreshold"], dtype=np.float64)
+        self.price_per_pitch = np.array(fields["pricePerPitch"], dtype=np.float64)
+        self.thresholds, self.threshold_index = np.unique(self.pitch_threshold, return_inverse=True)
+
+    def __len__(self):
+        return len(self.material_ids)
+
+_arrays_cache = {}
+_arrays_lock = threading.Lock()
+
+def catalog_arrays(catalog_path=CATALOG_PATH):
+    """
+    Return the CatalogArrays for a catalog JSON file. They're memoized by the file's size and mtime,
+    so the catalog is only parsed again after a build rewrites it.
+    """
+    path = str(Path(catalog_path).resolve())
+    version = file_signature(path)
+    with _arrays_lock:
+        cached = _arrays_cache.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    with open(path, 'r') as f:
+        arrays = CatalogArrays(json.load(f))
+    with _arrays_lock:
+        _arrays_cache[path] = (version, arrays)
+    return arrays
+
+def flatten_roofs(roofs):
+    """Flatten a list of roofs into facet area and pitch arrays plus each roof's first facet index."""
+    counts = np.array([len(facets) for facets in roofs], dtype=np.int64)
+    if (counts == 0).any():
+        raise ValueError("every roof needs at least one facet")
+    facets = np.array([facet for facets in roofs for facet in facets], dtype=np.float64).reshape(-1, 2)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return facets[:, 0], facets[:, 1], starts
+
+def quote_roofs(roofs, arrays=None):
+    """
+    Quote every enabled material for every roof.
+    Returns a (roofs x materials) float array in CatalogArrays order, NaN where a material doesn't fit a roof.
+    """
+    if arrays is None:
+        arrays = catalog_arrays()
+    if not roofs:
+        return np.empty((0, len(arrays)))
+    area, pitch, starts = flatten_roofs(roofs)
+
+    # Per roof: total area, pitch range, and the surcharged area S(t) for each distinct threshold
+    total_area = np.add.reduceat(area, starts)
+    lowest_pitch = np.minimum.reduceat(pitch, starts)
+    highest_pitch = np.maximum.reduceat(pitch, starts)
+    surcharge_area = np.add.reduceat(area[:, None] * np.maximum(0.0, pitch[:, None] - arrays.thresholds), starts, axis=0)
+
+    quotes = arrays.waste_factor / 100 * (arrays.price * total_area[:, None]
+                                          + arrays.price_per_pitch * surcharge_area[:, arrays.threshold_index])
+    fits = (lowest_pitch[:, None] >= arrays.min_pitch) & (highest_pitch[:, None] <= arrays.max_pitch)
+    quotes[~fits] = np.nan
+    return quotes
+
+def quote_roof(facets, arrays=None, limit=None):
+    """
+    Quote one roof and return the materials that fit it, cheapest first, as dicts with
+    brand_id, material_id, name and quote.
+    """
+    if arrays is None:
+        arrays = catalog_arrays()
+    quotes = quote_roofs([facets], arrays)[0]
+    order = [i for i in np.argsort(quotes, kind="stable") if not np.isnan(quotes[i])]
+    return [
+        {"brand_id": arrays.brand_ids[i], "material_id": arrays.material_ids[i],
+         "name": arrays.names[i], "quote": float(quotes[i])}
+        for i in order[:limit]
+    ]
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Quote a roof against the compiled catalog.")
+    parser.add_argument("facets", nargs="+", metavar="AREA@PITCH", help="facets, e.g. 1200@6 800@9")
+    parser.add_argument("--catalog", default=str(CATALOG_PATH), help="catalog JSON (default: output/all-companies.json)")
+    parser.add_argument("--limit", type=int, default=10, help="materials to show (default: 10)")
+    args = parser.parse_args()
+
+    roof = [tuple(float(part) for part in facet.split("@")) for facet in args.facets]
+    for result in quote_roof(roof, catalog_arrays(args.catalog), args.limit):
+        print(f"${result['quote']:>12,.2f}  {result['brand_id']}/{result['material_id']}")
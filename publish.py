@@ -0,0 +1,187 @@
+import json
+import hashlib
+import argparse
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlsplit
+from compile import OUTPUT_DIR, IMAGE_PREFIX, COMPRESSED_SUFFIXES
+from serve import CATALOG_PATH, content_type_for, cache_control_for
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+# Object keys mirror the public URLs: images under the image prefix's path, everything else next to the catalog
+IMAGES_KEY_PREFIX = urlsplit(IMAGE_PREFIX).path.lstrip("/")
+CATALOG_KEY_PREFIX = posixpath.dirname(CATALOG_PATH.lstrip("/")) + "/"
+
+# The last published manifest, kept in the bucket so the next publish knows what is already there
+REMOTE_MANIFEST_NAME = "manifest.json"
+
+# Files at least this large are uploaded in parts of this size
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+
+DEFAULT_WORKERS = 8
+
+class PublishError(Exception):
+    pass
+
+class Publisher:
+    """
+    Uploads the compiled output to an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    The build manifest says what every output file contains; the copy of it stored in the bucket by the last
+    publish says what the bucket holds, so only new or changed files are uploaded. Uploads run on a bounded
+    thread pool, large files as multipart uploads, each with the Content-Type and Cache-Control serve.py uses.
+    Images and other files go first and the JSON files last, the catalog JSON after everything else and the
+    remote manifest only once all uploads succeeded, so clients never see a catalog referring to an image
+    that isn't there yet. Precompressed variants aren't uploaded, since object storage can't negotiate them.
+    Objects are never deleted, just as compile preserves images that are no longer used.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, bucket=None, endpoint_url=None, workers=DEFAULT_WORKERS,
+                 images_key_prefix=IMAGES_KEY_PREFIX, catalog_key_prefix=CATALOG_KEY_PREFIX, log=print):
+        if boto3 is None:
+            raise PublishError("Publishing needs boto3: pip install boto3")
+        self.output_dir = Path(output_dir)
+        self.manifest_path = self.output_dir / "manifest.json"
+        self.bucket = bucket
+        self.workers = workers
+        self.images_key_prefix = images_key_prefix
+        self.catalog_key_prefix = catalog_key_prefix
+        self.log = log
+        # Clients are thread-safe; give the pool one connection per worker
+        self.client = boto3.session.Session().client(
+            "s3", endpoint_url=endpoint_url, config=Config(max_pool_connections=max(10, workers)))
+        # Parallelism comes from the pool, so each upload sends its parts one after another
+        self.transfer_config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD,
+                                              multipart_chunksize=MULTIPART_CHUNKSIZE, use_threads=False)
+        self._lock = threading.Lock()
+
+    def key(self, relative_path):
+        """Object key for an output file."""
+        if relative_path.startswith("images/"):
+            return self.images_key_prefix + relative_path[len("images/"):]
+        return self.catalog_key_prefix + relative_path
+
+    def load_local_manifest(self):
+        if not self.manifest_path.exists():
+            raise PublishError(f"No build manifest at {self.manifest_path}; run compile.py first")
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f).get("files", {})
+
+    def load_remote_manifest(self):
+        """Return the files listed by the last publish's manifest, or {} if nothing was published yet."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key(REMOTE_MANIFEST_NAME))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return {}
+            raise
+        try:
+            return json.loads(response["Body"].read()).get("files", {})
+        except ValueError as e:
+            self.log(f"Warning: Ignoring unreadable remote manifest: {e}")
+            return {}
+
+    def current_entry(self, relative_path, entry):
+        """Return the manifest entry for a file, re-hashing it if it changed since the manifest was written."""
+        stat = (self.output_dir / relative_path).stat()
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry
+        self.log(f"Warning: {relative_path} changed since the manifest was written")
+        with open(self.output_dir / relative_path, 'rb') as f:
+            sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+        return {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+    def upload(self, relative_path, entry):
+        self.client.upload_file(
+            str(self.output_dir / relative_path), self.bucket, self.key(relative_path),
+            ExtraArgs={
+                "ContentType": content_type_for(relative_path),
+                "CacheControl": cache_control_for(relative_path),
+                "Metadata": {"sha256": entry["sha256"]},
+            },
+            Config=self.transfer_config)
+
+    def upload_all(self, files):
+        """Upload (relative_path, entry) pairs on the thread pool. Returns the number of failures."""
+        failures = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.upload, path, entry): path for path, entry in files}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    self.log(f"Uploaded: {futures[future]}")
+                except Exception as e:
+                    failures += 1
+                    self.log(f"Error uploading {futures[future]}: {e}")
+        return failures
+
+    def publish(self, force=False, dry_run=False):
+        """
+        Upload every output file that changed since the last publish (or all of them with force).
+        Returns a dict with the number of uploaded and skipped files.
+        """
+        local = self.load_local_manifest()
+        remote = {} if force else self.load_remote_manifest()
+
+        variants = {variant for entry in local.values() for variant in entry.get("encodings", {}).values()}
+        variants.update(path for path in local if path.endswith(tuple(COMPRESSED_SUFFIXES.values())))
+        files = {}
+        for relative_path, entry in local.items():
+            if relative_path in variants or not (self.output_dir / relative_path).exists():
+                continue
+            files[relative_path] = self.current_entry(relative_path, entry)
+
+        changed = [(path, entry) for path, entry in sorted(files.items())
+                   if remote.get(path, {}).get("sha256") != entry["sha256"]]
+        skipped = len(files) - len(changed)
+        self.log(f"Publishing to s3://{self.bucket}: {len(changed)} changed, {skipped} unchanged")
+        if dry_run:
+            for path, _ in changed:
+                self.log(f"Would upload: {path} -> {self.key(path)}")
+            return {"uploaded": 0, "skipped": skipped}
+
+        # Three stages: images and other files, then JSON, then the catalog itself
+        catalog = [(path, entry) for path, entry in changed if path == "all-companies.json"]
+        json_files = [(path, entry) for path, entry in changed if path.endswith(".json") and (path, entry) not in catalog]
+        other = [(path, entry) for path, entry in changed if not path.endswith(".json")]
+        for stage in (other, json_files, catalog):
+            if stage and self.upload_all(stage):
+                raise PublishError("Some uploads failed; the catalog was not updated. Run publish again to retry.")
+
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key(REMOTE_MANIFEST_NAME),
+            Body=json.dumps({"files": files}, indent=2).encode(),
+            ContentType="application/json", CacheControl=cache_control_for(REMOTE_MANIFEST_NAME))
+        self.log(f"Publish complete: {len(changed)} uploaded, {skipped} unchanged")
+        return {"uploaded": len(changed), "skipped": skipped}
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload the compiled catalog and images to S3-compatible storage.")
+    parser.add_argument("bucket", help="bucket to publish to")
+    parser.add_argument("--endpoint-url", help="S3 endpoint for MinIO and other S3-compatible stores "
+                                               "(default: AWS, or the AWS_ENDPOINT_URL environment variable)")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="compiled output directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent uploads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--force", action="store_true", help="upload every file, ignoring the remote manifest")
+    parser.add_argument("--dry-run", action="store_true", help="only list the files that would be uploaded")
+    args = parser.parse_args()
+
+    try:
+        publisher = Publisher(args.output_dir, args.bucket, args.endpoint_url, args.workers)
+        publisher.publish(force=args.force, dry_run=args.dry_run)
+    except PublishError as e:
+        parser.exit(1, f"Error: {e}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+import threading
+
+class ScrapeJournal:
+    """
+    Append-only JSONL record of a scrape run's progress, so a crashed or interrupted run can resume.
+
+    Each line is one event:
+        {"event": "links", "url": listing_url, "links": [[link, color_name], ...]}
+        {"event": "page", "url": link, "page": {...}}
+        {"event": "download_started", "url": ..., "path": ..., "etag": ..., "last_modified": ..., "length": ...}
+        {"event": "download", "url": ..., "path": ..., "sha256": ..., "size": ...}
+
+    Opening a journal replays it, so discovered links, extracted pages and finished downloads are
+    skipped on the next run, and an interrupted download can continue from its partial file using the
+    validators recorded when it started. Lines are flushed and fsynced as they're written; a torn last
+    line from a crash is ignored. clear() removes the journal once a run completes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.links = {}
+        self.pages = {}
+        self.downloads_started = {}
+        self.downloads = {}
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        continue
+        self.resumed = bool(self.links or self.pages or self.downloads)
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a')
+
+    def _apply(self, entry):
+        event = entry.get("event")
+        if event == "links":
+            self.links[entry["url"]] = [tuple(link) for link in entry["links"]]
+        elif event == "page":
+            self.pages[entry["url"]] = entry["page"]
+        elif event == "download_started":
+            self.downloads_started[entry["path"]] = entry
+        elif event == "download":
+            self.downloads[entry["path"]] = entry
+
+    def _append(self, entry):
+        with self._lock:
+            self._apply(entry)
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record_links(self, url, links):
+        self._append({"event": "links", "url": url, "links": [list(link) for link in links]})
+
+    def record_page(self, url, page):
+        self._append({"event": "page", "url": url, "page": page})
+
+    def record_download_started(self, url, filepath, etag, last_modified, length=None):
+        self._append({"event": "download_started", "url": url, "path": os.path.abspath(filepath),
+                      "etag": etag, "last_modified": last_modified, "length": length})
+
+    def record_download(self, url, filepath, sha256, size):
+        self._append({"event": "download", "url": url, "path": os.path.abspath(filepath),
+                      "sha256": sha256, "size": size})
+
+    def download_started(self, url, filepath):
+        """Return the validators recorded when a download of url into filepath began, or None."""
+        with self._lock:
+            entry = self.downloads_started.get(os.path.abspath(filepath))
+        return entry if entry and entry["url"] == url else None
+
+    def download_complete(self, url, filepath):
+        """Check whether url was fully downloaded into filepath and the file still has the recorded content."""
+        with self._lock:
+            entry = self.downloads.get(os.path.abspath(filepath))
+        if not entry or entry["url"] != url:
+            return False
+        try:
+            if os.path.getsize(filepath) != entry["size"]:
+                return False
+            with open(filepath, 'rb') as f:
+                return hashlib.file_digest(f, "sha256").hexdigest() == entry["sha256"]
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def clear(self):
+        """Close and delete the journal after a completed run."""
+        self.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
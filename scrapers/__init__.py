@@ -0,0 +1,26 @@
+"""Manufacturer scraper plugins that write straight into the builder's data/brands layout."""
+from scrapers.base import Extractor, ColorPageExtractor, make_driver
+from scrapers.tamko import TamkoStormFighterFlex
+from scrapers.writer import CatalogWriter
+
+# Registered plugins. Add a manufacturer by subclassing Extractor (or ColorPageExtractor) and listing it here.
+EXTRACTORS = [
+    TamkoStormFighterFlex,
+]
+
+# Manufacturers in data/brands that still need a plugin, by brand id. Their sites' color pages haven't been
+# captured, so there are no selectors to write one from; the scraper reports them instead of guessing.
+PENDING_MANUFACTURERS = {
+    "gaf": "GAF",
+    "iko": "IKO",
+    "malarkey-roofing-": "Malarkey",
+    "owens-corning": "Owens Corning",
+}
+
+def get_extractors(brand_ids=None):
+    """Return an instance of every registered plugin, or only those for the given brand ids."""
+    return [cls() for cls in EXTRACTORS if not brand_ids or cls.brand_id in brand_ids]
+
+def pending_manufacturers(brand_ids=None):
+    """Return the names of the manufacturers without a plugin yet, or of those among the given brand ids."""
+    return [name for brand_id, name in PENDING_MANUFACTURERS.items() if not brand_ids or brand_id in brand_ids]
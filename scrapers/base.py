@@ -0,0 +1,222 @@
+import re
+import requests
+from html import escape
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+# Longest time to wait for a page's required elements to appear
+WAIT_TIMEOUT = 15
+
+CSS_URL_PATTERN = re.compile(r"url\(\s*['\"]?(.*?)['\"]?\s*\)")
+
+def css_url(value):
+    """Extract the URL from a CSS background-image value, or None if there isn't one."""
+    match = CSS_URL_PATTERN.search(value or "")
+    return match.group(1) if match else None
+
+def make_driver(headless=True):
+    """Start Chrome (you'll need to have chromedriver installed), headless unless asked otherwise."""
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    return webdriver.Chrome(options=options)
+
+def fetch_html(session, url):
+    """Fetch a page's static HTML, or return None if the request fails."""
+    try:
+        response = session.get(url, timeout=WAIT_TIMEOUT)
+        if response.status_code == 200:
+            return response.text
+    except requests.RequestException as e:
+        print(f"Static fetch failed for {url}: {e}")
+    return None
+
+class Extractor:
+    """
+    Base class for a manufacturer plugin.
+
+    A plugin names the brand and material it scrapes (matching the data/brands/<brand_id>/materials/<material_id>
+    layout) and implements products(), which returns one product dict per material:
+
+        {"brand_id", "company", "material_id", "name", "headline", "description",
+         "colors": [{"name", "image_url", "preview_url", "angled_swatch_url", "description"}, ...]}
+
+    Each color becomes a gallery image captioned with its name. image_url is the gallery image and
+    preview_url, if any, its thumbnail. An angled_swatch_url becomes a second gallery image for the color,
+    captioned "<name> (angled)". The description is the material's description.html; ColorPageExtractor
+    builds it from the colors' descriptions. Pages that couldn't be scraped are counted in `failures`.
+    """
+
+    brand_id = None
+    company = None
+    material_id = None
+    material_name = None
+    headline = ""
+    failures = 0
+
+    def products(self, pool, journal=None):
+        """
+        Scrape the manufacturer's site using the given BrowserPool. Returns a list of product dicts.
+        With a ScrapeJournal, work recorded by an interrupted run is reused instead of scraped again.
+        """
+        raise NotImplementedError
+
+    def product(self, colors, description=""):
+        return {
+            "brand_id": self.brand_id,
+            "company": self.company,
+            "material_id": self.material_id,
+            "name": self.material_name,
+            "headline": self.headline,
+            "description": description,
+            "colors": colors,
+        }
+
+class ColorPageExtractor(Extractor):
+    """
+    Extractor for a product line whose listing page links to one page per color.
+
+    Subclasses set the listing URL and CSS selectors. Each entry of page_fields maps a color field to
+    (selector, kind), where kind is "background" (CSS background-image), "src" (img src) or "text".
+    Pages are parsed from plain HTTP responses when the required fields are in the static markup,
+    and rendered in the worker's headless browser otherwise.
+    """
+
+    listing_url = None
+    card_selector = None
+    label_selector = None
+    link_selector = "a"
+    page_fields = {}
+    required_fields = ()
+
+    def products(self, pool, journal=None):
+        color_links = journal.links.get(self.listing_url) if journal else None
+        if color_links is None:
+            (color_links, error), = pool.map(self.collect_links, [self.listing_url])
+            if error:
+                print(f"{self.company}: error collecting color links: {error}")
+                self.failures += 1
+                return []
+            if journal:
+                journal.record_links(self.listing_url, color_links)
+        print(f"{self.company}: found {len(color_links)} colors")
+
+        # Pages extracted before an interruption come from the journal; the rest are journaled as they finish
+        done = {link: journal.pages[link] for link, _ in color_links if link in journal.pages} if journal else {}
+        if done:
+            print(f"{self.company}: resuming, {len(done)} color pages already extracted")
+
+        def extract(worker, link):
+            page = self.extract_page(worker, link)
+            if journal:
+                journal.record_page(link, page)
+            return page
+
+        pending = [link for link, _ in color_links if link not in done]
+        extracted = dict(zip(pending, pool.map(extract, pending)))
+
+        colors = []
+        for link, color_name in color_links:
+            page, error = (done[link], None) if link in done else extracted[link]
+            if error:
+                self.failures += 1
+            if isinstance(error, TimeoutException):
+                print(f"Error processing {color_name}: timed out waiting for the page to render")
+            elif error:
+                print(f"Error processing {color_name}: {error}")
+            else:
+                print(f"Processed {color_name}")
+                colors.append({"name": color_name, **page})
+        return [self.product(colors, self.describe_colors(colors))]
+
+    def describe_colors(self, colors):
+        """The material description: each color's copy from its page, headed by the color name."""
+        return "\n".join(
+            f"<h3>{escape(color['name'])}</h3>\n<p>{escape(color['description'])}</p>"
+            for color in colors if color.get("description")
+        )
+
+    def collect_links(self, worker, url):
+        """Return (link, color name) pairs from the listing page."""
+        html = fetch_html(worker.session, url)
+        color_links = self.parse_links(html, url) if html else []
+        return color_links or self.extract_links_browser(worker.driver(), url)
+
+    def parse_links(self, html, base_url):
+        soup = BeautifulSoup(html, "html.parser")
+        color_links = []
+        for card in soup.select(self.card_selector):
+            anchor = card if card.name == "a" else card.select_one(self.link_selector)
+            label = card.select_one(self.label_selector)
+            if anchor and anchor.get("href") and label:
+                color_links.append((urljoin(base_url, anchor["href"]), label.get_text(strip=True)))
+        return color_links
+
+    def extract_links_browser(self, driver, url):
+        driver.get(url)
+        WebDriverWait(driver, WAIT_TIMEOUT).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, self.card_selector))
+        )
+        color_links = []
+        for card in driver.find_elements(By.CSS_SELECTOR, self.card_selector):
+            link = card.find_element(By.CSS_SELECTOR, self.link_selector).get_attribute("href")
+            color_name = card.find_element(By.CSS_SELECTOR, self.label_selector).get_attribute("textContent").strip()
+            color_links.append((link, color_name))
+        return color_links
+
+    def extract_page(self, worker, link):
+        """Extract one color page, from static HTML when possible and otherwise with the worker's browser."""
+        html = fetch_html(worker.session, link)
+        page = self.parse_page(html, link) if html else None
+        if page is None:
+            page = self.extract_page_browser(worker.driver(), link)
+        return page
+
+    def parse_page(self, html, base_url):
+        """Parse a color page from static HTML, or return None if a required field isn't in the markup."""
+        soup = BeautifulSoup(html, "html.parser")
+        page = {}
+        for field, (selector, kind) in self.page_fields.items():
+            element = soup.select_one(selector)
+            value = None
+            if element is not None:
+                if kind == "background":
+                    value = css_url(element.get("style"))
+                elif kind == "src":
+                    value = element.get("src")
+                else:
+                    value = element.get_text(" ", strip=True)
+            if value and kind != "text":
+                value = urljoin(base_url, value)
+            page[field] = value
+        if not all(page.get(field) for field in self.required_fields):
+            return None
+        return page
+
+    def extract_page_browser(self, driver, link):
+        """Load a color page in the browser, waiting only for the required elements."""
+        driver.get(link)
+        wait = WebDriverWait(driver, WAIT_TIMEOUT)
+        page = {}
+        for field, (selector, kind) in self.page_fields.items():
+            try:
+                if field in self.required_fields:
+                    element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+                else:
+                    element = driver.find_element(By.CSS_SELECTOR, selector)
+            except NoSuchElementException:
+                page[field] = None
+                continue
+            if kind == "background":
+                page[field] = css_url(element.value_of_css_property("background-image"))
+            elif kind == "src":
+                page[field] = element.get_attribute("src")
+            else:
+                page[field] = element.text
+        return page
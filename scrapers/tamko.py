@@ -0,0 +1,21 @@
+from scrapers.base import ColorPageExtractor
+
+class TamkoStormFighterFlex(ColorPageExtractor):
+    """TAMKO StormFighter FLEX: the house photo of each color is the gallery image and its styleboard swatch the thumbnail."""
+
+    brand_id = "tamko"
+    company = "TAMKO"
+    material_id = "stormfighter-flex"
+    material_name = "Tamko StormFighter FLEX"
+    headline = "Impact-Resistant Polymer Modified Shingles for Extreme Weather"
+
+    listing_url = "https://www.tamko.com/flex"
+    card_selector = ".slider.stormfighter-slider-container .slider-card"
+    label_selector = ".color-label"
+    page_fields = {
+        "image_url": (".section---house-photo", "background"),
+        "preview_url": (".styleboard-image", "src"),
+        "angled_swatch_url": (".section---angled-swatch", "background"),
+        "description": (".shingle-colors---copy", "text"),
+    }
+    required_fields = ("image_url", "preview_url")
@@ -0,0 +1,133 @@
+import os
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Image extensions the builder and compiler look for
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp"]
+
+# Pricing defaults for new materials, the same as the builder's "Add New Material" form
+DEFAULT_MATERIAL = {
+    "price": 500.0,
+    "waste": 10,
+    "minPitch": 3,
+    "maxPitch": 12,
+    "pitchThreshold": 7,
+    "pricePerPitch": 15.0,
+}
+
+def url_extension(url):
+    """Return the image extension of a URL's path, defaulting to .jpg."""
+    ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else ".jpg"
+
+def find_image(directory, base_name):
+    """Find an existing image with any supported extension."""
+    for ext in IMAGE_EXTENSIONS:
+        path = directory / f"{base_name}{ext}"
+        if path.exists():
+            return path
+    return None
+
+class CatalogWriter:
+    """
+    Writes scraped products into the builder's data tree:
+
+        <brands_dir>/<brand>/config.json
+        <brands_dir>/<brand>/materials/<id>/config.json, description.html, <id>_main.jpg
+        <brands_dir>/<brand>/materials/<id>/gallery/<id>_<N>.jpg, <id>_<N>_preview.jpg, <id>_<N>_name.txt
+
+    A color's angled swatch, when scraped, is a gallery image of its own captioned "<color> (angled)".
+
+    Updates are incremental: a color whose caption is already in the gallery keeps its index and files
+    (the downloader only rewrites them if they changed upstream), new colors get the next free index,
+    and configs, descriptions and main images edited in the builder are never overwritten.
+    """
+
+    def __init__(self, brands_dir, downloader):
+        self.brands_dir = Path(brands_dir)
+        self.downloader = downloader
+
+    def write_product(self, product):
+        """Write one product and queue its image downloads. Returns the material directory."""
+        brand_dir = self.brands_dir / product["brand_id"]
+        material_id = product["material_id"]
+        material_dir = brand_dir / "materials" / material_id
+        gallery_dir = material_dir / "gallery"
+        gallery_dir.mkdir(parents=True, exist_ok=True)
+
+        if not (brand_dir / "config.json").exists():
+            self._write_json(brand_dir / "config.json", {"company": product["company"], "description": ""})
+
+        colors = product["colors"]
+        if not (material_dir / "config.json").exists():
+            config = {
+                "name": product["name"],
+                "headline": product.get("headline", ""),
+                **DEFAULT_MATERIAL,
+                "mainImageName": colors[0]["name"] if colors else "",
+            }
+            self._write_json(material_dir / "config.json", config)
+
+        if product.get("description") and not (material_dir / "description.html").exists():
+            with open(material_dir / "description.html", 'w') as f:
+                f.write(product["description"])
+
+        # Gallery: one image per color, captioned with the color name, and the color's angled swatch if it has one
+        captions = self.read_captions(gallery_dir, material_id)
+        next_index = max([*captions.values(), *self.image_indices(gallery_dir, material_id)], default=0) + 1
+        for color in colors:
+            entries = [(color["name"], color.get("image_url"), color.get("preview_url"))]
+            if color.get("angled_swatch_url"):
+                entries.append((f"{color['name']} (angled)", color["angled_swatch_url"], None))
+            for caption, image_url, preview_url in entries:
+                index = captions.get(caption)
+                if index is None:
+                    index = next_index
+                    next_index += 1
+                    captions[caption] = index
+                    with open(gallery_dir / f"{material_id}_{index}_name.txt", 'w') as f:
+                        f.write(caption)
+
+                self.queue_image(image_url, gallery_dir, f"{material_id}_{index}")
+                self.queue_image(preview_url, gallery_dir, f"{material_id}_{index}_preview")
+
+        # The first color doubles as the main image until one is chosen in the builder
+        if colors and colors[0].get("image_url") and not find_image(material_dir, f"{material_id}_main"):
+            self.queue_image(colors[0]["image_url"], material_dir, f"{material_id}_main")
+
+        print(f"Wrote {product['brand_id']}/{material_id}: {len(colors)} colors")
+        return material_dir
+
+    def read_captions(self, gallery_dir, material_id):
+        """Map each existing gallery caption to its image index."""
+        captions = {}
+        for name_path in gallery_dir.glob(f"{material_id}_*_name.txt"):
+            index = name_path.name[len(material_id) + 1:-len("_name.txt")]
+            if index.isdigit():
+                with open(name_path, 'r') as f:
+                    captions.setdefault(f.read().strip(), int(index))
+        return captions
+
+    def image_indices(self, gallery_dir, material_id):
+        """Return the indices of existing gallery images, captioned or not."""
+        indices = []
+        for ext in IMAGE_EXTENSIONS:
+            for path in gallery_dir.glob(f"{material_id}_*{ext}"):
+                index = path.stem[len(material_id) + 1:]
+                if index.isdigit():
+                    indices.append(int(index))
+        return indices
+
+    def queue_image(self, url, directory, base_name):
+        """Download url to directory/base_name, reusing the extension of an existing file with that name."""
+        if not url:
+            return
+        existing = find_image(directory, base_name)
+        path = existing or directory / f"{base_name}{url_extension(url)}"
+        self.downloader.submit(url, str(path))
+
+    def _write_json(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
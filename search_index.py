@@ -0,0 +1,281 @@
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from html.parser import HTMLParser
+from pathlib import Path
+
+from storage import open_store
+
+# Relative weight of each indexed field when scoring a match
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "headline": 2.0,
+    "captions": 1.5,
+    "brand": 1.0,
+    "description": 1.0,
+}
+
+# BM25 tuning parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# How often, at most, refresh() rescans the store for changes made outside invalidate()
+REFRESH_INTERVAL = 5.0
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the visible text of an HTML fragment, ignoring scripts and styles."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def strip_html(html):
+    """Return the plain text content of an HTML string."""
+    if not html:
+        return ""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return " ".join(" ".join(extractor.parts).split())
+
+
+def tokenize(text):
+    """Lowercase, strip accents and trademark symbols, and split text into alphanumeric tokens."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over every material in a store (or a brands directory).
+
+    Call refresh() before searching: it compares each material's signature in the store with the
+    one it was indexed under and only re-reads materials that were added, edited or removed.
+    The store is rescanned at most every max_age seconds, or on the next refresh() after invalidate(),
+    so searching while typing doesn't walk the store on every keystroke.
+    The index is thread-safe so a single instance can be shared by all builder sessions.
+    """
+
+    def __init__(self, store, max_age=REFRESH_INTERVAL):
+        self.store = open_store(store) if isinstance(store, (str, Path)) else store
+        self.max_age = max_age
+        self._checked = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self._docs = {}          # (brand_id, material_id) -> document info
+        self._postings = {}      # term -> {(brand_id, material_id): weighted term frequency}
+        self._vocabulary = []    # sorted list of terms, for prefix matching
+        self._vocabulary_dirty = False
+        self._brand_signatures = {}
+        self._brand_names = {}
+        self._total_length = 0.0
+
+    def invalidate(self):
+        """Mark the index out of date, so the next refresh() rescans the store. Call it after editing the store."""
+        self._stale = True
+
+    def refresh(self, force=False):
+        """
+        Bring the index up to date with the store, unless it was checked less than max_age seconds ago and
+        hasn't been invalidated since (or force is set). Returns the number of re-indexed materials.
+        """
+        with self._lock:
+            if not (force or self._stale or self._checked is None or time.monotonic() - self._checked > self.max_age):
+                return 0
+            # Cleared before the scan, so an edit made while it runs is picked up by the next refresh
+            self._stale = False
+            self._checked = time.monotonic()
+
+            seen = set()
+            seen_brands = set()
+            updated = 0
+
+            for brand_id in self.store.brand_ids():
+                seen_brands.add(brand_id)
+                brand_changed = self._refresh_brand(brand_id)
+
+                for material_id in self.store.material_ids(brand_id):
+                    doc_id = (brand_id, material_id)
+                    seen.add(doc_id)
+                    signature = self.store.material_signature(brand_id, material_id)
+                    doc = self._docs.get(doc_id)
+                    if brand_changed or doc is None or doc["signature"] != signature:
+                        self._index_material(doc_id, signature)
+                        updated += 1
+
+            for doc_id in [d for d in self._docs if d not in seen]:
+                self._remove(doc_id)
+                updated += 1
+
+            for brand_id in [b for b in self._brand_signatures if b not in seen_brands]:
+                self._brand_signatures.pop(brand_id, None)
+                self._brand_names.pop(brand_id, None)
+
+            if self._vocabulary_dirty:
+                self._vocabulary = sorted(self._postings)
+                self._vocabulary_dirty = False
+
+            return updated
+
+    def _refresh_brand(self, brand_id):
+        """Reload the brand's display name if its config changed. Returns True if it did."""
+        signature = self.store.brand_signature(brand_id)
+        if self._brand_signatures.get(brand_id) == signature:
+            return False
+
+        name = brand_id
+        try:
+            brand = self.store.load_brand(brand_id)
+            if brand:
+                name = brand.get("company", name)
+        except (OSError, ValueError):
+            pass
+        self._brand_signatures[brand_id] = signature
+        self._brand_names[brand_id] = name
+        return True
+
+    def _index_material(self, doc_id, signature):
+        self._remove(doc_id)
+
+        try:
+            material = self.store.load_material(*doc_id)
+        except (OSError, ValueError):
+            return
+        if not material:
+            return
+
+        captions = [material.get("mainImageName", "")]
+        captions.extend(entry["name"] for entry in self.store.gallery(*doc_id))
+
+        fields = {
+            "name": material.get("name", doc_id[1]),
+            "headline": material.get("headline", ""),
+            "captions": " ".join(captions),
+            "brand": self._brand_names.get(doc_id[0], doc_id[0]),
+            "description": strip_html(material.get("description", "")),
+        }
+
+        term_weights = Counter()
+        for field, text in fields.items():
+            for token in tokenize(text):
+                term_weights[token] += FIELD_WEIGHTS[field]
+
+        length = sum(term_weights.values())
+        for term, weight in term_weights.items():
+            self._postings.setdefault(term, {})[doc_id] = weight
+        self._vocabulary_dirty = True
+        self._total_length += length
+
+        self._docs[doc_id] = {
+            "signature": signature,
+            "terms": list(term_weights),
+            "length": length,
+            "name": fields["name"],
+            "headline": fields["headline"],
+            "brand": fields["brand"],
+        }
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= doc["length"]
+        self._vocabulary_dirty = True
+
+    def _expand(self, token, prefix):
+        """Return the indexed terms a query token matches (the token itself, or all terms it prefixes)."""
+        if not prefix:
+            return [token] if token in self._postings else []
+        start = bisect.bisect_left(self._vocabulary, token)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query, limit=20):
+        """
+        Return up to `limit` materials ranked by BM25 score for the query.
+        The last query word also matches as a prefix, so results update while typing.
+        Each result is a dict with brand_id, material_id, name, headline, brand and score.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores = Counter()
+            for i, token in enumerate(tokens):
+                for term in self._expand(token, prefix=(i == len(tokens) - 1)):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, tf in postings.items():
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._docs[doc_id]["length"] / avg_length)
+                        scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            results = []
+            for (brand_id, material_id), score in scores.most_common(limit):
+                doc = self._docs[(brand_id, material_id)]
+                results.append({
+                    "brand_id": brand_id,
+                    "material_id": material_id,
+                    "name": doc["name"],
+                    "headline": doc["headline"],
+                    "brand": doc["brand"],
+                    "score": score,
+                })
+            return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    index = SearchIndex(Path("data") / "brands")
+    start = time.perf_counter()
+    count = index.refresh()
+    print(f"Indexed {count} materials in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    query = " ".join(sys.argv[1:])
+    if query:
+        start = time.perf_counter()
+        results = index.search(query)
+        print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.2f}ms")
+        for result in results:
+            print(f"  {result['score']:.2f}  {result['brand']} / {result['name']}")
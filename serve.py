@@ -0,0 +1,345 @@
+import os
+import re
+import posixpath
+import json
+import time
+import argparse
+import mimetypes
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from compile import OUTPUT_DIR, IMAGE_PREFIX
+
+CATALOG_PATH = "/RoofingMaterials/all-companies.json"
+IMAGES_PATH = urlsplit(IMAGE_PREFIX).path
+# Other output files (indexes, descriptions, the SQLite catalog) are served next to the catalog, as publish.py lays them out
+OUTPUT_PATH = posixpath.dirname(CATALOG_PATH) + "/"
+
+# Compiled images are named by content (name.<hex>.webp, see compile.image_version), so clients may cache them forever
+HASHED_NAME_PATTERN = re.compile(r"\.[0-9a-f]{8,}\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# How often, at most, requests check whether the manifest was rewritten by a build
+REFRESH_INTERVAL = 1.0
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def content_type_for(relative_path):
+    """Content-Type of an output file, by extension."""
+    if relative_path.endswith(".webp"):
+        return "image/webp"
+    return mimetypes.guess_type(relative_path)[0] or "application/octet-stream"
+
+def request_path_for(relative_path):
+    """URL path an output file is served at: images under the image prefix's path, everything else at OUTPUT_PATH."""
+    if relative_path.startswith("images/"):
+        return IMAGES_PATH + relative_path[len("images/"):]
+    return OUTPUT_PATH + relative_path
+
+def cache_control_for(relative_path):
+    """Cache-Control of an output file: immutable for content-hashed image names, revalidate for everything else."""
+    if relative_path.startswith("images/") and HASHED_NAME_PATTERN.search(relative_path):
+        return IMMUTABLE_CACHE_CONTROL
+    # Split-out descriptions are named by their content hash
+    if relative_path.startswith("descriptions/"):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+class Resource:
+    """One servable file: its path, length, validators and headers, plus any precompressed variants."""
+
+    def __init__(self, path, size, mtime, etag, content_type, cache_control):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.encodings = {}
+
+class CatalogIndex:
+    """
+    In-memory index of the compiled output, mapping request paths to Resources.
+
+    ETags are strong, taken from the SHA-256 hashes in the build manifest; files the manifest doesn't list
+    (or every file, if there's no manifest) get a weak ETag from their size and mtime. The index is rebuilt
+    when a build rewrites the manifest, so requests never touch the filesystem beyond sending the file.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR):
+        self.output_dir = Path(output_dir)
+        self.manifest_path = self.output_dir / "manifest.json"
+        self.resources = {}
+        self._manifest_mtime = None
+        self._checked = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the index if the manifest changed since it was last read."""
+        try:
+            manifest_mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            manifest_mtime = None
+        with self._lock:
+            self._checked = time.monotonic()
+            if self.resources and manifest_mtime == self._manifest_mtime:
+                return
+            self._manifest_mtime = manifest_mtime
+            self.resources = self.build()
+
+    def build(self):
+        files = {}
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable manifest {self.manifest_path}: {e}")
+
+        # Every file the manifest lists, except the precompressed variants served in place of their originals,
+        # plus the catalog, descriptions and images found on disk when there's no manifest (or it's out of date)
+        variants = {path for entry in files.values() for path in entry.get("encodings", {}).values()}
+        relative_paths = {path for path in files if path not in variants}
+        relative_paths.add("all-companies.json")
+        for pattern in ("descriptions/*.html", "images/*.webp"):
+            relative_paths.update(path.relative_to(self.output_dir).as_posix() for path in self.output_dir.glob(pattern))
+
+        resources = {}
+        for relative_path in relative_paths:
+            resource = self.resource(relative_path, files)
+            if resource:
+                resources[request_path_for(relative_path)] = resource
+        return resources
+
+    def resource(self, relative_path, files):
+        path = self.output_dir / relative_path
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        entry = files.get(relative_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            etag = f'"{entry["sha256"][:32]}"'
+        else:
+            entry = None
+            etag = f'W/"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+        cache_control = cache_control_for(relative_path)
+        content_type = content_type_for(relative_path)
+        resource = Resource(path, stat.st_size, stat.st_mtime, etag, content_type, cache_control)
+
+        # Only trust precompressed variants the manifest lists for this exact version of the file
+        for encoding, variant_path in (entry or {}).get("encodings", {}).items():
+            variant = files.get(variant_path)
+            try:
+                variant_stat = (self.output_dir / variant_path).stat()
+            except FileNotFoundError:
+                continue
+            if variant and variant.get("size") == variant_stat.st_size and variant.get("mtime_ns") == variant_stat.st_mtime_ns:
+                resource.encodings[encoding] = Resource(self.output_dir / variant_path, variant_stat.st_size,
+                                                        stat.st_mtime, f'"{variant["sha256"][:32]}"', content_type,
+                                                        cache_control)
+        return resource
+
+    def get(self, request_path):
+        if time.monotonic() - self._checked > REFRESH_INTERVAL:
+            self.refresh()
+        return self.resources.get(request_path)
+
+def accepted_encodings(header):
+    """Parse Accept-Encoding into the set of encodings the client accepts (q > 0)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into (start, end) inclusive.
+    Returns None to serve the whole file (no header, or a form we don't support), or "unsatisfiable".
+    """
+    match = RANGE_PATTERN.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return "unsatisfiable"
+    return start, end
+
+class CatalogRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the catalog JSON and images like server.js, and every other file in the build manifest, plus:
+    precompressed .br/.gz variants chosen by Accept-Encoding, strong ETags with If-None-Match,
+    Last-Modified with If-Modified-Since, single Range requests (with If-Range), and
+    immutable caching for content-hashed image names. Files are sent with sendfile().
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "RoofingCatalog"
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_OPTIONS(self):
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Range, If-None-Match, If-Modified-Since")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def handle_request(self, send_body):
+        request_path = unquote(urlsplit(self.path).path)
+        if request_path == "/":
+            return self.send_text(HTTPStatus.OK, "text/html; charset=utf-8", self.server.index_page(), send_body)
+
+        resource = self.server.catalog.get(request_path)
+        if resource is None:
+            if request_path == CATALOG_PATH:
+                body = json.dumps({"error": "all-companies.json file not found"})
+                return self.send_text(HTTPStatus.NOT_FOUND, "application/json; charset=utf-8", body, send_body)
+            return self.send_text(HTTPStatus.NOT_FOUND, "text/plain; charset=utf-8", "Not found", send_body)
+
+        # Ranges apply to the identity encoding; otherwise pick the best precompressed variant
+        range_header = self.headers.get("Range")
+        representation, encoding = resource, None
+        if not range_header:
+            accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+            for candidate in ("br", "gzip"):
+                if candidate in accepted and candidate in resource.encodings:
+                    representation, encoding = resource.encodings[candidate], candidate
+                    break
+
+        if self.not_modified(representation):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(representation, encoding, resource)
+            self.end_headers()
+            return
+
+        byte_range = None
+        if range_header and self.headers.get("If-Range", representation.etag) in (representation.etag, representation.last_modified):
+            byte_range = parse_range(range_header, representation.size)
+        if byte_range == "unsatisfiable":
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{representation.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range or (0, representation.size - 1)
+        length = end - start + 1
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+        self.send_common_headers(representation, encoding, resource)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{representation.size}")
+        self.send_header("Content-Length", str(max(length, 0)))
+        self.end_headers()
+        if send_body and length > 0:
+            self.wfile.flush()
+            with open(representation.path, 'rb') as f:
+                self.connection.sendfile(f, start, length)
+
+    def not_modified(self, representation):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or representation.etag.removeprefix("W/") in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(representation.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_common_headers(self, representation, encoding, resource):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Type", representation.content_type)
+        self.send_header("ETag", representation.etag)
+        self.send_header("Last-Modified", representation.last_modified)
+        self.send_header("Cache-Control", representation.cache_control)
+        self.send_header("Accept-Ranges", "bytes")
+        if resource.encodings:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+
+    def send_text(self, status, content_type, text, send_body):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class CatalogServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, output_dir=OUTPUT_DIR, quiet=False):
+        super().__init__(address, CatalogRequestHandler)
+        self.catalog = CatalogIndex(output_dir)
+        self.quiet = quiet
+
+    def index_page(self):
+        return f"""
+    <h1>Roofing Materials Server</h1>
+    <p>Server is running successfully!</p>
+    <ul>
+      <li>Access images at: <a href="{IMAGES_PATH}">{IMAGES_PATH}{{filename}}</a></li>
+      <li>Access companies data at: <a href="{CATALOG_PATH}">{CATALOG_PATH}</a></li>
+    </ul>
+  """
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the compiled catalog JSON and images.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=3000, help="port to listen on (default: 3000)")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR), help="compiled output directory (default: output)")
+    parser.add_argument("--quiet", action="store_true", help="don't log each request")
+    args = parser.parse_args()
+
+    server = CatalogServer((args.host, args.port), args.output_dir, quiet=args.quiet)
+    print(f"Roofing Materials Server running at http://{args.host}:{args.port}")
+    print(f"Indexed {len(server.catalog.resources)} files from {args.output_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import hashlib
+import os
+from pathlib import Path
+
+
+def directory_signature(directory, recursive=True):
+    """
+    Return a cheap fingerprint of everything under a directory.
+    Built from relative paths, sizes and modification times only (no file contents are read),
+    so comparing signatures tells whether anything was added, removed or edited since last time.
+    With recursive=False only the files directly inside the directory are included.
+    Returns an empty string if the directory doesn't exist.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return ""
+
+    entries = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(Path(entry.path))
+                    continue
+                stat = entry.stat()
+                relative = os.path.relpath(entry.path, directory)
+                entries.append(f"{relative}\0{stat.st_size}\0{stat.st_mtime_ns}")
+
+    entries.sort()
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+def file_signature(path):
+    """Return a fingerprint for a single file, or an empty string if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return ""
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
@@ -0,0 +1,166 @@
+"""
+Visual similarity between materials, for "similar materials" recommendations.
+
+Every material gets a compact feature vector computed from its compiled preview (usually a color swatch),
+or from its main image when it has no preview:
+
+    color     a joint CIELAB histogram (4 x 4 x 4 bins), square-rooted so the dot product of two
+              histograms is their Bhattacharyya coefficient
+    texture   histograms of gradient orientation (weighted by gradient strength) and of gradient
+              strength over the lightness channel, which separate e.g. slate-like, wood-shake and
+              flat three-tab patterns
+
+Both parts are normalized, weighted and concatenated into one unit-length float32 vector, so cosine
+similarity is a dot product. compile writes the vectors as one contiguous float32 array and precomputes
+each material's nearest neighbors, across all brands and from other brands only, so a lookup at request
+time is a dictionary access.
+"""
+import json
+import threading
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from signatures import file_signature
+from palette import rgb_to_lab
+
+INDEX_PATH = Path("output") / "similarity-index.json"
+VECTORS_PATH = Path("output") / "similarity-vectors.npy"
+
+# Images are resized to FEATURE_SIZE x FEATURE_SIZE before computing features
+FEATURE_SIZE = 96
+
+COLOR_BINS = 4
+ORIENTATION_BINS = 8
+STRENGTH_BINS = 8
+# Gradient strength (lightness units per pixel) at which the top strength bin starts
+MAX_STRENGTH = 16.0
+
+# Share of the similarity score given to color and to texture
+COLOR_WEIGHT = 0.7
+TEXTURE_WEIGHT = 0.3
+
+# Neighbors precomputed per material
+NEIGHBORS = 10
+
+FEATURE_DIMENSIONS = COLOR_BINS ** 3 + ORIENTATION_BINS + STRENGTH_BINS
+
+def unit(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def image_features(img, size=FEATURE_SIZE):
+    """Return the feature vector of a PIL image as a unit-length float32 array."""
+    img.draft("RGB", (size * 2, size * 2))
+    img = img.convert("RGB").resize((size, size), Image.BILINEAR)
+    lab = rgb_to_lab(np.asarray(img, dtype=np.float64).reshape(-1, 3))
+
+    # Lightness spans 0-100; roofing colors sit well inside +/-40 on a and b, more saturated colors share the end bins
+    color, _ = np.histogramdd(np.clip(lab, [0, -40, -40], [100, 40, 40]), bins=COLOR_BINS,
+                              range=((0, 100), (-40, 40), (-40, 40)))
+    color = np.sqrt(color.ravel() / color.sum())
+
+    gy, gx = np.gradient(lab[:, 0].reshape(size, size))
+    strength = np.hypot(gx, gy).ravel()
+    orientation = (np.arctan2(gy, gx).ravel()) % np.pi
+    orientations, _ = np.histogram(orientation, bins=ORIENTATION_BINS, range=(0, np.pi), weights=strength)
+    strengths, _ = np.histogram(np.minimum(strength, MAX_STRENGTH - 1e-9), bins=STRENGTH_BINS, range=(0, MAX_STRENGTH))
+    texture = np.sqrt(np.concatenate([orientations / max(strength.sum(), 1e-9), strengths / strength.size]))
+
+    vector = np.concatenate([COLOR_WEIGHT * unit(color), TEXTURE_WEIGHT * unit(texture)])
+    return unit(vector).astype(np.float32)
+
+def nearest_neighbors(vectors, groups, k=NEIGHBORS, exclude_same_group=False, block_size=1024):
+    """
+    Return, for every row of a (materials x dimensions) unit-vector array, the indices and cosine similarities
+    of its k most similar other rows, best first. With exclude_same_group, rows with the same group (brand)
+    are skipped. Similarities are computed a block of rows at a time to bound memory.
+    """
+    count = len(vectors)
+    k = min(k, max(count - 1, 0))
+    neighbors = np.zeros((count, k), dtype=np.int64)
+    scores = np.zeros((count, k), dtype=np.float32)
+    if not k:
+        return neighbors, scores
+    groups = np.asarray(groups)
+    for start in range(0, count, block_size):
+        block = vectors[start:start + block_size] @ vectors.T
+        rows = np.arange(start, min(start + block_size, count))
+        block[rows - start, rows] = -np.inf
+        if exclude_same_group:
+            block[groups[rows][:, None] == groups[None, :]] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        neighbors[rows] = np.take_along_axis(top, order, axis=1)
+        scores[rows] = np.take_along_axis(top_scores, order, axis=1)
+    return neighbors, scores
+
+def build_similarity_index(materials, vectors, k=NEIGHBORS):
+    """
+    Build the similarity index from [brand_id, material_id, name] rows and their (n x d) feature vectors.
+
+        {"materials": [[brand_id, material_id, name], ...],
+         "similar": [[[neighbor index, similarity], ...] per material, best first],
+         "otherBrands": [same, but only materials from other brands]}
+    """
+    brands = [brand_id for brand_id, _, _ in materials]
+    index = {"materials": materials}
+    for key, exclude in (("similar", False), ("otherBrands", True)):
+        neighbors, scores = nearest_neighbors(vectors, brands, exclude_same_group=exclude)
+        index[key] = [
+            [[int(n), round(float(s), 4)] for n, s in zip(row_neighbors, row_scores) if np.isfinite(s)]
+            for row_neighbors, row_scores in zip(neighbors, scores)
+        ]
+    return index
+
+class SimilarityIndex:
+    """Query API over the similarity index compile writes next to the catalog. Lookups are dictionary accesses."""
+
+    def __init__(self, data):
+        self.materials = data["materials"]
+        self.positions = {(brand_id, material_id): i for i, (brand_id, material_id, _) in enumerate(self.materials)}
+        self.neighbors = {False: data["similar"], True: data["otherBrands"]}
+
+    def similar(self, brand_id, material_id, limit=None, other_brands=False):
+        """
+        Return the materials that look most like a material, best first, as dicts with brand_id,
+        material_id, name and similarity (cosine, up to 1). Unknown materials have no neighbors.
+        """
+        position = self.positions.get((brand_id, material_id))
+        if position is None:
+            return []
+        return [
+            {"brand_id": self.materials[n][0], "material_id": self.materials[n][1], "name": self.materials[n][2],
+             "similarity": similarity}
+            for n, similarity in self.neighbors[other_brands][position][:limit]
+        ]
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def load_similarity_index(path=INDEX_PATH):
+    """Load a similarity index, memoized until the file is rewritten by a build."""
+    path = str(Path(path).resolve())
+    version = file_signature(path)
+    with _index_lock:
+        cached = _index_cache.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    with open(path, 'r') as f:
+        index = SimilarityIndex(json.load(f))
+    with _index_lock:
+        _index_cache[path] = (version, index)
+    return index
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="List the materials that look most like a material.")
+    parser.add_argument("material", metavar="BRAND/MATERIAL", help="material to find look-alikes for")
+    parser.add_argument("--limit", type=int, default=NEIGHBORS, help=f"materials to show (default: {NEIGHBORS})")
+    parser.add_argument("--other-brands", action="store_true", help="only materials from other brands")
+    parser.add_argument("--index", default=str(INDEX_PATH), help="index file (default: output/similarity-index.json)")
+    args = parser.parse_args()
+
+    brand_id, _, material_id = args.material.partition("/")
+    for result in load_similarity_index(args.index).similar(brand_id, material_id, args.limit, args.other_brands):
+        print(f"{result['similarity']:.3f}  {result['brand_id']}/{result['material_id']}")
@@ -0,0 +1,668 @@
+import os
+import re
+import json
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from signatures import directory_signature
+
+# Image extensions looked up for each image slot, in order of preference
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tiff"]
+
+# Metadata reads PrefetchedStore keeps in flight
+DEFAULT_PREFETCH_WORKERS = 16
+
+GALLERY_SLOT_PATTERN = re.compile(r"^gallery_(\d+)(_preview)?$")
+
+def gallery_slot(index, preview=False):
+    """Slot name of a gallery image or its thumbnail."""
+    return f"gallery_{index}_preview" if preview else f"gallery_{index}"
+
+class FileStore:
+    """
+    The builder's original layout: one directory per brand and material, holding config.json,
+    description.html, caption files and images.
+
+        <brands_dir>/<brand>/config.json, <brand>_logo.jpg
+        <brands_dir>/<brand>/materials/<id>/config.json, description.html, <id>_main.jpg, <id>_preview.jpg
+        <brands_dir>/<brand>/materials/<id>/gallery/<id>_<N>.jpg, <id>_<N>_preview.jpg, <id>_<N>_name.txt
+
+    Images are addressed by slot: "logo" for a brand, and "main", "preview", "gallery_<N>" and
+    "gallery_<N>_preview" for a material. Captions use the same slot names.
+    """
+
+    def __init__(self, brands_dir):
+        self.brands_dir = Path(brands_dir)
+        self.brands_dir.mkdir(parents=True, exist_ok=True)
+
+    def __str__(self):
+        return f"files:{self.brands_dir}"
+
+    def brand_dir(self, brand_id):
+        return self.brands_dir / brand_id
+
+    def material_dir(self, brand_id, material_id):
+        return self.brands_dir / brand_id / "materials" / material_id
+
+    # Brands
+
+    def brand_ids(self):
+        return [d.name for d in self.brands_dir.iterdir() if d.is_dir()]
+
+    def load_brand(self, brand_id):
+        config_path = self.brand_dir(brand_id) / "config.json"
+        if not config_path.exists():
+            return None
+        with open(config_path, 'r') as f:
+            return {'id': brand_id, **json.load(f)}
+
+    def load_brands(self):
+        return [brand for brand in map(self.load_brand, self.brand_ids()) if brand]
+
+    def save_brand(self, brand):
+        brand_dir = self.brand_dir(brand['id'])
+        (brand_dir / "materials").mkdir(parents=True, exist_ok=True)
+        # The ID is part of the directory structure, not the config
+        with open(brand_dir / "config.json", 'w') as f:
+            json.dump({k: v for k, v in brand.items() if k != 'id'}, f, indent=2)
+
+    def delete_brand(self, brand_id):
+        shutil.rmtree(self.brand_dir(brand_id), ignore_errors=True)
+
+    def brand_signature(self, brand_id):
+        """Fingerprint of a brand's config and logo (not its materials)."""
+        return directory_signature(self.brand_dir(brand_id), recursive=False)
+
+    # Materials
+
+    def material_ids(self, brand_id):
+        materials_dir = self.brand_dir(brand_id) / "materials"
+        if not materials_dir.exists():
+            return []
+        return [d.name for d in materials_dir.iterdir() if d.is_dir()]
+
+    def load_material(self, brand_id, material_id):
+        """Return a material's config with its id, and its description if it has one, or None."""
+        material_dir = self.material_dir(brand_id, material_id)
+        config_path = material_dir / "config.json"
+        if not config_path.exists():
+            return None
+        with open(config_path, 'r') as f:
+            material = {'id': material_id, **json.load(f)}
+        description_path = material_dir / "description.html"
+        if description_path.exists():
+            with open(description_path, 'r') as f:
+                material['description'] = f.read()
+        return material
+
+    def load_materials(self, brand_id):
+        materials = (self.load_material(brand_id, m) for m in self.material_ids(brand_id))
+        return [material for material in materials if material]
+
+    def save_material(self, brand_id, material):
+        material_dir = self.material_dir(brand_id, material['id'])
+        (material_dir / "gallery").mkdir(parents=True, exist_ok=True)
+        # The description is kept in its own file, the ID in the directory name
+        with open(material_dir / "description.html", 'w') as f:
+            f.write(material.get('description', ''))
+        with open(material_dir / "config.json", 'w') as f:
+            json.dump({k: v for k, v in material.items() if k not in ('description', 'id')}, f, indent=2)
+
+    def delete_material(self, brand_id, material_id):
+        shutil.rmtree(self.material_dir(brand_id, material_id), ignore_errors=True)
+
+    def material_signature(self, brand_id, material_id):
+        """Fingerprint of everything stored for a material; changes whenever any of it does."""
+        return directory_signature(self.material_dir(brand_id, material_id))
+
+    # Images and captions
+
+    def _slot_base(self, brand_id, material_id, slot):
+        """Return the directory and extension-less file name of an image slot."""
+        if slot == "logo":
+            return self.brand_dir(brand_id), f"{brand_id}_logo"
+        material_dir = self.material_dir(brand_id, material_id)
+        if slot in ("main", "preview"):
+            return material_dir, f"{material_id}_{slot}"
+        match = GALLERY_SLOT_PATTERN.match(slot)
+        if not match:
+            raise ValueError(f"Unknown image slot: {slot}")
+        index, preview = int(match.group(1)), bool(match.group(2))
+        entry = self._gallery_entries(brand_id, material_id).get(index)
+        prefix = entry["prefix"] if entry else material_id
+        return material_dir / "gallery", f"{prefix}_{index}" + ("_preview" if preview else "")
+
+    def find_image(self, brand_id, material_id, slot):
+        """Return the path of the image in a slot, or None."""
+        directory, base_name = self._slot_base(brand_id, material_id, slot)
+        for ext in IMAGE_EXTENSIONS:
+            path = directory / f"{base_name}{ext}"
+            if path.exists():
+                return path
+        return None
+
+    def upload_image(self, brand_id, material_id, slot, data, ext):
+        """Store image bytes in a slot, replacing any image already there. Returns the stored path."""
+        self.delete_image(brand_id, material_id, slot)
+        directory, base_name = self._slot_base(brand_id, material_id, slot)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{base_name}{ext.lower()}"
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def delete_image(self, brand_id, material_id, slot):
+        path = self.find_image(brand_id, material_id, slot)
+        if path:
+            path.unlink()
+
+    def _caption_path(self, brand_id, material_id, slot):
+        directory, base_name = self._slot_base(brand_id, material_id, slot)
+        return directory / f"{base_name}_name.txt"
+
+    def caption(self, brand_id, material_id, slot):
+        path = self._caption_path(brand_id, material_id, slot)
+        if not path.exists():
+            return ""
+        with open(path, 'r') as f:
+            return f.read()
+
+    def set_caption(self, brand_id, material_id, slot, text):
+        path = self._caption_path(brand_id, material_id, slot)
+        if text:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(text)
+        elif path.exists():
+            path.unlink()
+
+    def _gallery_entries(self, brand_id, material_id):
+        """Map each gallery index to its image, thumbnail and file name prefix."""
+        gallery_dir = self.material_dir(brand_id, material_id) / "gallery"
+        entries = {}
+        if not gallery_dir.exists():
+            return entries
+        for path in gallery_dir.iterdir():
+            ext = path.suffix
+            if ext not in IMAGE_EXTENSIONS:
+                continue
+            preview = path.stem.endswith("_preview")
+            prefix, _, index = path.stem.removesuffix("_preview").rpartition("_")
+            if not prefix or not index.isdigit():
+                continue
+            entry = entries.setdefault(int(index), {"prefix": prefix, "image": None, "preview": None})
+            key = "preview" if preview else "image"
+            # Prefer extensions the same way find_image does
+            if entry[key] is None or IMAGE_EXTENSIONS.index(ext) < IMAGE_EXTENSIONS.index(entry[key].suffix):
+                entry[key] = path
+                if not preview:
+                    entry["prefix"] = prefix
+        return entries
+
+    def gallery(self, brand_id, material_id):
+        """Return the material's gallery, ordered by index, as dicts with index, image, preview and name."""
+        gallery_dir = self.material_dir(brand_id, material_id) / "gallery"
+        gallery = []
+        for index, entry in sorted(self._gallery_entries(brand_id, material_id).items()):
+            if entry["image"] is None:
+                continue
+            name_path = gallery_dir / f"{entry['prefix']}_{index}_name.txt"
+            name = ""
+            if name_path.exists():
+                with open(name_path, 'r') as f:
+                    name = f.read()
+            gallery.append({"index": index, "image": entry["image"], "preview": entry["preview"], "name": name})
+        return gallery
+
+    def add_gallery_image(self, brand_id, material_id, data, ext, name="", preview=None):
+        """Add a gallery image after the highest existing index. preview is an optional (data, ext) thumbnail."""
+        index = max(self._gallery_entries(brand_id, material_id), default=0) + 1
+        self.upload_image(brand_id, material_id, gallery_slot(index), data, ext)
+        if preview:
+            self.upload_image(brand_id, material_id, gallery_slot(index, preview=True), *preview)
+        if name:
+            self.set_caption(brand_id, material_id, gallery_slot(index), name)
+        return index
+
+    def delete_gallery_image(self, brand_id, material_id, index):
+        self.set_caption(brand_id, material_id, gallery_slot(index), "")
+        self.delete_image(brand_id, material_id, gallery_slot(index, preview=True))
+        self.delete_image(brand_id, material_id, gallery_slot(index))
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS brand (
+    id TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    revision TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS material (
+    brand_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    config TEXT NOT NULL,
+    description TEXT,
+    revision TEXT NOT NULL,
+    PRIMARY KEY (brand_id, id)
+);
+CREATE TABLE IF NOT EXISTS image (
+    brand_id TEXT NOT NULL,
+    material_id TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (brand_id, material_id, slot)
+);
+CREATE TABLE IF NOT EXISTS caption (
+    brand_id TEXT NOT NULL,
+    material_id TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (brand_id, material_id, slot)
+);
+"""
+
+class SQLiteStore:
+    """
+    Stores brands, materials and captions in a SQLite database (WAL mode, so the builder and a compile
+    can read and write at the same time) and images in a content-addressed blob directory:
+
+        <root>/store.sqlite
+        <root>/blobs/<first 2 hex digits>/<sha256><ext>
+
+    Same interface and slot names as FileStore. Brand images use an empty material_id. Every change to a
+    brand or material sets a new revision, which serves as its signature for incremental compiles.
+    Identical images are stored once; prune_blobs() removes blobs nothing refers to any more.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.db_path = self.root / "store.sqlite"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self.connection() as connection:
+            connection.executescript(SQLITE_SCHEMA)
+
+    def __str__(self):
+        return f"sqlite:{self.root}"
+
+    def connection(self):
+        """Return this thread's connection to the database."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _touch(self, connection, brand_id, material_id=None):
+        """Give a brand or material a new revision after a change."""
+        revision = uuid.uuid4().hex
+        if material_id:
+            connection.execute("UPDATE material SET revision = ? WHERE brand_id = ? AND id = ?",
+                               (revision, brand_id, material_id))
+        else:
+            connection.execute("UPDATE brand SET revision = ? WHERE id = ?", (revision, brand_id))
+
+    # Brands
+
+    def brand_ids(self):
+        return [row[0] for row in self.connection().execute("SELECT id FROM brand ORDER BY rowid")]
+
+    def load_brand(self, brand_id):
+        row = self.connection().execute("SELECT config FROM brand WHERE id = ?", (brand_id,)).fetchone()
+        return {'id': brand_id, **json.loads(row[0])} if row else None
+
+    def load_brands(self):
+        rows = self.connection().execute("SELECT id, config FROM brand ORDER BY rowid")
+        return [{'id': brand_id, **json.loads(config)} for brand_id, config in rows]
+
+    def save_brand(self, brand):
+        config = json.dumps({k: v for k, v in brand.items() if k != 'id'})
+        with self.connection() as connection:
+            connection.execute(
+                "INSERT INTO brand (id, config, revision) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET config = excluded.config, revision = excluded.revision",
+                (brand['id'], config, uuid.uuid4().hex))
+
+    def delete_brand(self, brand_id):
+        with self.connection() as connection:
+            for table in ("image", "caption", "material"):
+                connection.execute(f"DELETE FROM {table} WHERE brand_id = ?", (brand_id,))
+            connection.execute("DELETE FROM brand WHERE id = ?", (brand_id,))
+
+    def brand_signature(self, brand_id):
+        row = self.connection().execute("SELECT revision FROM brand WHERE id = ?", (brand_id,)).fetchone()
+        return row[0] if row else ""
+
+    # Materials
+
+    def material_ids(self, brand_id):
+        rows = self.connection().execute("SELECT id FROM material WHERE brand_id = ? ORDER BY rowid", (brand_id,))
+        return [row[0] for row in rows]
+
+    def _material(self, material_id, config, description):
+        material = {'id': material_id, **json.loads(config)}
+        if description is not None:
+            material['description'] = description
+        return material
+
+    def load_material(self, brand_id, material_id):
+        row = self.connection().execute(
+            "SELECT config, description FROM material WHERE brand_id = ? AND id = ?", (brand_id, material_id)).fetchone()
+        return self._material(material_id, *row) if row else None
+
+    def load_materials(self, brand_id):
+        rows = self.connection().execute(
+            "SELECT id, config, description FROM material WHERE brand_id = ? ORDER BY rowid", (brand_id,))
+        return [self._material(*row) for row in rows]
+
+    def save_material(self, brand_id, material):
+        config = json.dumps({k: v for k, v in material.items() if k not in ('description', 'id')})
+        with self.connection() as connection:
+            connection.execute(
+                "INSERT INTO material (brand_id, id, config, description, revision) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (brand_id, id) DO UPDATE SET config = excluded.config, "
+                "description = excluded.description, revision = excluded.revision",
+                (brand_id, material['id'], config, material.get('description', ''), uuid.uuid4().hex))
+
+    def delete_material(self, brand_id, material_id):
+        with self.connection() as connection:
+            for table in ("image", "caption"):
+                connection.execute(f"DELETE FROM {table} WHERE brand_id = ? AND material_id = ?", (brand_id, material_id))
+            connection.execute("DELETE FROM material WHERE brand_id = ? AND id = ?", (brand_id, material_id))
+
+    def material_signature(self, brand_id, material_id):
+        row = self.connection().execute(
+            "SELECT revision FROM material WHERE brand_id = ? AND id = ?", (brand_id, material_id)).fetchone()
+        return row[0] if row else ""
+
+    # Images and captions
+
+    def blob_path(self, sha256, ext):
+        return self.blobs_dir / sha256[:2] / f"{sha256}{ext}"
+
+    def find_image(self, brand_id, material_id, slot):
+        row = self.connection().execute(
+            "SELECT sha256, ext FROM image WHERE brand_id = ? AND material_id = ? AND slot = ?",
+            (brand_id, material_id or "", slot)).fetchone()
+        return self.blob_path(*row) if row else None
+
+    def upload_image(self, brand_id, material_id, slot, data, ext):
+        sha256 = hashlib.sha256(data).hexdigest()
+        ext = ext.lower()
+        path = self.blob_path(sha256, ext)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".part")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        with self.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO image (brand_id, material_id, slot, sha256, ext) VALUES (?, ?, ?, ?, ?)",
+                (brand_id, material_id or "", slot, sha256, ext))
+            self._touch(connection, brand_id, material_id)
+        return path
+
+    def delete_image(self, brand_id, material_id, slot):
+        with self.connection() as connection:
+            connection.execute("DELETE FROM image WHERE brand_id = ? AND material_id = ? AND slot = ?",
+                               (brand_id, material_id or "", slot))
+            self._touch(connection, brand_id, material_id)
+
+    def caption(self, brand_id, material_id, slot):
+        row = self.connection().execute(
+            "SELECT text FROM caption WHERE brand_id = ? AND material_id = ? AND slot = ?",
+            (brand_id, material_id, slot)).fetchone()
+        return row[0] if row else ""
+
+    def set_caption(self, brand_id, material_id, slot, text):
+        with self.connection() as connection:
+            if text:
+                connection.execute(
+                    "INSERT OR REPLACE INTO caption (brand_id, material_id, slot, text) VALUES (?, ?, ?, ?)",
+                    (brand_id, material_id, slot, text))
+            else:
+                connection.execute("DELETE FROM caption WHERE brand_id = ? AND material_id = ? AND slot = ?",
+                                   (brand_id, material_id, slot))
+            self._touch(connection, brand_id, material_id)
+
+    def gallery(self, brand_id, material_id):
+        rows = self.connection().execute(
+            "SELECT image.slot, sha256, ext, text FROM image LEFT JOIN caption USING (brand_id, material_id, slot) "
+            "WHERE brand_id = ? AND material_id = ? AND image.slot LIKE 'gallery_%'", (brand_id, material_id))
+        entries = {}
+        for slot, sha256, ext, text in rows:
+            match = GALLERY_SLOT_PATTERN.match(slot)
+            if not match:
+                continue
+            entry = entries.setdefault(int(match.group(1)), {"image": None, "preview": None, "name": ""})
+            if match.group(2):
+                entry["preview"] = self.blob_path(sha256, ext)
+            else:
+                entry["image"] = self.blob_path(sha256, ext)
+                entry["name"] = text or ""
+        return [{"index": index, **entry} for index, entry in sorted(entries.items()) if entry["image"]]
+
+    def add_gallery_image(self, brand_id, material_id, data, ext, name="", preview=None):
+        row = self.connection().execute(
+            "SELECT slot FROM image WHERE brand_id = ? AND material_id = ? AND slot LIKE 'gallery_%'",
+            (brand_id, material_id)).fetchall()
+        indices = [int(m.group(1)) for m in (GALLERY_SLOT_PATTERN.match(slot) for slot, in row) if m]
+        index = max(indices, default=0) + 1
+        self.upload_image(brand_id, material_id, gallery_slot(index), data, ext)
+        if preview:
+            self.upload_image(brand_id, material_id, gallery_slot(index, preview=True), *preview)
+        if name:
+            self.set_caption(brand_id, material_id, gallery_slot(index), name)
+        return index
+
+    def delete_gallery_image(self, brand_id, material_id, index):
+        with self.connection() as connection:
+            for table in ("image", "caption"):
+                connection.execute(f"DELETE FROM {table} WHERE brand_id = ? AND material_id = ? AND slot IN (?, ?)",
+                                   (brand_id, material_id, gallery_slot(index), gallery_slot(index, preview=True)))
+            self._touch(connection, brand_id, material_id)
+
+    def prune_blobs(self):
+        """Delete blobs that no image slot refers to. Returns the number removed."""
+        live = {f"{sha256}{ext}" for sha256, ext in self.connection().execute("SELECT sha256, ext FROM image")}
+        removed = 0
+        for path in self.blobs_dir.glob("*/*"):
+            if path.name not in live and not path.name.startswith("."):
+                path.unlink()
+                removed += 1
+        return removed
+
+class PrefetchedStore:
+    """
+    Read-through view of a store that reads compile's metadata ahead on a thread pool and answers from memory.
+
+    Used as a context manager, it starts a prefetch of every brand (config, signature, logo, material IDs),
+    and each brand's prefetch queues its materials' (signature, config and description, image paths, main
+    caption and gallery). At most `workers` reads are in flight, instead of one long chain of small reads,
+    which is slow when the brands directory is on a network share. A read waits for its entry's prefetch
+    if that is still running; reads of entries that weren't prefetched, or whose prefetch failed, and all
+    writes go to the underlying store. on_material(brand_id, material_id, data) is called on the pool after
+    each material's prefetch. The snapshot isn't invalidated; use a new view for every build.
+    """
+
+    def __init__(self, store, workers=DEFAULT_PREFETCH_WORKERS, on_material=None):
+        self.store = store
+        self.workers = workers
+        self.on_material = on_material
+        self._brand_ids = None
+        self._brands = {}
+        self._materials = {}
+        self._futures = {}
+        self._pool = None
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def __str__(self):
+        return str(self.store)
+
+    def __enter__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        for brand_id in self.brand_ids():
+            self._futures[brand_id] = self._pool.submit(self.prefetch_brand, brand_id)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown(cancel_futures=True)
+        self._pool = None
+
+    def _wait(self, key):
+        future = self._futures.get(key)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                # Read from the store instead, which raises the error where it always did
+                pass
+
+    def prefetch_brand(self, brand_id):
+        """Read a brand's config, signature, logo path and material IDs, and queue its materials' prefetch."""
+        material_ids = self.store.material_ids(brand_id)
+        self._brands[brand_id] = {
+            "signature": self.store.brand_signature(brand_id),
+            "config": self.store.load_brand(brand_id),
+            "logo": self.store.find_image(brand_id, None, "logo"),
+            "material_ids": material_ids,
+        }
+        if self._pool is not None:
+            for material_id in material_ids:
+                self._futures[(brand_id, material_id)] = self._pool.submit(self.prefetch_material, brand_id, material_id)
+
+    def prefetch_material(self, brand_id, material_id):
+        """Read a material's signature, config and description, image paths, main caption and gallery."""
+        data = {
+            "signature": self.store.material_signature(brand_id, material_id),
+            "config": self.store.load_material(brand_id, material_id),
+            "main": self.store.find_image(brand_id, material_id, "main"),
+            "preview": self.store.find_image(brand_id, material_id, "preview"),
+            "main_caption": self.store.caption(brand_id, material_id, "main"),
+            "gallery": self.store.gallery(brand_id, material_id),
+        }
+        self._materials[(brand_id, material_id)] = data
+        if self.on_material:
+            self.on_material(brand_id, material_id, data)
+
+    def brand_ids(self):
+        if self._brand_ids is None:
+            self._brand_ids = self.store.brand_ids()
+        return list(self._brand_ids)
+
+    def _brand(self, brand_id):
+        self._wait(brand_id)
+        return self._brands.get(brand_id)
+
+    def _material(self, brand_id, material_id):
+        self._wait((brand_id, material_id))
+        return self._materials.get((brand_id, material_id))
+
+    def load_brand(self, brand_id):
+        brand = self._brand(brand_id)
+        if brand is None:
+            return self.store.load_brand(brand_id)
+        # Callers may modify what they're given
+        return dict(brand["config"]) if brand["config"] else None
+
+    def brand_signature(self, brand_id):
+        brand = self._brand(brand_id)
+        return brand["signature"] if brand else self.store.brand_signature(brand_id)
+
+    def material_ids(self, brand_id):
+        brand = self._brand(brand_id)
+        return list(brand["material_ids"]) if brand else self.store.material_ids(brand_id)
+
+    def load_material(self, brand_id, material_id):
+        material = self._material(brand_id, material_id)
+        if material is None:
+            return self.store.load_material(brand_id, material_id)
+        return dict(material["config"]) if material["config"] else None
+
+    def material_signature(self, brand_id, material_id):
+        material = self._material(brand_id, material_id)
+        return material["signature"] if material else self.store.material_signature(brand_id, material_id)
+
+    def find_image(self, brand_id, material_id, slot):
+        if material_id is None:
+            brand = self._brand(brand_id) if slot == "logo" else None
+            return brand["logo"] if brand else self.store.find_image(brand_id, material_id, slot)
+        material = self._material(brand_id, material_id) if slot in ("main", "preview") else None
+        if material:
+            return material[slot]
+        return self.store.find_image(brand_id, material_id, slot)
+
+    def caption(self, brand_id, material_id, slot):
+        material = self._material(brand_id, material_id) if material_id is not None and slot == "main" else None
+        if material:
+            return material["main_caption"]
+        return self.store.caption(brand_id, material_id, slot)
+
+    def gallery(self, brand_id, material_id):
+        material = self._material(brand_id, material_id)
+        if material is None:
+            return self.store.gallery(brand_id, material_id)
+        return [dict(entry) for entry in material["gallery"]]
+
+def open_store(spec):
+    """
+    Open a store from a spec: "files:<brands dir>" or "sqlite:<store dir>".
+    A bare path is a brands directory in the original layout.
+    """
+    kind, separator, location = str(spec).partition(":")
+    if separator and kind == "sqlite":
+        return SQLiteStore(location)
+    if separator and kind == "files":
+        return FileStore(location)
+    return FileStore(spec)
+
+def migrate(source, destination, log=print):
+    """Copy every brand, material, image and caption from one store to another."""
+    for brand_id in source.brand_ids():
+        brand = source.load_brand(brand_id)
+        if not brand:
+            continue
+        destination.save_brand(brand)
+        copy_image(source, destination, brand_id, None, "logo")
+
+        for material_id in source.material_ids(brand_id):
+            material = source.load_material(brand_id, material_id)
+            if not material:
+                continue
+            destination.save_material(brand_id, material)
+            for slot in ("main", "preview"):
+                copy_image(source, destination, brand_id, material_id, slot)
+            main_caption = source.caption(brand_id, material_id, "main")
+            if main_caption:
+                destination.set_caption(brand_id, material_id, "main", main_caption)
+            for entry in source.gallery(brand_id, material_id):
+                copy_image(source, destination, brand_id, material_id, gallery_slot(entry["index"]))
+                copy_image(source, destination, brand_id, material_id, gallery_slot(entry["index"], preview=True))
+                if entry["name"]:
+                    destination.set_caption(brand_id, material_id, gallery_slot(entry["index"]), entry["name"])
+            log(f"Migrated {brand_id}/{material_id}")
+
+def copy_image(source, destination, brand_id, material_id, slot):
+    path = source.find_image(brand_id, material_id, slot)
+    if path:
+        destination.upload_image(brand_id, material_id, slot, path.read_bytes(), path.suffix)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Copy the builder's data between storage backends.")
+    parser.add_argument("source", help='store to read, e.g. "files:data/brands"')
+    parser.add_argument("destination", help='store to write, e.g. "sqlite:data/store"')
+    args = parser.parse_args()
+
+    migrate(open_store(args.source), open_store(args.destination))
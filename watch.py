@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import queue
+from pathlib import Path
+
+from compile import SUPPORTED_IMAGE_EXTENSIONS
+
+# Filesystem events (inotify on Linux) are optional; without watchdog the data tree is polled
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Gallery files as read by Compiler.process_gallery_images: <prefix>_<N>, <prefix>_<N>_preview, <prefix>_<N>_name.txt
+GALLERY_IMAGE_PATTERN = re.compile(r".+_\d+(_preview)?$")
+GALLERY_NAME_PATTERN = re.compile(r".+_\d+_name\.txt$")
+
+def is_image(name, stem=None):
+    """Check whether a filename has a supported image extension (and, if given, the expected stem)."""
+    path = Path(name)
+    return path.suffix in SUPPORTED_IMAGE_EXTENSIONS and (stem is None or path.stem == stem)
+
+def is_brand_file(name, brand_id):
+    """Files directly in a brand directory that the compiler reads."""
+    return name == "config.json" or is_image(name, f"{brand_id}_logo")
+
+def is_material_file(name, material_id):
+    """Files directly in a material directory that the compiler reads."""
+    if name in ("config.json", "description.html", f"{material_id}_main_name.txt"):
+        return True
+    return is_image(name, f"{material_id}_main") or is_image(name, f"{material_id}_preview")
+
+def is_gallery_file(name):
+    """Files in a gallery directory that the compiler reads."""
+    if GALLERY_NAME_PATTERN.match(name):
+        return True
+    return is_image(name) and bool(GALLERY_IMAGE_PATTERN.match(Path(name).stem))
+
+def classify_change(brands_dir, path):
+    """
+    Map a changed path to the catalog entry it affects.
+    Returns ("brand", brand_id), ("material", brand_id, material_id), or None for files the compiler never reads.
+    """
+    try:
+        parts = Path(path).relative_to(brands_dir).parts
+    except ValueError:
+        return None
+    if not parts:
+        return None
+
+    brand_id = parts[0]
+    if len(parts) == 1:
+        return ("brand", brand_id)
+    if parts[1] != "materials":
+        return ("brand", brand_id) if len(parts) == 2 and is_brand_file(parts[1], brand_id) else None
+    if len(parts) == 2:
+        return ("brand", brand_id)
+
+    material_id = parts[2]
+    rest = parts[3:]
+    if not rest:
+        return ("material", brand_id, material_id)
+    if len(rest) == 1 and (rest[0] == "gallery" or is_material_file(rest[0], material_id)):
+        return ("material", brand_id, material_id)
+    if len(rest) == 2 and rest[0] == "gallery" and is_gallery_file(rest[1]):
+        return ("material", brand_id, material_id)
+    return None
+
+class PollingWatcher:
+    """Detect changes by comparing sizes and modification times of everything under a directory."""
+
+    def __init__(self, root, interval=1.0):
+        self.root = Path(root)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds and return the set of paths added, removed or modified since the last call."""
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed
+
+    def stop(self):
+        pass
+
+class _QueueHandler(FileSystemEventHandler):
+    def __init__(self, events):
+        self.events = events
+
+    def on_any_event(self, event):
+        self.events.put(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.events.put(dest_path)
+
+class EventWatcher:
+    """Detect changes from filesystem events (inotify on Linux) delivered by watchdog."""
+
+    def __init__(self, root):
+        self.events = queue.Queue()
+        self.observer = Observer()
+        self.observer.schedule(_QueueHandler(self.events), str(root), recursive=True)
+        self.observer.start()
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds for events and return the set of paths they touched."""
+        changed = set()
+        try:
+            changed.add(self.events.get(timeout=timeout))
+            while True:
+                changed.add(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        return changed
+
+    def stop(self):
+        self.observer.stop()
+        self.observer.join()
+
+def rebuild(compiler, paths):
+    """Recompile the brands and materials affected by a set of changed paths."""
+    brand_ids = set()
+    materials = set()
+    for path in paths:
+        target = classify_change(compiler.brands_dir, path)
+        if target is None:
+            continue
+        if target[0] == "brand":
+            brand_ids.add(target[1])
+        else:
+            materials.add((target[1], target[2]))
+    materials = {m for m in materials if m[0] not in brand_ids}
+
+    if not brand_ids and not materials:
+        return
+
+    start = time.perf_counter()
+    try:
+        compiler.update_catalog(sorted(brand_ids), sorted(materials))
+    except Exception as e:
+        compiler.log(f"Error rebuilding {sorted(brand_ids) + [f'{b}/{m}' for b, m in sorted(materials)]}: {e}")
+        return
+    compiler.log(f"Rebuilt {len(brand_ids)} brands and {len(materials)} materials in {time.perf_counter() - start:.2f}s "
+                 f"({compiler.total_images_processed} images converted)")
+
+def watch(compiler, debounce=1.0, use_polling=False, poll_interval=1.0):
+    """
+    Compile once, then watch the compiler's brands directory and recompile affected entries as files change.
+    Bursts of changes are batched: a rebuild starts once nothing has changed for `debounce` seconds.
+    Runs until interrupted.
+    """
+    compiler.compile_all()
+
+    if use_polling or Observer is None:
+        watcher = PollingWatcher(compiler.brands_dir, poll_interval)
+        compiler.log(f"Watching {compiler.brands_dir} for changes (polling every {poll_interval}s)...")
+    else:
+        watcher = EventWatcher(compiler.brands_dir)
+        compiler.log(f"Watching {compiler.brands_dir} for changes...")
+
+    pending = set()
+    last_change = 0.0
+    try:
+        while True:
+            changed = watcher.changes(timeout=debounce)
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            elif pending and time.monotonic() - last_change >= debounce:
+                rebuild(compiler, pending)
+                pending = set()
+    except KeyboardInterrupt:
+        compiler.log("Stopped watching.")
+    finally:
+        watcher.stop()